@@ -0,0 +1,227 @@
+"""
+Бенчмарк сгенерированного набора тестов.
+
+Синтезирует захваты заданного размера, прогоняет оба генератора и измеряет
+время генерации, размер сгенерированных файлов, время сбора тестов pytest
+и время их выполнения. При превышении бюджета завершается с кодом 1.
+
+Использование (из корня репозитория):
+    python -m benchmarks.bench_generated_suite --groups 1000 --max-collect-seconds 10
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+from benchmarks.synthetic import write_api_logs_json, write_mitm_json
+from tests.mitm.tests_generator import APITestGenerator as MitmTestGenerator
+from tests.playwright.tests_generator import APITestGenerator as PlaywrightTestGenerator
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+GENERATORS = {
+    'mitm': (MitmTestGenerator, write_mitm_json),
+    'playwright': (PlaywrightTestGenerator, write_api_logs_json),
+}
+
+# Метрики, для которых проверяется бюджет и регрессия относительно базового прогона
+BUDGET_METRICS = ('generate_seconds', 'collect_seconds', 'execute_seconds', 'generated_bytes')
+
+
+def directory_size(path: Path, pattern: str = '*') -> int:
+    return sum(p.stat().st_size for p in path.rglob(pattern) if p.is_file())
+
+
+@contextlib.contextmanager
+def work_directory(keep: bool = False) -> Iterator[Path]:
+    """
+    Рабочая папка бенчмарка во временном каталоге системы. Внутри tests её не создаём:
+    оставшаяся после сбоя папка ломала бы сбор обычного прогона pytest
+    """
+    work_dir = Path(tempfile.mkdtemp(prefix='e2e_bench_'))
+    try:
+        yield work_dir
+    finally:
+        if keep:
+            print(f"Рабочая папка: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_pytest(args: List[str]) -> Dict[str, Any]:
+    """
+    Запускает pytest в отдельном процессе из корня репозитория с его pytest.ini. Сгенерированные
+    тесты лежат вне tests, поэтому фикстуры из tests/conftest.py подключаются как плагин
+    """
+    # Байткод пишется как при обычном запуске, чтобы измерить и размер кэша
+    env = {key: value for key, value in os.environ.items() if key != 'PYTHONDONTWRITEBYTECODE'}
+
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-m', 'pytest', '-q', '-p', 'no:cacheprovider',
+         '-c', str(REPO_ROOT / 'pytest.ini'), '-p', 'tests.conftest', *args],
+        cwd=REPO_ROOT, capture_output=True, text=True, env=env,
+    )
+    elapsed = time.perf_counter() - started
+
+    output = result.stdout + result.stderr
+    counts = {key: int(value) for value, key in
+              re.findall(r'(\d+) (passed|failed|errors?|tests? collected)', output)}
+
+    return {'seconds': elapsed, 'returncode': result.returncode, 'counts': counts, 'output': output}
+
+
+def bench_generator(name: str, work_dir: Path, groups: int, samples_per_group: int,
+                    payload_size: int, generator_options: Dict[str, Any], execute: bool) -> Dict[str, Any]:
+    """Генерация, сбор и выполнение тестов одним генератором"""
+    generator_class, write_capture = GENERATORS[name]
+
+    capture_path = work_dir / f"{name}_capture.json"
+    flows = write_capture(str(capture_path), groups, samples_per_group, payload_size)
+
+    output_dir = work_dir / name
+    output_dir.mkdir()
+
+    previous_cwd = os.getcwd()
+    os.chdir(output_dir)
+    try:
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator_class(str(capture_path), **generator_options).run()
+        generate_seconds = time.perf_counter() - started
+    finally:
+        os.chdir(previous_cwd)
+
+    result = {
+        'flows': flows,
+        'capture_bytes': capture_path.stat().st_size,
+        'generate_seconds': generate_seconds,
+        'generated_files': len(list(output_dir.rglob('test*.py'))),
+        'generated_bytes': directory_size(output_dir),
+    }
+
+    collect = run_pytest(['--collect-only', str(output_dir)])
+    result['collect_seconds'] = collect['seconds']
+    result['collected_tests'] = collect['counts'].get('tests collected', collect['counts'].get('test collected', 0))
+    result['bytecode_bytes'] = directory_size(output_dir, '*.pyc')
+
+    if execute:
+        execution = run_pytest([str(output_dir)])
+        result['execute_seconds'] = execution['seconds']
+        result['passed'] = execution['counts'].get('passed', 0)
+        result['failed'] = execution['counts'].get('failed', 0) + execution['counts'].get('errors', 0)
+        if execution['returncode'] not in (0, 5):
+            result['pytest_tail'] = execution['output'][-2000:]
+
+    return result
+
+
+def check_budget(results: Dict[str, Dict[str, Any]], budgets: Dict[str, float],
+                 baseline: Dict[str, Dict[str, Any]], tolerance: float) -> List[str]:
+    """Возвращает список нарушений бюджета и регрессий относительно базового прогона"""
+    violations = []
+
+    for name, metrics in results.items():
+        if metrics.get('failed'):
+            violations.append(f"{name}: упало тестов: {metrics['failed']}")
+
+        for metric in BUDGET_METRICS:
+            value = metrics.get(metric)
+            if value is None:
+                continue
+
+            limit = budgets.get(metric)
+            if limit is not None and value > limit:
+                violations.append(f"{name}: {metric} = {value:.3f} превышает бюджет {limit}")
+
+            base_value = baseline.get(name, {}).get(metric)
+            if base_value and value > base_value * (1 + tolerance):
+                violations.append(f"{name}: {metric} = {value:.3f} хуже базового {base_value:.3f} "
+                                  f"более чем на {tolerance:.0%}")
+
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк генерации и сбора сгенерированных тестов')
+    parser.add_argument('--groups', type=int, default=1000, help='Число уникальных групп (тестов) в захвате')
+    parser.add_argument('--samples-per-group', type=int, default=1, help='Число образцов в каждой группе')
+    parser.add_argument('--payload-size', type=int, default=32, help='Длина сообщения в POST /api/echo')
+    parser.add_argument('--generators', nargs='+', choices=sorted(GENERATORS), default=sorted(GENERATORS))
+    parser.add_argument('--snapshots', action='store_true', help='Генерировать тесты с внешними snapshot-файлами')
+    parser.add_argument('--no-execute', action='store_true', help='Не выполнять сгенерированные тесты')
+    parser.add_argument('--max-generate-seconds', type=float, default=None)
+    parser.add_argument('--max-collect-seconds', type=float, default=None)
+    parser.add_argument('--max-execute-seconds', type=float, default=None)
+    parser.add_argument('--max-generated-bytes', type=int, default=None)
+    parser.add_argument('--baseline', default=None, help='JSON с результатами базового прогона')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Допустимое ухудшение относительно базового')
+    parser.add_argument('--output', default=None, help='Куда сохранить результаты в JSON')
+    parser.add_argument('--keep', action='store_true', help='Не удалять рабочую папку')
+
+    args = parser.parse_args()
+
+    budgets = {
+        'generate_seconds': args.max_generate_seconds,
+        'collect_seconds': args.max_collect_seconds,
+        'execute_seconds': args.max_execute_seconds,
+        'generated_bytes': args.max_generated_bytes,
+    }
+    parameters = {
+        'groups': args.groups,
+        'samples_per_group': args.samples_per_group,
+        'payload_size': args.payload_size,
+        'snapshots': args.snapshots,
+    }
+
+    baseline = {}
+    if args.baseline:
+        baseline_report = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        baseline = baseline_report.get('results', {})
+        if baseline_report.get('parameters') != parameters:
+            print(f"⚠️ Параметры базового прогона отличаются: {baseline_report.get('parameters')}")
+
+    results = {}
+    with work_directory(args.keep) as work_dir:
+        for name in args.generators:
+            print(f"▶ {name}: {args.groups} групп x {args.samples_per_group} образцов")
+            results[name] = bench_generator(
+                name, work_dir, args.groups, args.samples_per_group, args.payload_size,
+                {'snapshots': args.snapshots}, not args.no_execute,
+            )
+            for metric, value in results[name].items():
+                if metric != 'pytest_tail':
+                    print(f"  {metric}: {value:.3f}" if isinstance(value, float) else f"  {metric}: {value}")
+
+    violations = check_budget(results, budgets, baseline, args.tolerance)
+    report = {
+        'parameters': parameters,
+        'results': results,
+        'violations': violations,
+    }
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"Результаты сохранены в {args.output}")
+
+    if violations:
+        print("\n❌ Бюджет нарушен:")
+        for violation in violations:
+            print(f"  - {violation}")
+        sys.exit(1)
+
+    print("\n✅ Бюджет соблюдён")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Сквозной бенчмарк конвейера: синтетический захват -> mitm_parser -> генераторы тестов -> pytest.
+
+Для каждого размера захвата каждая стадия выполняется в отдельном процессе,
+чтобы пиковое потребление памяти (RSS) измерялось по стадиям. Отчёт - JSON
+с временем, пропускной способностью (flows/s) и пиковым RSS каждой стадии.
+
+Использование (из корня репозитория):
+    python -m benchmarks.bench_pipeline --sizes 1000 100000 1000000 --output pipeline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from benchmarks.bench_generated_suite import REPO_ROOT, run_pytest, work_directory
+from benchmarks.synthetic import write_api_logs_json, write_mitm_capture
+
+
+def peak_rss_bytes() -> int:
+    """Пиковый RSS процесса и его дочерних процессов"""
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # В Linux ru_maxrss в килобайтах, в macOS - в байтах
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def stage_synthesize_mitm(work_dir: Path, flows: int, groups: int, payload_size: int) -> int:
+    return write_mitm_capture(str(work_dir / 'traffic.mitm'), groups, flows // groups, payload_size)
+
+
+def stage_synthesize_playwright(work_dir: Path, flows: int, groups: int, payload_size: int) -> int:
+    # Генератор Playwright использует только GET, поэтому групп берём вдвое больше
+    return write_api_logs_json(str(work_dir / 'api_calls.json'), groups * 2, flows // groups, payload_size)
+
+
+def stage_parse(work_dir: Path, output_format: str, workers: int) -> int:
+    from tests.mitm.mitm_parser import stream_to_json
+
+    _, total = stream_to_json(str(work_dir / 'traffic.mitm'), output_format, workers)
+    return total
+
+
+def stage_generate(work_dir: Path, generator: str, capture_name: str, lazy: bool) -> int:
+    if generator == 'mitm':
+        from tests.mitm.tests_generator import APITestGenerator
+        options = {'lazy': lazy}
+    else:
+        from tests.playwright.tests_generator import APITestGenerator
+        options = {}
+
+    output_dir = work_dir / f"generated_{generator}"
+    output_dir.mkdir(exist_ok=True)
+    os.chdir(output_dir)
+
+    instance = APITestGenerator(str(work_dir / capture_name), **options)
+    instance.run()
+    if hasattr(instance, 'close'):
+        instance.close()
+
+    return len(instance.endpoint_tests)
+
+
+def stage_pytest(work_dir: Path, generator: str) -> Dict[str, Any]:
+    result = run_pytest([str(work_dir / f"generated_{generator}")])
+    result.pop('output')
+    return result
+
+
+STAGES = {
+    'synthesize_mitm': stage_synthesize_mitm,
+    'synthesize_playwright': stage_synthesize_playwright,
+    'parse': stage_parse,
+    'generate': stage_generate,
+    'pytest': stage_pytest,
+}
+
+
+def run_stage_in_process(stage: str, kwargs: Dict[str, Any]) -> Tuple[Any, float, int]:
+    """Выполняется в отдельном процессе: результат стадии, время и пиковый RSS"""
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = STAGES[stage](**kwargs)
+    return result, time.perf_counter() - started, peak_rss_bytes()
+
+
+def measure(stage: str, items: int, **kwargs) -> Dict[str, Any]:
+    """Запускает стадию в свежем процессе и собирает метрики"""
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        result, seconds, rss = executor.submit(run_stage_in_process, stage, kwargs).result()
+
+    metrics = {
+        'wall_seconds': round(seconds, 4),
+        'peak_rss_bytes': rss,
+        'items': items,
+        'throughput_per_second': round(items / seconds, 1) if seconds else None,
+    }
+    if result is not None:
+        metrics['result'] = result
+
+    return metrics
+
+
+def bench_size(flows: int, max_groups: int, payload_size: int, parse_format: str, parse_workers: int,
+               lazy: bool, run_tests: bool) -> Dict[str, Any]:
+    """Прогон всего конвейера для одного размера захвата"""
+    groups = max(1, min(flows, max_groups))
+    flows = groups * (flows // groups)
+    stages = {}
+
+    with work_directory() as work_dir:
+        stages['synthesize_mitm'] = measure('synthesize_mitm', flows, work_dir=work_dir, flows=flows,
+                                            groups=groups, payload_size=payload_size)
+        stages['synthesize_mitm']['file_bytes'] = (work_dir / 'traffic.mitm').stat().st_size
+
+        stages['parse'] = measure('parse', flows, work_dir=work_dir, output_format=parse_format,
+                                  workers=parse_workers)
+        capture_name = {'json': 'traffic.json', 'jsonl': 'traffic.jsonl', 'e2c': 'traffic.e2c'}[parse_format]
+        stages['parse']['file_bytes'] = (work_dir / capture_name).stat().st_size
+
+        stages['generate_mitm'] = measure('generate', flows, work_dir=work_dir, generator='mitm',
+                                          capture_name=capture_name, lazy=lazy)
+
+        stages['synthesize_playwright'] = measure('synthesize_playwright', flows, work_dir=work_dir,
+                                                  flows=flows, groups=groups, payload_size=payload_size)
+        playwright_flows = stages['synthesize_playwright']['result']
+        stages['generate_playwright'] = measure('generate', playwright_flows, work_dir=work_dir,
+                                                generator='playwright', capture_name='api_calls.json', lazy=False)
+
+        if run_tests:
+            for generator in ('mitm', 'playwright'):
+                tests = stages[f'generate_{generator}'].get('result', 0)
+                stages[f'pytest_{generator}'] = measure('pytest', tests, work_dir=work_dir, generator=generator)
+
+    return {'flows': flows, 'groups': groups, 'stages': stages}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сквозной бенчмарк конвейера захват -> тесты -> pytest')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000], help='Размеры захватов (число flow)')
+    parser.add_argument('--max-groups', type=int, default=1000,
+                        help='Максимум уникальных групп (остальные flow - повторные образцы)')
+    parser.add_argument('--payload-size', type=int, default=32, help='Длина сообщения в POST /api/echo')
+    parser.add_argument('--parse-format', choices=['json', 'jsonl', 'e2c'], default='json')
+    parser.add_argument('--parse-workers', type=int, default=0, help='Процессов для mitm_parser (0 - без пула)')
+    parser.add_argument('--lazy', action='store_true', help='Ленивый режим генератора mitm (с --parse-format e2c)')
+    parser.add_argument('--no-pytest', action='store_true', help='Не запускать сгенерированные тесты')
+    parser.add_argument('--output', default=None, help='Куда сохранить отчёт в JSON')
+
+    args = parser.parse_args()
+
+    report = {
+        'revision': git_revision(),
+        'started_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'parameters': {key: value for key, value in vars(args).items() if key != 'output'},
+        'runs': [],
+    }
+
+    for size in args.sizes:
+        print(f"▶ {size} flow")
+        run = bench_size(size, args.max_groups, args.payload_size, args.parse_format, args.parse_workers,
+                         args.lazy, not args.no_pytest)
+        report['runs'].append(run)
+
+        for stage, metrics in run['stages'].items():
+            print(f"  {stage:<22} {metrics['wall_seconds']:>9.3f} s  "
+                  f"{metrics['throughput_per_second'] or 0:>12.1f} /s  "
+                  f"{metrics['peak_rss_bytes'] / 1024 / 1024:>8.1f} MiB")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"Отчёт сохранён в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Синтетические захваты трафика для бенчмарков.
+
+Ответы повторяют логику main.py, поэтому тесты, сгенерированные из этих
+захватов, проходят на настоящем приложении.
+"""
+
+import json
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+BASE_URL = "http://localhost:7777"
+START_TIME = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def greeting(name: str) -> str:
+    """Ответ /api/greetings"""
+    return f"Привет, {name}! Как дела?)"
+
+
+def echo_message(message: str) -> str:
+    """Ответ /api/echo (как в main.get_echo)"""
+    uppercase_text = message.upper()
+    parts = [uppercase_text]
+    for i in range(1, 3):
+        parts.append(uppercase_text[:len(uppercase_text) - i] + "...")
+    return " → ".join(parts)
+
+
+def iter_requests(groups: int, samples_per_group: int = 1, payload_size: int = 32,
+                  seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Описания запросов: groups уникальных комбинаций эндпоинт+параметры,
+    каждая повторяется samples_per_group раз (повторы идут вперемешку)
+
+    Args:
+        groups: Число уникальных групп
+        samples_per_group: Число образцов в каждой группе
+        payload_size: Длина сообщения для /api/echo (ответ примерно втрое длиннее)
+        seed: Зерно генератора длительностей
+    """
+    rng = random.Random(seed)
+    timestamp = START_TIME
+
+    for sample in range(samples_per_group):
+        for i in range(groups):
+            if i == 0:
+                request = {'method': 'GET', 'path': '/api/farewells', 'body': None,
+                           'response': {'status': 200, 'message': 'Пока-пока'}}
+            elif i % 2:
+                name = f"user{i}"
+                request = {'method': 'GET', 'path': f'/api/greetings?name={name}', 'body': None,
+                           'response': greeting(name)}
+            else:
+                message = (f"message {i} " * (payload_size // 10 + 1))[:payload_size]
+                request = {'method': 'POST', 'path': '/api/echo', 'body': {'message': message},
+                           'response': {'status': 200, 'message': echo_message(message)}}
+
+            request['timestamp'] = timestamp
+            request['duration'] = rng.uniform(0.002, 0.02)
+            timestamp += timedelta(milliseconds=rng.randint(1, 50))
+            yield request
+
+
+def to_mitm_transaction(index: int, request: Dict[str, Any]) -> Dict[str, Any]:
+    """Транзакция в формате mitm_parser"""
+    request_body = json.dumps(request['body'], ensure_ascii=False) if request['body'] is not None else None
+    response_body = json.dumps(request['response'], ensure_ascii=False)
+    started = request['timestamp'].timestamp()
+    finished = started + request['duration']
+
+    request_info = {
+        "method": request['method'],
+        "url": BASE_URL + request['path'],
+        "path": request['path'],
+        "http_version": "HTTP/1.1",
+        "headers": {"Content-Type": "application/json"} if request_body else {},
+        "timestamp": started,
+        "timestamp_iso": request['timestamp'].isoformat(),
+    }
+    if request_body:
+        request_info["body_text"] = request_body
+        request_info["body_size"] = len(request_body.encode('utf-8'))
+
+    return {
+        "id": f"flow_{index:06d}",
+        "request": request_info,
+        "response": {
+            "status_code": 200,
+            "reason": "OK",
+            "http_version": "HTTP/1.1",
+            "headers": {"content-type": "application/json"},
+            "timestamp": finished,
+            "timestamp_iso": datetime.fromtimestamp(finished).isoformat(),
+            "body_text": response_body,
+            "body_size": len(response_body.encode('utf-8')),
+        },
+        "duration": request['duration'],
+    }
+
+
+def to_api_log(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Запись в формате api_recorder"""
+    return {
+        'timestamp': request['timestamp'].isoformat(),
+        'url': BASE_URL + request['path'],
+        'method': request['method'],
+        'request': {
+            'headers': {},
+            'body': json.dumps(request['body'], ensure_ascii=False) if request['body'] is not None else None,
+        },
+        'response': {
+            'status': 200,
+            'headers': {'content-type': 'application/json'},
+            'body': json.dumps(request['response'], ensure_ascii=False),
+            'is_binary': False,
+            'content_type': 'application/json',
+        },
+        'duration': request['duration'],
+    }
+
+
+def write_json_array(path: str, items: Iterable[Dict[str, Any]], key: Optional[str] = None,
+                     metadata: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Потоково пишет JSON-массив (или объект {key: [...], "metadata": ...}).
+    Возвращает число записанных элементов
+    """
+    total = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"%s": [' % key if key else '[')
+        for item in items:
+            f.write(('\n' if total == 0 else ',\n') + json.dumps(item, ensure_ascii=False))
+            total += 1
+        f.write('\n]')
+        if key:
+            f.write(', "metadata": ' + json.dumps(dict(metadata or {}, total_transactions=total)) + '}')
+        f.write('\n')
+
+    return total
+
+
+def write_mitm_json(path: str, groups: int, samples_per_group: int = 1, payload_size: int = 32) -> int:
+    """Синтетический JSON в формате mitm_parser (только HTTP-совместимые эндпоинты main.py)"""
+    requests = iter_requests(groups, samples_per_group, payload_size)
+    transactions = (to_mitm_transaction(i, request) for i, request in enumerate(requests))
+    return write_json_array(path, transactions, 'transactions', {'source_file': 'synthetic'})
+
+
+def write_api_logs_json(path: str, groups: int, samples_per_group: int = 1, payload_size: int = 32) -> int:
+    """
+    Синтетический JSON в формате api_recorder. Генератор Playwright не передаёт
+    тела запросов, поэтому POST /api/echo в этот захват не попадает
+    """
+    requests = (r for r in iter_requests(groups, samples_per_group, payload_size) if r['method'] == 'GET')
+    return write_json_array(path, (to_api_log(request) for request in requests))
+
+
+def write_mitm_capture(path: str, groups: int, samples_per_group: int = 1, payload_size: int = 32) -> int:
+    """Синтетический файл .mitm (нужен установленный mitmproxy)"""
+    from mitmproxy import connection, http
+    from mitmproxy import io as mitm_io
+
+    total = 0
+    with open(path, 'wb') as f:
+        writer = mitm_io.FlowWriter(f)
+
+        for request in iter_requests(groups, samples_per_group, payload_size):
+            started = request['timestamp'].timestamp()
+            finished = started + request['duration']
+
+            client = connection.Client(peername=("127.0.0.1", 50000), sockname=("127.0.0.1", 8080),
+                                       timestamp_start=started)
+            server = connection.Server(address=("localhost", 7777))
+            flow = http.HTTPFlow(client, server)
+
+            content = json.dumps(request['body'], ensure_ascii=False) if request['body'] is not None else b''
+            headers = {"Content-Type": "application/json"} if request['body'] is not None else {}
+            flow.request = http.Request.make(request['method'], BASE_URL + request['path'], content, headers)
+            flow.request.timestamp_start = started
+            flow.request.timestamp_end = started
+
+            flow.response = http.Response.make(200, json.dumps(request['response'], ensure_ascii=False),
+                                               {"content-type": "application/json"})
+            flow.response.timestamp_start = finished
+            flow.response.timestamp_end = finished
+
+            writer.add(flow)
+            total += 1
+
+    return total
@@ -0,0 +1,148 @@
+"""
+Контентно-адресуемое хранилище тел запросов и ответов.
+
+Каждое тело сохраняется один раз в файл <root>/<ab>/<cdef...>, где имя - sha256
+от сырых байт. В транзакции вместо тела остаётся ссылка {"$sha256": хэш, "encoding": ...},
+поэтому повторяющиеся ответы (одна и та же HTML-страница, один и тот же файл)
+занимают место на диске и в памяти генератора только один раз.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from tests.common.capture_container import (
+    BODY_KEYS, BODY_SECTIONS, LazyBody, body_encoding, decode_body, encode_body
+)
+
+# Тела меньше этого размера дешевле хранить прямо в транзакции
+MIN_STORED_SIZE = 64
+
+DEFAULT_STORE_NAME = 'blobs'
+
+
+class BodyStore:
+    def __init__(self, root: str):
+        """
+        Хранилище тел на диске
+
+        Args:
+            root: Папка хранилища (создаётся при необходимости)
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.bodies_written = 0
+        self.bytes_deduplicated = 0
+
+    def path_for(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:]
+
+    def __contains__(self, digest: str) -> bool:
+        return self.path_for(digest).exists()
+
+    def put(self, raw: bytes) -> str:
+        """Сохраняет тело (если его ещё нет) и возвращает его sha256"""
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self.path_for(digest)
+
+        if path.exists():
+            self.bytes_deduplicated += len(raw)
+            return digest
+
+        path.parent.mkdir(exist_ok=True)
+        # Пишем во временный файл и переименовываем, чтобы не оставить обрезанное тело
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(raw)
+        os.replace(tmp_path, path)
+        self.bodies_written += 1
+
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        return self.path_for(digest).read_bytes()
+
+
+def externalize_bodies(entry: Dict[str, Any], store: BodyStore) -> Dict[str, Any]:
+    """Переносит тела транзакции в хранилище, оставляя ссылки по хэшу"""
+    for section_name in BODY_SECTIONS:
+        section = entry.get(section_name)
+        if not isinstance(section, dict):
+            continue
+
+        for key in BODY_KEYS:
+            value = section.get(key)
+            if not isinstance(value, str) or len(value) < MIN_STORED_SIZE:
+                continue
+
+            encoding = body_encoding(section, key)
+            raw = encode_body(value, encoding)
+            if raw is not None:
+                section[key] = {'$sha256': store.put(raw), 'encoding': encoding}
+
+    return entry
+
+
+class BodyResolver:
+    def __init__(self, store_root: Optional[str], lazy: bool = False):
+        """
+        Подстановка тел по ссылкам из хранилища.
+        Одинаковые тела декодируются один раз и разделяют один объект строки
+
+        Args:
+            store_root: Папка хранилища
+            lazy: Подставлять LazyBody, читающее тело из хранилища только при обращении
+        """
+        self.store_root = store_root
+        self.lazy = lazy
+        self._store = None
+        self._cache = {}
+
+    def resolve(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Подставляет тела вместо ссылок {"$sha256": ...}"""
+        for section_name in BODY_SECTIONS:
+            section = entry.get(section_name)
+            if not isinstance(section, dict):
+                continue
+
+            for key in BODY_KEYS:
+                ref = section.get(key)
+                if isinstance(ref, dict) and '$sha256' in ref:
+                    if self.lazy:
+                        section[key] = LazyBody(self.read, ref['$sha256'], ref['encoding'])
+                    else:
+                        section[key] = self.get_body(ref['$sha256'], ref['encoding'])
+
+        return entry
+
+    def read(self, digest: str) -> bytes:
+        """Читает сырые байты тела из хранилища"""
+        if self._store is None:
+            if not self.store_root or not Path(self.store_root).is_dir():
+                raise FileNotFoundError(f"Хранилище тел не найдено: {self.store_root}")
+            self._store = BodyStore(self.store_root)
+
+        return self._store.get(digest)
+
+    def get_body(self, digest: str, encoding: str) -> str:
+        cache_key = (digest, encoding)
+        if cache_key not in self._cache:
+            self._cache[cache_key] = decode_body(self.read(digest), encoding)
+
+        return self._cache[cache_key]
+
+
+def find_store_root(capture_path: str, metadata: Optional[Dict[str, Any]] = None,
+                    explicit_root: Optional[str] = None) -> str:
+    """
+    Определяет папку хранилища для файла захвата: явно указанная,
+    из метаданных (относительно файла захвата) или <папка захвата>/blobs
+    """
+    if explicit_root:
+        return explicit_root
+
+    capture_dir = Path(capture_path).resolve().parent
+    if metadata and metadata.get('blob_store'):
+        return str(capture_dir / metadata['blob_store'])
+
+    return str(capture_dir / DEFAULT_STORE_NAME)
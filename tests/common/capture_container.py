@@ -0,0 +1,387 @@
+"""
+Компактный бинарный контейнер для захваченного трафика.
+
+Файл состоит из заголовка и последовательности записей с префиксом длины:
+    <kind: 1 байт><codec: 1 байт><length: 8 байт><payload>
+
+Транзакции хранятся как JSON, а тела запросов/ответов вынесены в отдельные
+записи с сырыми байтами (без base64) и заменены ссылкой {"$blob": смещение}.
+Одинаковые тела записываются один раз (по sha256), записи опционально сжимаются zlib.
+
+Использование: python capture_container.py файл.json [--compress] [--output файл.e2c] [--force]
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b'E2EC'
+VERSION = 1
+CONTAINER_SUFFIX = '.e2c'
+# Заголовок файла: MAGIC и байт версии
+FILE_HEADER_SIZE = len(MAGIC) + 1
+
+RECORD_HEADER = struct.Struct('<BBQ')
+
+RECORD_METADATA = 1
+RECORD_ENTRY = 2
+RECORD_BLOB = 3
+
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+
+# Ключи тел в транзакциях mitm_parser (body_text/body_base64) и в записях api_recorder (body)
+BODY_KEYS = ('body_text', 'body_base64', 'body')
+BODY_SECTIONS = ('request', 'response')
+
+# Тела меньше этого размера выгоднее оставить внутри JSON
+MIN_BLOB_SIZE = 64
+
+
+def is_container(file_path: str) -> bool:
+    """Проверяет, является ли файл бинарным контейнером"""
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def body_encoding(section: Dict[str, Any], key: str) -> str:
+    """Определяет, как тело представлено в JSON: текстом или base64"""
+    if key == 'body_base64' or (key == 'body' and section.get('is_binary')):
+        return 'base64'
+    return 'text'
+
+
+def encode_body(value: str, encoding: str) -> Optional[bytes]:
+    """Переводит тело из JSON-представления в сырые байты (None - если без потерь нельзя)"""
+    if encoding == 'text':
+        return value.encode('utf-8', errors='surrogatepass')
+
+    try:
+        raw = base64.b64decode(value, validate=True)
+    except ValueError:
+        return None
+
+    # base64 с переносами строк или нестандартным паддингом не восстановится байт в байт
+    if base64.b64encode(raw).decode('ascii') != value:
+        return None
+    return raw
+
+
+def decode_body(raw: bytes, encoding: str) -> str:
+    """Восстанавливает JSON-представление тела из сырых байт"""
+    if encoding == 'text':
+        return raw.decode('utf-8', errors='surrogatepass')
+    return base64.b64encode(raw).decode('ascii')
+
+
+class LazyBody:
+    """Тело, которое читается из файла только при обращении к нему"""
+
+    __slots__ = ('loader', 'key', 'encoding')
+
+    def __init__(self, loader: Callable[[Any], bytes], key: Any, encoding: str):
+        self.loader = loader
+        self.key = key
+        self.encoding = encoding
+
+    def value(self) -> str:
+        return decode_body(self.loader(self.key), self.encoding)
+
+    def raw(self) -> bytes:
+        """Исходные байты тела без перекодирования в base64"""
+        return self.loader(self.key)
+
+    def __repr__(self):
+        return f"LazyBody({self.key!r}, {self.encoding!r})"
+
+
+def materialize(value: Any) -> Any:
+    """Возвращает значение тела, читая его из файла, если оно ленивое"""
+    if isinstance(value, LazyBody):
+        return value.value()
+    return value
+
+
+class CaptureContainerWriter:
+    def __init__(self, file_path: str, compress: bool = False):
+        """
+        Инкрементальная запись контейнера
+
+        Args:
+            file_path: Путь к выходному файлу
+            compress: Сжимать записи zlib
+        """
+        self.file_path = file_path
+        self.compress = compress
+        self.entries_written = 0
+        self.bytes_deduplicated = 0
+        self._blob_offsets = {}
+        self._file = open(file_path, 'wb')
+        self._file.write(MAGIC + bytes([VERSION]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _write_record(self, kind: int, payload: bytes) -> int:
+        """Пишет запись и возвращает её смещение в файле"""
+        codec = CODEC_RAW
+        if self.compress and len(payload) >= MIN_BLOB_SIZE:
+            compressed = zlib.compress(payload, 6)
+            if len(compressed) < len(payload):
+                payload, codec = compressed, CODEC_ZLIB
+
+        offset = self._file.tell()
+        self._file.write(RECORD_HEADER.pack(kind, codec, len(payload)))
+        self._file.write(payload)
+        return offset
+
+    def write_blob(self, raw: bytes) -> int:
+        """Пишет тело отдельной записью и возвращает ссылку на неё. Повторные тела не дублируются"""
+        digest = hashlib.sha256(raw).digest()
+        if digest in self._blob_offsets:
+            self.bytes_deduplicated += len(raw)
+            return self._blob_offsets[digest]
+
+        offset = self._write_record(RECORD_BLOB, raw)
+        self._blob_offsets[digest] = offset
+        return offset
+
+    def write_entry(self, entry: Dict[str, Any]):
+        """Пишет транзакцию, вынося крупные тела в отдельные записи"""
+        entry = dict(entry)
+
+        for section_name in BODY_SECTIONS:
+            section = entry.get(section_name)
+            if not isinstance(section, dict):
+                continue
+
+            for key in BODY_KEYS:
+                value = section.get(key)
+                if not isinstance(value, str) or len(value) < MIN_BLOB_SIZE:
+                    continue
+
+                encoding = body_encoding(section, key)
+                raw = encode_body(value, encoding)
+                if raw is None:
+                    continue
+
+                section = dict(section)
+                section[key] = {'$blob': self.write_blob(raw), 'encoding': encoding}
+                entry[section_name] = section
+
+        payload = json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str)
+        self._write_record(RECORD_ENTRY, payload.encode('utf-8'))
+        self.entries_written += 1
+
+    def write_metadata(self, metadata: Dict[str, Any]):
+        """Пишет метаданные (допускается в любом месте файла, например в конце)"""
+        payload = json.dumps(metadata, ensure_ascii=False, default=str)
+        self._write_record(RECORD_METADATA, payload.encode('utf-8'))
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class CaptureContainerReader:
+    def __init__(self, file_path: str, lazy: bool = False):
+        """
+        Чтение контейнера через mmap: тела читаются по ссылкам только при обращении
+
+        Args:
+            file_path: Путь к файлу контейнера
+            lazy: Не подставлять тела при чтении, а отдавать LazyBody.
+                Читатель должен оставаться открытым, пока тела используются
+        """
+        self.file_path = file_path
+        self.lazy = lazy
+        self.metadata = {}
+        self._bodies = {}
+        self._file = open(file_path, 'rb')
+        try:
+            # mmap пустого файла невозможен, поэтому размер проверяется заранее
+            if os.fstat(self._file.fileno()).st_size < FILE_HEADER_SIZE:
+                raise ValueError(f"{file_path} не является контейнером захвата E2EC: файл короче заголовка")
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._file.close()
+            raise
+
+        if self._buffer[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{file_path} не является контейнером захвата E2EC")
+        version = self._buffer[len(MAGIC)]
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"Неподдерживаемая версия контейнера: {version}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def read_record(self, offset: int) -> Tuple[int, bytes, int]:
+        """Читает запись по смещению. Возвращает тип, данные и смещение следующей записи"""
+        kind, codec, length = RECORD_HEADER.unpack_from(self._buffer, offset)
+        start = offset + RECORD_HEADER.size
+        payload = self._buffer[start:start + length]
+
+        if codec == CODEC_ZLIB:
+            payload = zlib.decompress(payload)
+
+        return kind, payload, start + length
+
+    def read_blob(self, offset: int) -> bytes:
+        """Возвращает сырые байты тела по ссылке"""
+        kind, payload, _ = self.read_record(offset)
+        if kind != RECORD_BLOB:
+            raise ValueError(f"По смещению {offset} нет тела")
+        return payload
+
+    def resolve_bodies(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Подставляет в транзакцию тела вместо ссылок"""
+        for section_name in BODY_SECTIONS:
+            section = entry.get(section_name)
+            if not isinstance(section, dict):
+                continue
+
+            for key in BODY_KEYS:
+                ref = section.get(key)
+                if isinstance(ref, dict) and '$blob' in ref:
+                    if self.lazy:
+                        section[key] = LazyBody(self.read_blob, ref['$blob'], ref['encoding'])
+                    else:
+                        section[key] = self.get_body(ref['$blob'], ref['encoding'])
+
+        return entry
+
+    def get_body(self, offset: int, encoding: str) -> str:
+        """Возвращает тело по ссылке; одинаковые тела разделяют один объект строки"""
+        cache_key = (offset, encoding)
+        if cache_key not in self._bodies:
+            self._bodies[cache_key] = decode_body(self.read_blob(offset), encoding)
+        return self._bodies[cache_key]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Итерирует транзакции в порядке записи"""
+        offset = FILE_HEADER_SIZE
+        size = len(self._buffer)
+
+        while offset < size:
+            if offset + RECORD_HEADER.size > size:
+                raise ValueError(f"{self.file_path}: контейнер обрезан на смещении {offset}")
+            kind, codec, length = RECORD_HEADER.unpack_from(self._buffer, offset)
+
+            if kind == RECORD_BLOB:
+                # Тела пропускаем без чтения - они подгружаются по ссылкам
+                offset += RECORD_HEADER.size + length
+                continue
+
+            kind, payload, offset = self.read_record(offset)
+            record = json.loads(payload)
+
+            if kind == RECORD_METADATA:
+                self.metadata.update(record)
+            elif kind == RECORD_ENTRY:
+                yield self.resolve_bodies(record)
+
+    def close(self):
+        if not self._buffer.closed:
+            self._buffer.close()
+        self._file.close()
+
+
+def load_container(file_path: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Загружает все транзакции контейнера и его метаданные"""
+    with CaptureContainerReader(file_path) as reader:
+        entries = list(reader)
+        return reader.metadata, entries
+
+
+def convert_json_to_container(json_file_path: str, compress: bool = False, output_path: Optional[str] = None,
+                              overwrite: bool = False) -> str:
+    """
+    Конвертирует JSON (вывод mitm_parser или api_recorder) или JSON Lines в контейнер
+
+    Args:
+        json_file_path: Путь к JSON/JSON Lines файлу с захватом
+        compress: Сжимать записи zlib
+        output_path: Путь к контейнеру (по умолчанию - рядом с исходным файлом, с суффиксом .e2c)
+        overwrite: Перезаписать существующий контейнер
+
+    Raises:
+        FileExistsError: Контейнер уже существует, а overwrite не задан
+    """
+    input_path = Path(json_file_path)
+    output_path = Path(output_path) if output_path else input_path.with_suffix(CONTAINER_SUFFIX)
+    if output_path.exists() and not overwrite:
+        raise FileExistsError(f"{output_path} уже существует")
+
+    with open(input_path, 'r', encoding='utf-8') as f:
+        if input_path.suffix == '.jsonl':
+            metadata = {}
+            entries = []
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if 'metadata' in record and 'request' not in record:
+                        metadata = record['metadata']
+                    else:
+                        entries.append(record)
+        else:
+            data = json.load(f)
+            if isinstance(data, list):
+                metadata, entries = {}, data
+            else:
+                metadata, entries = data.get('metadata', {}), data.get('transactions', [])
+
+    with CaptureContainerWriter(str(output_path), compress) as writer:
+        for entry in entries:
+            writer.write_entry(entry)
+        if metadata:
+            writer.write_metadata(metadata)
+
+    return str(output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Конвертация JSON-захвата в бинарный контейнер')
+    parser.add_argument('json_file', help='Путь к JSON/JSON Lines файлу с захватом')
+    parser.add_argument('--compress', action='store_true', help='Сжимать записи zlib')
+    parser.add_argument('--output', default=None,
+                        help=f'Путь к контейнеру (по умолчанию - рядом с исходным файлом, с суффиксом {CONTAINER_SUFFIX})')
+    parser.add_argument('--force', action='store_true', help='Перезаписать существующий контейнер')
+
+    args = parser.parse_args()
+
+    if not Path(args.json_file).exists():
+        print(f"Ошибка: файл {args.json_file} не найден!")
+        sys.exit(1)
+
+    try:
+        output_file = convert_json_to_container(args.json_file, args.compress, args.output, args.force)
+    except FileExistsError as e:
+        print(f"Ошибка: {e}! Укажите другой путь через --output или перезапишите его с --force")
+        sys.exit(1)
+
+    print(f"✅ Контейнер сохранён в: {output_file}")
+    print(f"   Размер: {Path(output_file).stat().st_size} байт (исходный: {Path(args.json_file).stat().st_size} байт)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+Общая часть генераторов тестов (mitm и Playwright).
+
+Здесь - всё, что не зависит от формата захвата: разбор query-параметров,
+рендеринг ожидаемых данных и проверок (snapshot-файлы, изменчивые поля,
+бюджет задержки, статистика групп), манифест инкрементальной генерации и
+параллельная запись файлов ресурсов. Генераторы отвечают за загрузку захвата,
+группировку и тело тестовой функции.
+"""
+
+import copy
+import inspect
+import io
+import json
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote
+
+from tests.common.group_stats import format_path
+from tests.common.instrumentation import Instrumentation
+from tests.common.literal_emitter import write_literal
+from tests.common.manifest import GenerationManifest, fingerprint, source_fingerprint
+from tests.common.snapshots import (
+    SNAPSHOT_IMPORTS, SNAPSHOTS_DIR_NAME, clear_snapshots, list_snapshots, should_snapshot, write_snapshot
+)
+from tests.common.stats import latency_budget
+from tests.common.volatile import VolatileFields, volatile_fields
+
+# До этого размера тестовые функции файла со snapshot-файлами буферизуются в памяти, дальше - во временном файле
+RENDER_SPOOL_SIZE = 1024 * 1024
+
+
+class BaseTestGenerator:
+    """
+    Общие методы генераторов. Наследник задаёт в __init__ атрибуты параметров генерации
+    (snapshots, latency_factor, stats_comments, mask_volatile, workers, ...) и реализует
+    create_test_function_name и write_test_function
+    """
+
+    def materialize_sample(self, sample: Dict[str, Any]) -> Dict[str, Any]:
+        """Образец, попадающий в тест, со всеми данными (по умолчанию образцы уже полные)"""
+        return sample
+
+    def test_function_name(self, test_data: Dict[str, Any]) -> str:
+        """Базовое имя тестовой функции группы"""
+        return self.create_test_function_name(test_data['endpoint'], test_data['method'], test_data['params'])
+
+    def parse_value(self, value: str) -> Any:
+        """Парсинг строкового значения в Python-тип"""
+        if value == "":
+            return ""
+        elif value.lower() == "null":
+            return None
+        elif value.lower() == "true":
+            return True
+        elif value.lower() == "false":
+            return False
+        elif value.isdigit():
+            # Целое число
+            return int(value)
+        elif value.replace('.', '', 1).isdigit() and value.count('.') == 1:
+            # Вещественное число
+            return float(value)
+        else:
+            # Строка - возвращаем как есть
+            return value
+
+    def parse_query_params(self, query_string: str) -> Dict[str, Any]:
+        """Парсинг query параметров с декодированием URL и преобразованием типов"""
+        params = {}
+        try:
+            for param in query_string.split('&'):
+                if '=' in param:
+                    key, value = param.split('=', 1)
+                    # Декодируем URL-encoded значения
+                    key = unquote(key)
+                    value = unquote(value)
+                    # Парсим значение в Python-тип
+                    params[key] = self.parse_value(value)
+        except:
+            pass
+        return params
+
+    def generate_test_imports(self, volatile: bool = False, snapshots: bool = False) -> str:
+        """
+        Генерация импортов для тестового файла
+
+        Args:
+            volatile: В файле есть сравнение с изменчивыми полями
+            snapshots: Файл читает ожидаемые данные из snapshot-файлов
+        """
+        if snapshots:
+            imports = SNAPSHOT_IMPORTS
+        else:
+            imports = '''import json
+from http import HTTPStatus
+
+import pytest
+
+'''
+        if volatile:
+            imports = imports.replace(
+                'import pytest\n', 'import pytest\n\nfrom tests.common.volatile import assert_json_matches\n', 1
+            )
+        # Перед первой тестовой функцией - две пустые строки
+        return imports.rstrip('\n') + '\n\n\n'
+
+    def generate_expected_data(self, sample: Dict[str, Any]) -> str:
+        """Генерация строки с ожидаемыми данными"""
+        out = io.StringIO()
+        self.write_expected_data(sample, out)
+        return out.getvalue()
+
+    def write_expected_data(self, sample: Dict[str, Any], out, snapshot: Optional[Tuple[Path, str]] = None):
+        """
+        Потоковая запись ожидаемых данных (литерал после "    expected = ").
+        snapshot - папка и имя snapshot-файла, если крупные данные нужно вынести из кода теста
+        """
+        response_data = sample['response_data']
+
+        if snapshot and should_snapshot(response_data, self.snapshot_min_size):
+            snapshots_dir, name = snapshot
+            write_snapshot(snapshots_dir, name, response_data)
+            out.write(f'load_snapshot("{name}")')
+            return
+
+        write_literal(response_data, out, '    ', len('    expected = '))
+
+    def group_latency_budget(self, test_data: Dict[str, Any]) -> Optional[float]:
+        """Бюджет задержки группы по длительностям всех её образцов"""
+        if not self.latency_factor:
+            return None
+        return latency_budget(test_data['stats'].durations.quantile(95), self.latency_factor, self.latency_floor)
+
+    def group_volatile_fields(self, test_data: Dict[str, Any]) -> VolatileFields:
+        """Поля ответа, которые различаются между образцами группы"""
+        fields = test_data['stats'].fields
+        if not self.mask_volatile or fields is None or fields.samples < 2:
+            return {}
+        return volatile_fields(fields)
+
+    def generate_json_assertion(self, test_data: Dict[str, Any]) -> str:
+        """Сравнение JSON-ответа с ожидаемым: точное или с проверкой изменчивых полей только по типу"""
+        volatile = self.group_volatile_fields(test_data)
+        if not volatile:
+            return '    assert json.loads(response.content.decode()) == expected'
+
+        lines = ['    # Поля, различающиеся между образцами группы: проверяется только тип',
+                 '    volatile = {']
+        for path, (types, optional) in volatile.items():
+            lines.append(f'        {path!r}: ({types!r}, {optional}),')
+        lines.append('    }')
+        lines.append('    assert_json_matches(json.loads(response.content.decode()), expected, volatile)')
+        return '\n'.join(lines)
+
+    def generate_stats_comment(self, test_data: Dict[str, Any]) -> str:
+        """Комментарий со статистикой группы (пустая строка, если выключен)"""
+        if not self.stats_comments:
+            return ''
+        return f"    # Статистика группы: {test_data['stats'].summary_comment()}\n"
+
+    def save_stats_report(self, path: str):
+        """Отчёт со статистикой всех групп в JSON"""
+        report = [
+            {
+                'endpoint': test_data['endpoint'],
+                'method': test_data['method'],
+                'params': test_data['params'],
+                **test_data['stats'].report(),
+            }
+            for test_data in self.endpoint_tests.values()
+        ]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+        print(f"Статистика групп сохранена в {path}")
+
+    def generate_latency_assertion(self, test_data: Dict[str, Any]) -> str:
+        """Проверка задержки ответа (пустая строка, если проверка выключена или длительности не записаны)"""
+        budget = self.group_latency_budget(test_data)
+        if budget is None:
+            return ''
+
+        return (f'    # Бюджет задержки: p95 записанных длительностей группы x {self.latency_factor}, '
+                f'не менее {self.latency_floor} с\n'
+                f'    assert response.elapsed.total_seconds() < {budget:.4f}\n')
+
+    def generate_test_function(self, test_data: Dict[str, Any]) -> str:
+        """Генерация тестовой функции для эндпоинта"""
+        out = io.StringIO()
+        self.write_test_function(test_data, out)
+        return out.getvalue()
+
+    def create_directory_structure(self, resource_tests: Dict[str, List]) -> Dict[str, Path]:
+        """Создание структуры папок для тестов"""
+        current_dir = Path.cwd()
+        test_dirs = {}
+
+        for resource in resource_tests.keys():
+            resource_dir = current_dir / resource
+            resource_dir.mkdir(exist_ok=True)
+            test_dirs[resource] = resource_dir
+
+        return test_dirs
+
+    def unique_test_names(self, tests: List[Dict[str, Any]]) -> List[str]:
+        """Имена тестовых функций файла: совпавшие имена получают числовой суффикс, чтобы тесты не затирали друг друга"""
+        names = []
+        used = set()
+        for test_data in tests:
+            base_name = self.test_function_name(test_data)
+            name = base_name
+            suffix = 1
+            while name in used:
+                suffix += 1
+                name = f"{base_name}_{suffix}"
+            used.add(name)
+            names.append(name)
+        return names
+
+    def test_file_name(self, resource: str) -> str:
+        """Имя тестового файла ресурса - test_<ресурс>.py или просто test.py если имя слишком длинное"""
+        if len(resource) > 30:
+            return "test.py"
+        return f"test_{resource}.py"
+
+    def save_test_file(self, resource: str, tests: List[Dict[str, Any]], resource_dir: Path):
+        """Сохранение тестового файла"""
+        file_name = self.test_file_name(resource)
+
+        volatile = any(self.group_volatile_fields(test_data) for test_data in tests)
+
+        tests_sorted = sorted(tests, key=lambda x: (
+            x['endpoint'],
+            bool(x.get('request_body')),
+            tuple(sorted(x['params'].items()))
+        ))
+
+        file_path = resource_dir / file_name
+        snapshots_dir = resource_dir / SNAPSHOTS_DIR_NAME if self.snapshots else None
+
+        with open(file_path, 'w', encoding='utf-8') as f:
+            if snapshots_dir is None:
+                f.write(self.generate_test_imports(volatile))
+                self.write_test_functions(tests_sorted, f)
+            else:
+                # Загрузчик snapshot-файлов нужен, только если записан хотя бы один snapshot,
+                # а это известно лишь после рендеринга - поэтому функции сначала пишутся в буфер
+                clear_snapshots(snapshots_dir)
+                with tempfile.SpooledTemporaryFile(RENDER_SPOOL_SIZE, 'w+', encoding='utf-8') as body:
+                    self.write_test_functions(tests_sorted, body, snapshots_dir)
+                    f.write(self.generate_test_imports(volatile, bool(list_snapshots(snapshots_dir))))
+                    body.seek(0)
+                    shutil.copyfileobj(body, f)
+        print(f"Создан тестовый файл: {file_path}")
+
+        return file_path
+
+    def write_test_functions(self, tests: List[Dict[str, Any]], out, snapshots_dir: Optional[Path] = None):
+        """Потоковая запись тестовых функций файла"""
+        names = self.unique_test_names(tests)
+        for i, test_data in enumerate(tests):
+            if i:
+                out.write("\n\n")
+            self.write_test_function(test_data, out, snapshots_dir, i, names[i])
+
+    def generation_options(self) -> Dict[str, Any]:
+        """Параметры, влияющие на содержимое сгенерированных файлов"""
+        generator_file = inspect.getfile(type(self))
+        return {
+            'generator': Path(generator_file).name,
+            'source': source_fingerprint(generator_file),
+            'snapshots': self.snapshot_min_size if self.snapshots else None,
+            'latency': [self.latency_factor, self.latency_floor] if self.latency_factor else None,
+            'stats_comments': self.stats_comments,
+            'mask_volatile': self.mask_volatile,
+        }
+
+    def group_render_data(self, test_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Данные, из которых рендерится тест группы (время и длительность образца на тест не влияют)"""
+        sample = self.materialize_sample(test_data['samples'][0])
+        rendered = {key: value for key, value in sample.items() if key not in ('timestamp', 'url', 'duration')}
+        rendered['latency_budget'] = self.group_latency_budget(test_data)
+        rendered['stats'] = self.generate_stats_comment(test_data)
+        rendered['volatile'] = {format_path(path): spec for path, spec in self.group_volatile_fields(test_data).items()}
+        return rendered
+
+    def group_fingerprint(self, test_data: Dict[str, Any]) -> str:
+        """Отпечаток данных, из которых рендерится тест группы"""
+        return fingerprint(self.group_render_data(test_data))
+
+    def resource_fingerprints(self, tests: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Отпечатки всех групп ресурса по ключу группы"""
+        return {repr(test_data['group_key']): self.group_fingerprint(test_data) for test_data in tests}
+
+    def worker_copy(self) -> 'BaseTestGenerator':
+        """Копия генератора для процесса-воркера без групп (наследники очищают загруженный захват)"""
+        clone = copy.copy(self)
+        clone.endpoint_tests = {}
+        # Метрики воркера не возвращаются в основной процесс, профилировщик не сериализуется
+        clone.metrics = Instrumentation()
+        return clone
+
+    def render_payload(self, tests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Данные групп для рендеринга в воркере: только образец, попадающий в тест"""
+        return [dict(test_data, samples=[self.materialize_sample(test_data['samples'][0])]) for test_data in tests]
+
+    def render_resources(self, resources: List[Tuple[str, List[Dict[str, Any]]]],
+                         test_dirs: Dict[str, Path]) -> Iterator[Tuple[str, Optional[Path]]]:
+        """
+        Рендеринг и запись файлов ресурсов, последовательно или пулом процессов.
+        Результаты отдаются в исходном порядке ресурсов
+        """
+        if self.workers <= 1 or len(resources) <= 1:
+            for resource, tests in resources:
+                try:
+                    yield resource, self.save_test_file(resource, tests, test_dirs[resource])
+                except Exception as e:
+                    print(f"Ошибка при генерации тестов для ресурса {resource}: {e}")
+                    yield resource, None
+            return
+
+        worker = self.worker_copy()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                (resource, executor.submit(render_resource, worker, resource,
+                                           self.render_payload(tests), test_dirs[resource]))
+                for resource, tests in resources
+            ]
+
+            for resource, future in futures:
+                try:
+                    yield resource, future.result()
+                except Exception as e:
+                    print(f"Ошибка при генерации тестов для ресурса {resource}: {e}")
+                    yield resource, None
+
+    def write_resources(self, resource_tests: Dict[str, List[Dict[str, Any]]],
+                        test_dirs: Dict[str, Path]) -> Tuple[List[Path], int]:
+        """
+        Запись файлов ресурсов; в инкрементальном режиме неизменённые по манифесту ресурсы пропускаются
+
+        Returns:
+            Записанные файлы и число пропущенных
+        """
+        manifest = GenerationManifest(self.manifest_path, self.generation_options()) if self.incremental else None
+
+        stale_resources = []
+        resource_groups = {}
+        unchanged_files = 0
+        with self.metrics.stage('manifest_check'):
+            for resource, tests in resource_tests.items():
+                if manifest:
+                    file_path = test_dirs[resource] / self.test_file_name(resource)
+                    resource_groups[resource] = self.resource_fingerprints(tests)
+                    if manifest.is_fresh(resource, file_path, resource_groups[resource]):
+                        manifest.keep(resource)
+                        unchanged_files += 1
+                        continue
+
+                stale_resources.append((resource, tests))
+
+        generated_files = []
+        with self.metrics.stage('render'):
+            for resource, file_path in self.render_resources(stale_resources, test_dirs):
+                if file_path is None:
+                    continue
+
+                generated_files.append(file_path)
+                self.metrics.count('bytes_written', file_path.stat().st_size)
+                if manifest:
+                    manifest.update(resource, file_path, resource_groups[resource],
+                                    list_snapshots(file_path.parent / SNAPSHOTS_DIR_NAME))
+
+        if manifest:
+            manifest.save()
+        self.metrics.count('files_written', len(generated_files))
+        self.metrics.count('files_unchanged', unchanged_files)
+        return generated_files, unchanged_files
+
+
+def render_resource(generator: BaseTestGenerator, resource: str, tests: List[Dict[str, Any]],
+                    resource_dir: Path) -> Path:
+    """Рендеринг файла ресурса в процессе-воркере"""
+    return generator.save_test_file(resource, tests, resource_dir)
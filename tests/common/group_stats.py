@@ -0,0 +1,225 @@
+"""
+Статистика по всем образцам группы эндпоинт+параметры.
+
+Считается за один проход при группировке и с памятью, не зависящей от числа
+образцов: размеры ответов и длительности - потоковыми сводками (точные квантили
+для небольших групп, оценки P² - для крупных), стабильность тела - по каждому
+полю ответа хранится только отпечаток первого значения, признак изменчивости
+и встреченные типы.
+"""
+
+import random
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from tests.common.stats import StreamingSummary
+
+# Путь к полю ответа: ключи словарей и индексы списков от корня
+FieldPath = Tuple[Any, ...]
+
+# Ограничение числа отслеживаемых полей на группу (для очень больших ответов)
+DEFAULT_MAX_FIELDS = 2000
+
+
+def reservoir_add(samples: List[Any], sample: Any, seen: int, capacity: Optional[int], rng: random.Random):
+    """
+    Добавление образца с ограничением числа хранимых образцов группы.
+    Первый образец (по нему рендерится тест) хранится всегда, остальные слоты -
+    равномерная случайная выборка из всех последующих образцов (алгоритм R)
+
+    Args:
+        samples: Хранимые образцы группы
+        sample: Новый образец
+        seen: Сколько образцов группы встречено, включая новый
+        capacity: Максимум хранимых образцов (None - без ограничения)
+        rng: Генератор случайных чисел (с фиксированным seed - воспроизводимая выборка)
+    """
+    if capacity is None or len(samples) < capacity:
+        samples.append(sample)
+        return
+
+    slot = rng.randrange(seen - 1)
+    if slot < capacity - 1:
+        samples[1 + slot] = sample
+
+
+def format_path(path: FieldPath) -> str:
+    """Путь в виде $.items[0].id"""
+    result = '$'
+    for part in path:
+        result += f'[{part}]' if isinstance(part, int) else f'.{part}'
+    return result
+
+
+def iter_nodes(value: Any, path: FieldPath = ()) -> Iterator[Tuple[FieldPath, Any]]:
+    """Листья и непустые словари и списки JSON-значения с путями (контейнер - перед своими полями)"""
+    yield path, value
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from iter_nodes(item, path + (key,))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            yield from iter_nodes(item, path + (index,))
+
+
+def has_fields(value: Any) -> bool:
+    """Непустой словарь или список - у него есть вложенные поля"""
+    return isinstance(value, (dict, list)) and bool(value)
+
+
+def leaf_type(value: Any) -> str:
+    """Имя JSON-типа листа"""
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, (int, float)):
+        return 'number'
+    if isinstance(value, str):
+        return 'string'
+    if isinstance(value, list):
+        return 'array'
+    if isinstance(value, dict):
+        return 'object'
+    return type(value).__name__
+
+
+def leaf_key(value: Any) -> Any:
+    """Хэшируемый отпечаток листа (True и 1 различаются)"""
+    if isinstance(value, (list, dict)):
+        return leaf_type(value)
+    return leaf_type(value), value
+
+
+class FieldStability:
+    def __init__(self, max_fields: int = DEFAULT_MAX_FIELDS):
+        """
+        Отслеживание полей ответа, которые совпадают или различаются между образцами
+
+        Args:
+            max_fields: Максимум отслеживаемых полей; остальные поля не учитываются
+        """
+        self.max_fields = max_fields
+        self.samples = 0
+        self.truncated = False
+        # путь -> [отпечаток первого значения, изменчиво ли, число образцов с полем, типы]
+        self.fields: Dict[FieldPath, List[Any]] = {}
+        # путь -> [число образцов, где по пути непустой словарь или список, типы контейнера]
+        self.containers: Dict[FieldPath, List[Any]] = {}
+
+    def add(self, value: Any):
+        self.samples += 1
+        for path, leaf in iter_nodes(value):
+            if has_fields(leaf):
+                self.add_container(path, leaf)
+                continue
+
+            key = leaf_key(leaf)
+            field = self.fields.get(path)
+            if field is None:
+                if len(self.fields) >= self.max_fields:
+                    self.truncated = True
+                    continue
+                # Поле, которого не было в предыдущих образцах, уже изменчиво
+                self.fields[path] = [key, self.samples > 1, 1, {leaf_type(leaf)}]
+                continue
+
+            field[2] += 1
+            if not field[1] and field[0] != key:
+                field[1] = True
+            field[3].add(leaf_type(leaf))
+
+    def add_container(self, path: FieldPath, value: Any):
+        container = self.containers.get(path)
+        if container is None:
+            if len(self.containers) >= self.max_fields:
+                self.truncated = True
+                return
+            self.containers[path] = container = [0, set()]
+        container[0] += 1
+        container[1].add(leaf_type(value))
+
+    def is_varying(self, path: FieldPath) -> bool:
+        field = self.fields.get(path)
+        return field is not None and (field[1] or field[2] < self.samples)
+
+    def varying_fields(self) -> List[FieldPath]:
+        """Поля, значение или наличие которых различается между образцами"""
+        return [path for path in self.fields if self.is_varying(path)]
+
+    def field_types(self, path: FieldPath) -> List[str]:
+        field = self.fields.get(path)
+        return sorted(field[3]) if field else []
+
+    def presence(self, path: FieldPath) -> int:
+        """Число образцов, в которых есть поле - листом или контейнером"""
+        field = self.fields.get(path)
+        container = self.containers.get(path)
+        return (field[2] if field else 0) + (container[0] if container else 0)
+
+    def path_types(self, path: FieldPath) -> List[str]:
+        """Все типы поля по образцам, включая object/array, если в поле были вложенные поля"""
+        field = self.fields.get(path)
+        container = self.containers.get(path)
+        return sorted((field[3] if field else set()) | (container[1] if container else set()))
+
+    def report(self) -> Dict[str, Any]:
+        varying = self.varying_fields()
+        return {
+            'tracked': len(self.fields),
+            'stable': len(self.fields) - len(varying),
+            'truncated': self.truncated,
+            'varying': {format_path(path): {'types': self.field_types(path),
+                                            'present': self.fields[path][2]} for path in varying},
+        }
+
+
+class GroupStats:
+    def __init__(self, track_fields: bool = True):
+        """
+        Статистика группы
+
+        Args:
+            track_fields: Отслеживать стабильность полей ответа (нужны разобранные тела всех образцов)
+        """
+        self.count = 0
+        self.durations = StreamingSummary()
+        self.response_sizes = StreamingSummary()
+        self.statuses = Counter()
+        self.fields = FieldStability() if track_fields else None
+
+    def add(self, duration: Optional[float], response_size: Optional[int], status: Any,
+            response_data: Any = None):
+        self.count += 1
+        self.durations.add(duration)
+        self.response_sizes.add(response_size)
+        self.statuses[status] += 1
+        if self.fields is not None:
+            self.fields.add(response_data)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'samples': self.count,
+            'statuses': {str(status): count for status, count in self.statuses.items()},
+            'duration_seconds': self.durations.report(),
+            'response_size_bytes': self.response_sizes.report(),
+            'fields': self.fields.report() if self.fields is not None else None,
+        }
+
+    def summary_comment(self) -> str:
+        """Краткая сводка для комментария в сгенерированном тесте"""
+        parts = [f"образцов: {self.count}"]
+        if self.response_sizes.count:
+            parts.append(f"размер ответа p50/p95: {self.response_sizes.quantile(50):.0f}/"
+                         f"{self.response_sizes.quantile(95):.0f} байт")
+        if self.durations.count:
+            parts.append(f"длительность p50/p95: {self.durations.quantile(50) * 1000:.1f}/"
+                         f"{self.durations.quantile(95) * 1000:.1f} мс")
+        if self.fields is not None and self.fields.samples > 1:
+            varying = self.fields.varying_fields()
+            if varying:
+                parts.append(f"изменчивые поля: {', '.join(format_path(path) for path in varying[:5])}"
+                             + (" ..." if len(varying) > 5 else ""))
+            else:
+                parts.append("тело ответа стабильно")
+        return "; ".join(parts)
@@ -0,0 +1,94 @@
+"""
+Инструментирование генераторов тестов.
+
+Собирает время по стадиям (load_json_data, group_by_endpoint_and_params,
+extract_file_info, рендеринг и т.д.), счётчики (транзакции, группы, байты)
+и, по запросу, профиль cProfile и пиковую память tracemalloc по стадиям.
+Результат сохраняется в JSON, чтобы сравнивать ночные прогоны.
+"""
+
+import cProfile
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+
+class Instrumentation:
+    def __init__(self, profile_path: Optional[str] = None, trace_memory: bool = False):
+        """
+        Сборщик метрик генерации
+
+        Args:
+            profile_path: Куда сохранить профиль cProfile (формат pstats); None - без профилирования
+            trace_memory: Замерять пиковое выделение памяти по стадиям через tracemalloc
+        """
+        self.profile_path = profile_path
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.counters = {}
+        self._profiler = None
+        self._started = None
+        self._total_seconds = 0.0
+
+    def start(self):
+        """Начало замеров всего прогона"""
+        self._started = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.profile_path:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop(self):
+        """Окончание замеров: сохраняет профиль и останавливает tracemalloc"""
+        if self._started is not None:
+            self._total_seconds += time.perf_counter() - self._started
+            self._started = None
+        if self._profiler:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+            self._profiler = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Замер стадии; повторные вызовы накапливаются (время, число вызовов, максимум памяти)"""
+        stats = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            # Вложенная стадия сбрасывает пик, поэтому для внешней стадии пик занижается
+            baseline, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats['seconds'] += time.perf_counter() - started
+            stats['calls'] += 1
+            if tracing:
+                _, peak = tracemalloc.get_traced_memory()
+                stats['peak_memory_bytes'] = max(stats.get('peak_memory_bytes', 0), peak - baseline)
+
+    def count(self, name: str, value: int = 1):
+        """Увеличение счётчика"""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self) -> Dict[str, Any]:
+        """Метрики в виде JSON-совместимого словаря"""
+        return {
+            'total_seconds': round(self._total_seconds, 6),
+            'stages': {
+                name: dict(stats, seconds=round(stats['seconds'], 6)) for name, stats in self.stages.items()
+            },
+            'counters': dict(self.counters),
+            'profile': self.profile_path,
+        }
+
+    def save(self, path: str):
+        """Сохранение метрик в JSON-файл"""
+        Path(path).write_text(json.dumps(self.report(), ensure_ascii=False, indent=2), encoding='utf-8')
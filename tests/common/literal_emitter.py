@@ -0,0 +1,167 @@
+"""
+Потоковый вывод Python-литералов для сгенерированных тестов.
+
+В отличие от pprint.pformat значение не собирается в одну строку целиком:
+контейнеры, не помещающиеся в ширину строки, выводятся поэлементно прямо
+в файл, по одному элементу на строку с запятой в конце. Небольшие
+контейнеры пишутся в одну строку, длинные строки - частями в скобках.
+Порядок ключей словарей сохраняется.
+"""
+
+import io
+import math
+from typing import Any, List, TextIO
+
+INDENT = '    '
+DEFAULT_WIDTH = 100
+
+# Минимальная длина части при переносе длинной строки
+MIN_CHUNK_LENGTH = 20
+
+
+def scalar_literal(value: Any) -> str:
+    """Литерал для скалярного значения"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return f"float('{value}')"
+    return repr(value)
+
+
+def _append_inline(value: Any, parts: List[str], remaining: List[int]) -> bool:
+    """Добавляет однострочное представление, пока оно укладывается в бюджет"""
+    if remaining[0] < 0:
+        return False
+
+    if isinstance(value, dict):
+        parts.append('{')
+        remaining[0] -= 2
+        for i, (key, item) in enumerate(value.items()):
+            if i:
+                parts.append(', ')
+                remaining[0] -= 2
+            if not _append_inline(key, parts, remaining):
+                return False
+            parts.append(': ')
+            remaining[0] -= 2
+            if not _append_inline(item, parts, remaining):
+                return False
+        parts.append('}')
+        return remaining[0] >= 0
+
+    if isinstance(value, (list, tuple)):
+        opening, closing = ('[', ']') if isinstance(value, list) else ('(', ')')
+        parts.append(opening)
+        remaining[0] -= 2
+        for i, item in enumerate(value):
+            if i:
+                parts.append(', ')
+                remaining[0] -= 2
+            if not _append_inline(item, parts, remaining):
+                return False
+        if isinstance(value, tuple) and len(value) == 1:
+            parts.append(',')
+            remaining[0] -= 1
+        parts.append(closing)
+        return remaining[0] >= 0
+
+    # Длина repr строки не меньше её длины - огромные строки отсекаем без repr
+    if isinstance(value, str) and len(value) + 2 > remaining[0]:
+        return False
+
+    text = scalar_literal(value)
+    remaining[0] -= len(text)
+    parts.append(text)
+    return remaining[0] >= 0
+
+
+def inline_literal(value: Any, budget: int) -> Any:
+    """Однострочный литерал или None, если он длиннее budget символов"""
+    parts = []
+    if _append_inline(value, parts, [budget]):
+        return ''.join(parts)
+    return None
+
+
+def split_string(value: str, chunk_length: int) -> List[str]:
+    """Делит строку на части по переводам строк и по длине (по возможности - по пробелам)"""
+    chunks = []
+    for line in value.splitlines(keepends=True):
+        while len(line) > chunk_length:
+            cut = line.rfind(' ', chunk_length // 2, chunk_length) + 1 or chunk_length
+            chunks.append(line[:cut])
+            line = line[cut:]
+        if line:
+            chunks.append(line)
+    return chunks
+
+
+class LiteralEmitter:
+    def __init__(self, out: TextIO, width: int = DEFAULT_WIDTH):
+        """
+        Запись литералов в текстовый поток
+
+        Args:
+            out: Поток (файл или StringIO)
+            width: Желаемая ширина строки
+        """
+        self.out = out
+        self.width = width
+
+    def emit(self, value: Any, indent: str = '', column: int = None):
+        """
+        Пишет литерал значения
+
+        Args:
+            value: Значение
+            indent: Отступ строки, в которой начинается литерал
+            column: Текущая позиция в строке (по умолчанию - длина отступа)
+        """
+        if column is None:
+            column = len(indent)
+
+        inline = inline_literal(value, self.width - column)
+        if inline is not None:
+            self.out.write(inline)
+            return
+
+        inner = indent + INDENT
+
+        if isinstance(value, dict):
+            self.out.write('{\n')
+            for key, item in value.items():
+                prefix = f"{inner}{scalar_literal(key)}: "
+                self.out.write(prefix)
+                self.emit(item, inner, len(prefix))
+                self.out.write(',\n')
+            self.out.write(indent + '}')
+
+        elif isinstance(value, (list, tuple)):
+            opening, closing = ('[', ']') if isinstance(value, list) else ('(', ')')
+            self.out.write(opening + '\n')
+            for item in value:
+                self.out.write(inner)
+                self.emit(item, inner)
+                self.out.write(',\n')
+            self.out.write(indent + closing)
+
+        elif isinstance(value, str):
+            # Соседние строковые литералы в скобках склеиваются интерпретатором
+            chunk_length = max(self.width - len(inner) - 2, MIN_CHUNK_LENGTH)
+            self.out.write('(\n')
+            for chunk in split_string(value, chunk_length):
+                self.out.write(inner + repr(chunk) + '\n')
+            self.out.write(indent + ')')
+
+        else:
+            self.out.write(scalar_literal(value))
+
+
+def write_literal(value: Any, out: TextIO, indent: str = '', column: int = None, width: int = DEFAULT_WIDTH):
+    """Пишет литерал значения в поток"""
+    LiteralEmitter(out, width).emit(value, indent, column)
+
+
+def format_literal(value: Any, indent: str = '', column: int = None, width: int = DEFAULT_WIDTH) -> str:
+    """Возвращает литерал значения строкой"""
+    out = io.StringIO()
+    write_literal(value, out, indent, column, width)
+    return out.getvalue()
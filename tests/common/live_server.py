@@ -0,0 +1,112 @@
+"""
+Живой сервер uvicorn для прогона сгенерированных тестов по сети.
+
+Сервер запускается отдельным процессом на свободном порту, поэтому каждый
+процесс pytest-xdist поднимает свой экземпляр и порты не конфликтуют. Клиент -
+httpx.AsyncClient с пулом keep-alive соединений HTTP/1.1.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_APP = 'main:app'
+DEFAULT_MAX_CONNECTIONS = 100
+STARTUP_TIMEOUT = 30.0
+# Сервер держит простаивающие соединения дольше, чем клиент (keepalive_expiry httpx - 5 с),
+# иначе клиент может отправить запрос в соединение, которое сервер уже закрывает
+SERVER_KEEP_ALIVE = 75
+
+
+def find_free_port(host: str = '127.0.0.1') -> int:
+    """Свободный TCP-порт на хосте"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def pooled_client(base_url: str, max_connections: int = DEFAULT_MAX_CONNECTIONS) -> httpx.AsyncClient:
+    """Клиент с пулом keep-alive соединений к живому серверу"""
+    return httpx.AsyncClient(
+        base_url=base_url,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=httpx.Timeout(30.0),
+    )
+
+
+class LiveServer:
+    def __init__(self, app: str = DEFAULT_APP, host: str = '127.0.0.1', port: Optional[int] = None,
+                 workers: int = 1):
+        """
+        Сервер uvicorn в отдельном процессе
+
+        Args:
+            app: Приложение в формате модуль:атрибут
+            host: Адрес, на котором слушает сервер
+            port: Порт (по умолчанию - любой свободный)
+            workers: Число процессов uvicorn
+        """
+        self.app = app
+        self.host = host
+        self.port = port or find_free_port(host)
+        self.workers = workers
+        self.process = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """Запуск сервера и ожидание, пока он начнёт принимать соединения"""
+        command = [
+            sys.executable, '-m', 'uvicorn', self.app,
+            '--host', self.host, '--port', str(self.port),
+            '--workers', str(self.workers), '--timeout-keep-alive', str(SERVER_KEEP_ALIVE),
+            '--log-level', 'warning', '--no-access-log',
+        ]
+        # Приложение читает статические файлы по относительным путям, поэтому запускаем из корня репозитория
+        self.process = subprocess.Popen(command, cwd=REPO_ROOT, env=dict(os.environ))
+        self.wait_ready()
+
+    def wait_ready(self, timeout: float = STARTUP_TIMEOUT):
+        """Ожидание готовности сервера: порт может быть открыт раньше, чем приложение готово отвечать"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Сервер {self.app} завершился с кодом {self.process.returncode}")
+            try:
+                httpx.get(self.url, timeout=0.5)
+                return
+            except httpx.HTTPError:
+                time.sleep(0.05)
+
+        self.stop()
+        raise RuntimeError(f"Сервер {self.app} не запустился за {timeout} с")
+
+    def stop(self):
+        """Остановка сервера"""
+        if self.process is None:
+            return
+
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def __enter__(self) -> 'LiveServer':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -0,0 +1,93 @@
+"""
+Манифест инкрементальной генерации тестов.
+
+Для каждого ресурса хранится отпечаток каждой группы (ключ группы из
+group_by_endpoint_and_params -> хэш выбранного образца). При повторном запуске
+файл ресурса перегенерируется только если набор групп или их образцы изменились.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST_NAME = '.tests_manifest.json'
+
+COMMON_DIR = Path(__file__).resolve().parent
+# Модули tests/common, от которых зависит код сгенерированных тестов
+RENDER_MODULES = (
+    'generator_base.py', 'literal_emitter.py', 'volatile.py', 'snapshots.py', 'stats.py', 'group_stats.py',
+    'multipart.py'
+)
+
+
+def fingerprint(value: Any) -> str:
+    """Стабильный хэш JSON-совместимого значения"""
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, default=repr)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def source_fingerprint(generator_path: str) -> str:
+    """Хэш исходников генератора и общих модулей, через которые он рендерит тесты"""
+    sources = [Path(generator_path)] + [COMMON_DIR / name for name in RENDER_MODULES]
+    return fingerprint({path.name: fingerprint(path.read_text(encoding='utf-8')) for path in sources})
+
+
+class GenerationManifest:
+    def __init__(self, path: str, options: Dict[str, Any]):
+        """
+        Манифест сгенерированных файлов
+
+        Args:
+            path: Путь к файлу манифеста
+            options: Параметры генерации (включая версию генератора).
+                При их изменении все файлы считаются устаревшими
+        """
+        self.path = Path(path)
+        self.options_hash = fingerprint(options)
+        self.resources = {}
+        self._previous = {}
+
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+                if data.get('version') == MANIFEST_VERSION and data.get('options_hash') == self.options_hash:
+                    self._previous = data.get('resources', {})
+            except (OSError, ValueError) as e:
+                print(f"Манифест {self.path} повреждён и будет перезаписан: {e}")
+
+    def is_fresh(self, resource: str, file_path: Path, groups: Dict[str, str]) -> bool:
+        """
+        Файл ресурса и его snapshot-файлы существуют, и он сгенерирован из тех же групп с теми же образцами
+        """
+        previous = self._previous.get(resource)
+        return (
+            previous is not None
+            and previous.get('file') == str(file_path)
+            and previous.get('groups') == groups
+            and file_path.exists()
+            and all(Path(path).exists() for path in previous.get('snapshots', []))
+        )
+
+    def keep(self, resource: str):
+        """Переносит запись о неизменённом ресурсе в новый манифест"""
+        self.resources[resource] = self._previous[resource]
+
+    def update(self, resource: str, file_path: Path, groups: Dict[str, str], snapshots: Optional[List[str]] = None):
+        """
+        Args:
+            resource: Ресурс
+            file_path: Сгенерированный файл
+            groups: Отпечатки групп ресурса
+            snapshots: Snapshot-файлы, на которые ссылаются тесты ресурса
+        """
+        self.resources[resource] = {'file': str(file_path), 'groups': groups, 'snapshots': snapshots or []}
+
+    def save(self):
+        data = {
+            'version': MANIFEST_VERSION,
+            'options_hash': self.options_hash,
+            'resources': self.resources,
+        }
+        self.path.write_text(json.dumps(data, ensure_ascii=False, indent=2, sort_keys=True), encoding='utf-8')
@@ -0,0 +1,137 @@
+"""
+Разбор тел multipart/form-data за один проход.
+
+Поиск разделителей идёт по исходному буферу (bytes.find с позиции), а содержимое
+частей отдаётся как memoryview исходного буфера - файлы не копируются ни при
+разборе, ни при разбиении на части, поэтому загрузки в сотни мегабайт не
+замедляют генерацию.
+"""
+
+import mmap
+import re
+from typing import Dict, Iterator, Optional, Union
+
+# Буфер с поиском подстроки (find с границами): bytes, bytearray или mmap
+Buffer = Union[bytes, bytearray, mmap.mmap]
+
+_BOUNDARY_RE = re.compile(r'boundary=(?:"([^"]+)"|([^\s;]+))', re.IGNORECASE)
+_PARAM_RE = re.compile(r';\s*([\w*-]+)=(?:"((?:[^"\\]|\\.)*)"|([^;]*))')
+
+CRLF = b'\r\n'
+HEADERS_END = b'\r\n\r\n'
+
+
+class MultipartPart:
+    def __init__(self, headers: Dict[str, str], data: memoryview):
+        """
+        Часть multipart-тела
+
+        Args:
+            headers: Заголовки части (имена в нижнем регистре)
+            data: Содержимое части - срез исходного буфера без копирования
+        """
+        self.headers = headers
+        self.data = data
+
+        disposition = headers.get('content-disposition', '')
+        params = {key.lower(): quoted if quoted is not None else plain.strip()
+                  for key, quoted, plain in _PARAM_RE.findall(disposition)}
+        self.name = params.get('name')
+        self.filename = params.get('filename')
+        self.content_type = headers.get('content-type', 'application/octet-stream' if self.filename else 'text/plain')
+
+    @property
+    def is_file(self) -> bool:
+        return self.filename is not None
+
+
+def parse_boundary(content_type: str) -> Optional[bytes]:
+    """Boundary из заголовка Content-Type"""
+    match = _BOUNDARY_RE.search(content_type or '')
+    if not match:
+        return None
+    return (match.group(1) or match.group(2)).encode('latin-1')
+
+
+def sniff_boundary(body: Buffer) -> Optional[bytes]:
+    """Boundary из первой строки тела, если заголовок не сохранился"""
+    if body[:2] != b'--':
+        return None
+    line_end = body.find(CRLF)
+    if line_end <= 2:
+        return None
+    return bytes(body[2:line_end])
+
+
+def parse_headers(block: memoryview) -> Dict[str, str]:
+    """Заголовки части (блок небольшой, поэтому декодируется целиком)"""
+    headers = {}
+    for line in bytes(block).decode('utf-8', errors='replace').split('\r\n'):
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+def iter_parts(body: Buffer, boundary: Optional[bytes] = None) -> Iterator[MultipartPart]:
+    """
+    Итерация по частям multipart-тела
+
+    Args:
+        body: Тело запроса
+        boundary: Boundary из Content-Type; если не задан, берётся из первой строки тела
+    """
+    view = memoryview(body)
+    boundary = boundary or sniff_boundary(body)
+    if not boundary:
+        return
+
+    delimiter = b'--' + boundary
+    position = body.find(delimiter)
+    while position != -1:
+        position += len(delimiter)
+        # Закрывающий разделитель "--boundary--"
+        if body[position:position + 2] == b'--':
+            return
+
+        headers_start = body.find(CRLF, position)
+        if headers_start == -1:
+            return
+        headers_start += len(CRLF)
+
+        next_delimiter = body.find(CRLF + delimiter, headers_start)
+        if next_delimiter == -1:
+            # Обрезанное тело - содержимое до конца буфера
+            next_delimiter = len(body)
+
+        if body[headers_start:headers_start + len(CRLF)] == CRLF:
+            # Пустой блок заголовков: сразу за разделителем - пустая строка
+            headers = {}
+            data_start = headers_start + len(CRLF)
+        else:
+            # Конец заголовков ищем только в пределах части, чтобы не сканировать буфер повторно
+            headers_end = body.find(HEADERS_END, headers_start, next_delimiter)
+            if headers_end == -1:
+                # Нет пустой строки после заголовков (нарушение формата) - содержимое с начала части
+                headers = {}
+                data_start = headers_start
+            else:
+                headers = parse_headers(view[headers_start:headers_end])
+                data_start = headers_end + len(HEADERS_END)
+
+        yield MultipartPart(headers, view[data_start:next_delimiter])
+
+        if next_delimiter >= len(body):
+            return
+        position = next_delimiter + len(CRLF)
+
+
+def decode_text(data: Union[Buffer, memoryview]) -> Optional[str]:
+    """Содержимое части как текст или None, если оно бинарное (не UTF-8 или с управляющими символами)"""
+    try:
+        text = str(data, 'utf-8')
+    except UnicodeDecodeError:
+        return None
+    if any(ord(c) < 32 and c not in '\r\n\t' for c in text[:100]):
+        return None
+    return text
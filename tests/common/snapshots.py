@@ -0,0 +1,70 @@
+"""
+Внешние snapshot-файлы с ожидаемыми данными для сгенерированных тестов.
+
+Крупные ожидаемые ответы не встраиваются в код теста, а пишутся рядом
+в __snapshots__/<имя>.json.gz. В тесте остаётся только вызов load_snapshot,
+который читает файл при выполнении теста, а не при импорте модуля,
+поэтому сбор тестов и кэш байткода не зависят от размера ответов.
+"""
+
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import Any, List
+
+from tests.common.literal_emitter import inline_literal
+
+SNAPSHOTS_DIR_NAME = '__snapshots__'
+SNAPSHOT_SUFFIX = '.json.gz'
+
+# Ожидаемые данные короче этого числа символов остаются в коде теста
+DEFAULT_MIN_SNAPSHOT_SIZE = 2048
+
+# Импорты и загрузчик для сгенерированного файла, в котором есть хотя бы один snapshot
+SNAPSHOT_IMPORTS = '''import gzip
+import json
+from http import HTTPStatus
+from pathlib import Path
+
+import pytest
+
+SNAPSHOTS_DIR = Path(__file__).parent / "__snapshots__"
+
+
+def load_snapshot(name):
+    with gzip.open(SNAPSHOTS_DIR / f"{name}.json.gz", "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+'''
+
+
+def should_snapshot(value: Any, min_size: int) -> bool:
+    """Выносить ли значение в snapshot-файл (его литерал длиннее min_size)"""
+    return inline_literal(value, min_size) is None
+
+
+def clear_snapshots(snapshots_dir: Path):
+    """Удаляет snapshot-файлы предыдущей генерации"""
+    if snapshots_dir.is_dir():
+        for path in snapshots_dir.glob(f"*{SNAPSHOT_SUFFIX}"):
+            path.unlink()
+
+
+def list_snapshots(snapshots_dir: Path) -> List[str]:
+    """Пути snapshot-файлов в папке"""
+    if not snapshots_dir.is_dir():
+        return []
+    return sorted(str(path) for path in snapshots_dir.glob(f"*{SNAPSHOT_SUFFIX}"))
+
+
+def write_snapshot(snapshots_dir: Path, name: str, value: Any) -> Path:
+    """Потоково записывает значение в сжатый snapshot-файл"""
+    snapshots_dir.mkdir(exist_ok=True)
+    path = snapshots_dir / f"{name}{SNAPSHOT_SUFFIX}"
+
+    # mtime=0 - одинаковые данные дают байт в байт одинаковый файл
+    with gzip.GzipFile(path, mode='wb', mtime=0) as gz, io.TextIOWrapper(gz, encoding='utf-8') as f:
+        json.dump(value, f, ensure_ascii=False)
+
+    return path
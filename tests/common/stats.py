@@ -0,0 +1,186 @@
+"""
+Статистика по длительностям запросов: перцентили и сводка по выборке.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Sequence
+
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+# Минимальный бюджет задержки в сгенерированных тестах, с: ниже него шум измерений сравним с самой задержкой
+DEFAULT_LATENCY_FLOOR = 0.1
+# До стольких значений сводка хранит выборку и считает перцентили точно: на малых выборках P² сильно занижает хвост
+DEFAULT_EXACT_LIMIT = 500
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """
+    Перцентиль с линейной интерполяцией между соседними значениями (как numpy.percentile)
+
+    Args:
+        values: Выборка (уже отсортированная сортируется за линейное время)
+        q: Перцентиль от 0 до 100
+    """
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return ordered[lower]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(values: Iterable[float], percentiles: Sequence[int] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+    """Сводка по выборке: число значений, среднее, максимум и перцентили (p50, p95, ...)"""
+    ordered: List[float] = sorted(v for v in values if v is not None)
+    if not ordered:
+        return {'count': 0}
+
+    summary = {
+        'count': len(ordered),
+        'mean': sum(ordered) / len(ordered),
+        'max': ordered[-1],
+    }
+    for q in percentiles:
+        summary[f'p{q}'] = percentile(ordered, q)
+    return summary
+
+
+def latency_budget(recorded_p95: Optional[float], factor: float, floor: float = 0.0) -> Optional[float]:
+    """
+    Бюджет задержки для теста группы: p95 записанных длительностей, умноженный на factor,
+    но не меньше floor. None - если длительности не записаны
+    """
+    if recorded_p95 is None:
+        return None
+    return max(recorded_p95 * factor, floor)
+
+
+class P2Quantile:
+    """
+    Потоковая оценка квантиля алгоритмом P² (Jain, Chlamtac): пять маркеров, O(1) памяти.
+    Пока значений не больше пяти, квантиль считается точно
+    """
+
+    __slots__ = ('p', 'count', 'heights', 'positions', 'desired', 'increments')
+
+    def __init__(self, q: float):
+        """
+        Args:
+            q: Перцентиль от 0 до 100
+        """
+        self.p = q / 100
+        self.count = 0
+        self.heights: List[float] = []
+        self.positions = [0, 1, 2, 3, 4]
+        self.desired = [0, 2 * self.p, 4 * self.p, 2 + 2 * self.p, 4]
+        self.increments = [0, self.p / 2, self.p, (1 + self.p) / 2, 1]
+
+    def add(self, value: float):
+        self.count += 1
+        heights = self.heights
+        if self.count <= 5:
+            heights.append(value)
+            heights.sort()
+            return
+
+        # Ячейка, в которую попало значение, с расширением крайних маркеров
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = 0
+            while value >= heights[cell + 1]:
+                cell += 1
+
+        positions = self.positions
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Сдвиг средних маркеров к желаемым позициям
+        for i in range(1, 4):
+            offset = self.desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or \
+                    (offset <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if offset > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        heights, positions = self.heights, self.positions
+        return heights[i] + step / (positions[i + 1] - positions[i - 1]) * (
+            (positions[i] - positions[i - 1] + step) * (heights[i + 1] - heights[i]) / (positions[i + 1] - positions[i])
+            + (positions[i + 1] - positions[i] - step) * (heights[i] - heights[i - 1]) / (positions[i] - positions[i - 1])
+        )
+
+    def value(self) -> Optional[float]:
+        if self.count <= 5:
+            return percentile(self.heights, self.p * 100)
+        return self.heights[2]
+
+
+class StreamingSummary:
+    """
+    Сводка по потоку значений за один проход и с ограниченной памятью: пока значений не больше
+    exact_limit, перцентили точные, дальше - оценки P²
+    """
+
+    __slots__ = ('count', 'total', 'minimum', 'maximum', 'sketches', 'exact_limit', 'values')
+
+    def __init__(self, percentiles: Sequence[int] = DEFAULT_PERCENTILES, exact_limit: int = DEFAULT_EXACT_LIMIT):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.sketches = {q: P2Quantile(q) for q in percentiles}
+        self.exact_limit = exact_limit
+        self.values: Optional[List[float]] = []
+
+    def add(self, value: Optional[float]):
+        if value is None:
+            return
+
+        self.count += 1
+        self.total += value
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        for sketch in self.sketches.values():
+            sketch.add(value)
+
+        if self.values is not None:
+            if self.count <= self.exact_limit:
+                self.values.append(value)
+            else:
+                self.values = None
+
+    def quantile(self, q: int) -> Optional[float]:
+        if q not in self.sketches:
+            return None
+        if self.values is not None:
+            return percentile(self.values, q)
+        return self.sketches[q].value()
+
+    def report(self) -> Dict[str, float]:
+        """Сводка в формате summarize"""
+        if not self.count:
+            return {'count': 0}
+
+        summary = {
+            'count': self.count,
+            'mean': self.total / self.count,
+            'min': self.minimum,
+            'max': self.maximum,
+        }
+        for q in self.sketches:
+            summary[f'p{q}'] = self.quantile(q)
+        return summary
@@ -0,0 +1,79 @@
+"""
+Изменчивые поля ответа: значения, которые различаются между образцами одной группы
+(время, идентификаторы и т.п.).
+
+Генератор выбирает такие поля по статистике группы (FieldStability), а сгенерированный
+тест сравнивает ответ с ожидаемым, проверяя для изменчивых полей только тип.
+"""
+
+import copy
+from typing import Any, Dict, Iterable, Tuple
+
+from tests.common.group_stats import FieldPath, FieldStability, leaf_type
+
+# Описание изменчивого поля: допустимые типы и может ли поле отсутствовать
+VolatileFields = Dict[FieldPath, Tuple[Tuple[str, ...], bool]]
+
+_MISSING = object()
+_MASKED = '<volatile>'
+
+
+def volatile_fields(stability: FieldStability) -> VolatileFields:
+    """
+    Изменчивые поля группы. Элемент списка, который есть не во всех образцах,
+    означает список переменной длины - тогда изменчивым считается весь список.
+    Типы поля - все типы по образцам, включая object/array, если форма поля менялась
+    """
+    paths = {}
+    for path in stability.varying_fields():
+        if path and isinstance(path[-1], int) and stability.fields[path][2] < stability.samples:
+            path = path[:-1]
+        paths[path] = None
+
+    # Поля внутри уже изменчивого поля проверять не нужно: их типы входят в типы самого поля
+    return {path: (tuple(stability.path_types(path)), stability.presence(path) < stability.samples)
+            for path in paths if not any(path[:length] in paths for length in range(len(path)))}
+
+
+def get_path(value: Any, path: Iterable[Any]) -> Any:
+    """Значение по пути или _MISSING"""
+    for part in path:
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and isinstance(part, int) and part < len(value):
+            value = value[part]
+        else:
+            return _MISSING
+    return value
+
+
+def mask(value: Any, volatile: VolatileFields) -> Any:
+    """Копия значения без изменчивых полей: ключи словарей удаляются, элементы списков заменяются меткой"""
+    if () in volatile:
+        return _MASKED
+
+    value = copy.deepcopy(value)
+    # Длинные пути первыми, чтобы замена элемента не мешала удалению вложенных ключей
+    for path in sorted(volatile, key=len, reverse=True):
+        parent = get_path(value, path[:-1])
+        key = path[-1]
+        if isinstance(parent, dict):
+            parent.pop(key, None)
+        elif isinstance(parent, list) and isinstance(key, int) and key < len(parent):
+            parent[key] = _MASKED
+    return value
+
+
+def assert_json_matches(actual: Any, expected: Any, volatile: VolatileFields):
+    """
+    Сравнение ответа с ожидаемым: изменчивые поля проверяются только по типу,
+    остальные - точно
+    """
+    for path, (types, optional) in volatile.items():
+        value = get_path(actual, path)
+        if value is _MISSING:
+            assert optional, f"Нет обязательного поля {list(path)}"
+            continue
+        assert leaf_type(value) in types, f"Поле {list(path)}: тип {leaf_type(value)}, ожидался один из {types}"
+
+    assert mask(actual, volatile) == mask(expected, volatile)
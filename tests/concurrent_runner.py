@@ -0,0 +1,118 @@
+"""
+Конкурентный прогон сгенерированных тестов против живого сервера.
+
+Сгенерированные тесты независимы друг от друга и принимают только fast_api_client,
+поэтому их можно выполнять одновременно через asyncio.gather с общим пулом
+keep-alive соединений, а не по одному, как это делает pytest.
+Использование: python tests/concurrent_runner.py папка_с_тестами [--concurrency 64] [--url http://...]
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import inspect
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from tests.common.live_server import DEFAULT_MAX_CONNECTIONS, LiveServer, pooled_client
+except ImportError:
+    # Запуск как скрипта - добавляем корень репозитория в путь
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from tests.common.live_server import DEFAULT_MAX_CONNECTIONS, LiveServer, pooled_client
+
+TestCase = Tuple[str, Callable[..., Any]]
+
+
+def load_module(file_path: Path, index: int):
+    """Импорт файла тестов под уникальным именем модуля"""
+    spec = importlib.util.spec_from_file_location(f"_concurrent_tests_{index}_{file_path.stem}", file_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def collect_tests(paths: List[str]) -> List[TestCase]:
+    """Сбор асинхронных тестов, которым нужен только fast_api_client"""
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.rglob('test_*.py')) if path.is_dir() else [path])
+
+    tests = []
+    for index, file_path in enumerate(files):
+        module = load_module(file_path, index)
+        for name, func in vars(module).items():
+            if not name.startswith('test_') or not inspect.iscoroutinefunction(func):
+                continue
+            if list(inspect.signature(func).parameters) != ['fast_api_client']:
+                print(f"Пропущен {file_path}::{name}: нужны фикстуры кроме fast_api_client")
+                continue
+            tests.append((f"{file_path}::{name}", func))
+
+    return tests
+
+
+async def run_tests(tests: List[TestCase], base_url: str, concurrency: int,
+                    max_connections: int) -> List[Dict[str, Any]]:
+    """Выполнение тестов с ограничением числа одновременно выполняемых"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with pooled_client(base_url, max_connections) as client:
+        async def run_one(test_id: str, func: Callable[..., Any]) -> Dict[str, Any]:
+            async with semaphore:
+                started = time.perf_counter()
+                error = None
+                try:
+                    await func(client)
+                except Exception:
+                    error = traceback.format_exc()
+                return {'id': test_id, 'seconds': time.perf_counter() - started, 'error': error}
+
+        return await asyncio.gather(*(run_one(test_id, func) for test_id, func in tests))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Конкурентный прогон сгенерированных тестов против живого сервера')
+    parser.add_argument('paths', nargs='+', help='Папки или файлы со сгенерированными тестами')
+    parser.add_argument('--concurrency', type=int, default=64, help='Сколько тестов выполняется одновременно')
+    parser.add_argument('--max-connections', type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help='Размер пула keep-alive соединений')
+    parser.add_argument('--url', default=None, help='Адрес уже запущенного сервера (по умолчанию поднимается main:app)')
+    parser.add_argument('--server-workers', type=int, default=1, help='Число процессов uvicorn')
+
+    args = parser.parse_args()
+
+    tests = collect_tests(args.paths)
+    if not tests:
+        print("Тесты не найдены")
+        sys.exit(1)
+
+    server: Optional[LiveServer] = None
+    base_url = args.url
+    if not base_url:
+        server = LiveServer(workers=args.server_workers)
+        server.start()
+        base_url = server.url
+
+    started = time.perf_counter()
+    try:
+        results = asyncio.run(run_tests(tests, base_url, args.concurrency, args.max_connections))
+    finally:
+        if server:
+            server.stop()
+    elapsed = time.perf_counter() - started
+
+    failed = [result for result in results if result['error']]
+    for result in failed:
+        print(f"FAILED {result['id']}\n{result['error']}")
+
+    print(f"{len(results) - len(failed)} passed, {len(failed)} failed за {elapsed:.2f} с "
+          f"(одновременно до {args.concurrency}, {base_url})")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,53 @@
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Iterator
 
 import httpx
+import pytest
 import pytest_asyncio
 
 from main import app
+from tests.common.live_server import DEFAULT_MAX_CONNECTIONS, LiveServer, pooled_client
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('live-server', 'Прогон тестов против живого сервера')
+    group.addoption('--live-server', action='store_true',
+                    help='Запустить main:app в uvicorn и выполнять запросы по сети')
+    group.addoption('--live-server-url', default=None,
+                    help='Использовать уже запущенный сервер (например, общий для процессов pytest-xdist)')
+    group.addoption('--max-connections', type=int, default=DEFAULT_MAX_CONNECTIONS,
+                    help='Размер пула keep-alive соединений клиента')
+
+
+@pytest.fixture(scope="session")
+def live_server_url(request) -> Iterator[str]:
+    """
+    Адрес живого сервера. При pytest-xdist каждый процесс поднимает свой сервер на свободном порту
+    """
+
+    url = request.config.getoption('--live-server-url')
+    if url:
+        yield url
+        return
+
+    with LiveServer() as server:
+        yield server.url
 
 
 @pytest_asyncio.fixture(scope="session")
-async def fast_api_client() -> AsyncGenerator[httpx.AsyncClient, None]:
+async def fast_api_client(request) -> AsyncGenerator[httpx.AsyncClient, None]:
     """
     Получить клиент FastAPI
     """
 
-    async with httpx.AsyncClient(
-        app=app,
-        base_url="http://localhost:7777",
-        follow_redirects=True
-    ) as client:
-        try:
-            yield client
-        finally:
-            await client.aclose()
+    if request.config.getoption('--live-server') or request.config.getoption('--live-server-url'):
+        client = pooled_client(request.getfixturevalue('live_server_url'),
+                               request.config.getoption('--max-connections'))
+    else:
+        client = httpx.AsyncClient(
+            app=app,
+            base_url="http://localhost:7777",
+            follow_redirects=True
+        )
+
+    async with client:
+        yield client
@@ -1,29 +1,102 @@
 """
 Простой парсер mitmproxy файлов в JSON
-Использование: python mitm_to_json.py файл.mitm
+Использование: python mitm_to_json.py файл.mitm [--stream] [--format json|jsonl|e2c] [--workers N]
 """
 
+import argparse
 import base64
+import io
 import json
+import os
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, BinaryIO, Iterable, Iterator, Tuple
 
 from mitmproxy import io as mitm_io
 from mitmproxy.http import HTTPFlow
 
+try:
+    from tests.common.capture_container import CONTAINER_SUFFIX, CaptureContainerWriter
+except ImportError:
+    # Запуск как скрипта из папки модуля - добавляем корень репозитория в путь
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from tests.common.capture_container import CONTAINER_SUFFIX, CaptureContainerWriter
+from tests.common.body_store import BodyStore, externalize_bodies
+
+
+def body_fields(raw: bytes) -> Dict[str, Any]:
+    """
+    Тело без потерь: валидный UTF-8 сохраняется как body_text, всё остальное - как body_base64.
+    Решение принимается один раз при разборе, дальше тело не перекодируется
+    """
+    try:
+        fields = {"body_text": raw.decode('utf-8')}
+    except UnicodeDecodeError:
+        fields = {"body_base64": base64.b64encode(raw).decode('ascii')}
+    fields["body_size"] = len(raw)
+    return fields
+
+
+def flow_to_transaction(flow: HTTPFlow, index: int) -> Dict[str, Any]:
+    """Преобразует HTTPFlow в транзакцию JSON-совместимого формата"""
+    # Формируем информацию о запросе
+    request_info = {
+        "method": flow.request.method,
+        "url": flow.request.pretty_url,
+        "path": flow.request.path,
+        "http_version": flow.request.http_version,
+        "headers": dict(flow.request.headers),
+        "timestamp": flow.request.timestamp_start,
+        "timestamp_iso": datetime.fromtimestamp(flow.request.timestamp_start).isoformat()
+        if hasattr(flow.request, 'timestamp_start') else None
+    }
 
-def parse_mitm_file(file_path: str) -> List[Dict[str, Any]]:
-    """Парсит файл mitmproxy и возвращает список транзакций в JSON-совместимом формате"""
-    transactions = []
+    # Добавляем тело запроса
+    if flow.request.raw_content:
+        request_info.update(body_fields(flow.request.raw_content))
+
+    # Формируем информацию об ответе
+    response_info = None
+    if flow.response:
+        response_info = {
+            "status_code": flow.response.status_code,
+            "reason": flow.response.reason,
+            "http_version": flow.response.http_version,
+            "headers": dict(flow.response.headers),
+            "timestamp": flow.response.timestamp_end if hasattr(flow.response, 'timestamp_end') else None,
+            "timestamp_iso": datetime.fromtimestamp(flow.response.timestamp_end).isoformat()
+            if hasattr(flow.response, 'timestamp_end') else None
+        }
+
+        # Добавляем тело ответа
+        if flow.response.raw_content:
+            response_info.update(body_fields(flow.response.raw_content))
+
+    # Формируем полную транзакцию
+    return {
+        "id": f"flow_{index:06d}",
+        "request": request_info,
+        "response": response_info,
+        "duration": flow.response.timestamp_end - flow.request.timestamp_start
+        if flow.response and hasattr(flow.response, 'timestamp_end') else None
+    }
 
+
+def iter_transactions(file_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Потоково читает файл mitmproxy и отдаёт транзакции по одной.
+    В памяти одновременно находится только один flow
+    """
     if not Path(file_path).exists():
         print(f"Ошибка: файл '{file_path}' не найден")
-        return []
+        return
 
     print(f"Парсинг файла: {file_path}")
 
+    processed = 0
     with open(file_path, "rb") as f:
         try:
             flow_reader = mitm_io.FlowReader(f)
@@ -32,90 +105,179 @@ def parse_mitm_file(file_path: str) -> List[Dict[str, Any]]:
                 if not isinstance(flow, HTTPFlow):
                     continue
 
-                # Формируем информацию о запросе
-                request_info = {
-                    "method": flow.request.method,
-                    "url": flow.request.pretty_url,
-                    "path": flow.request.path,
-                    "http_version": flow.request.http_version,
-                    "headers": dict(flow.request.headers),
-                    "timestamp": flow.request.timestamp_start,
-                    "timestamp_iso": datetime.fromtimestamp(flow.request.timestamp_start).isoformat()
-                    if hasattr(flow.request, 'timestamp_start') else None
-                }
-
-                # Добавляем тело запроса
-                if flow.request.raw_content:
-                    try:
-                        # Пробуем декодировать как текст
-                        request_info["body_text"] = flow.request.raw_content.decode('utf-8', errors='replace')
-                    except:
-                        # Если не текстовое, кодируем в base64
-                        request_info["body_base64"] = base64.b64encode(flow.request.raw_content).decode('ascii')
-                    request_info["body_size"] = len(flow.request.raw_content)
-
-                # Формируем информацию об ответе
-                response_info = None
-                if flow.response:
-                    response_info = {
-                        "status_code": flow.response.status_code,
-                        "reason": flow.response.reason,
-                        "http_version": flow.response.http_version,
-                        "headers": dict(flow.response.headers),
-                        "timestamp": flow.response.timestamp_end if hasattr(flow.response, 'timestamp_end') else None,
-                        "timestamp_iso": datetime.fromtimestamp(flow.response.timestamp_end).isoformat()
-                        if hasattr(flow.response, 'timestamp_end') else None
-                    }
-
-                    # Добавляем тело ответа
-                    if flow.response.raw_content:
-                        try:
-                            response_info["body_text"] = flow.response.raw_content.decode('utf-8', errors='replace')
-                        except:
-                            response_info["body_base64"] = base64.b64encode(flow.response.raw_content).decode('ascii')
-                        response_info["body_size"] = len(flow.response.raw_content)
-
-                # Формируем полную транзакцию
-                transaction = {
-                    "id": f"flow_{i:06d}",
-                    "request": request_info,
-                    "response": response_info,
-                    "duration": flow.response.timestamp_end - flow.request.timestamp_start
-                    if flow.response and hasattr(flow.response, 'timestamp_end') else None
-                }
-
-                transactions.append(transaction)
+                yield flow_to_transaction(flow, i)
+                processed += 1
 
                 # Прогресс
                 if (i + 1) % 10 == 0:
                     print(f"  Обработано {i + 1} транзакций...")
 
-            print(f"Успешно обработано {len(transactions)} транзакций")
+            print(f"Успешно обработано {processed} транзакций")
 
         except EOFError:
-            print(f"Обработано {len(transactions)} транзакций (достигнут конец файла)")
+            print(f"Обработано {processed} транзакций (достигнут конец файла)")
         except Exception as e:
             print(f"Ошибка при чтении файла: {e}")
 
+
+def parse_mitm_file(file_path: str) -> List[Dict[str, Any]]:
+    """Парсит файл mitmproxy и возвращает список транзакций в JSON-совместимом формате"""
+    return list(iter_transactions(file_path))
+
+
+def iter_raw_flows(f: BinaryIO) -> Iterator[bytes]:
+    """
+    Нарезает файл mitmproxy на сырые записи без их разбора.
+    Каждый flow хранится как tnetstring вида <длина>:<данные><тип>
+    """
+    while True:
+        length_prefix = b""
+        c = f.read(1)
+        while c.isdigit():
+            length_prefix += c
+            if len(length_prefix) > 12:
+                raise ValueError("некорректный префикс длины записи")
+            c = f.read(1)
+
+        if not length_prefix and not c:
+            return
+        if c != b":":
+            raise ValueError("некорректный префикс длины записи")
+
+        payload = f.read(int(length_prefix) + 1)
+        if len(payload) != int(length_prefix) + 1:
+            raise EOFError
+
+        yield length_prefix + b":" + payload
+
+
+def list_capture_files(path: str) -> List[Path]:
+    """Возвращает файл захвата или все файлы *.mitm из папки в стабильном порядке"""
+    capture_path = Path(path)
+    if capture_path.is_dir():
+        return sorted(capture_path.glob('*.mitm'))
+    return [capture_path]
+
+
+def iter_shards(file_paths: List[Path], shard_flows: int = 500,
+                shard_bytes: int = 64 * 1024 * 1024) -> Iterator[Tuple[int, bytes]]:
+    """
+    Группирует сырые записи в шарды. Возвращает индекс первого flow шарда
+    (сквозной по всем файлам) и байты шарда
+    """
+    index = 0
+    for file_path in file_paths:
+        print(f"Парсинг файла: {file_path}")
+
+        with open(file_path, "rb") as f:
+            shard_start = index
+            records = []
+            size = 0
+            try:
+                for record in iter_raw_flows(f):
+                    records.append(record)
+                    size += len(record)
+                    index += 1
+
+                    if len(records) >= shard_flows or size >= shard_bytes:
+                        yield shard_start, b"".join(records)
+                        shard_start, records, size = index, [], 0
+            except EOFError:
+                print(f"Файл {file_path} обрезан (достигнут конец файла)")
+            except Exception as e:
+                print(f"Ошибка при чтении файла {file_path}: {e}")
+
+            if records:
+                yield shard_start, b"".join(records)
+
+
+def convert_shard(shard: Tuple[int, bytes]) -> List[Dict[str, Any]]:
+    """Конвертирует один шард в транзакции (выполняется в процессе-воркере)"""
+    start_index, raw = shard
+    transactions = []
+
+    try:
+        flow_reader = mitm_io.FlowReader(io.BytesIO(raw))
+        for i, flow in enumerate(flow_reader.stream(), start_index):
+            if isinstance(flow, HTTPFlow):
+                transactions.append(flow_to_transaction(flow, i))
+    except Exception as e:
+        print(f"Ошибка при разборе шарда с flow_{start_index:06d}: {e}")
+
     return transactions
 
 
-def save_to_json(transactions: List[Dict[str, Any]], input_file_path: str) -> str:
-    """Сохраняет транзакции в JSON файл"""
+def iter_transactions_parallel(path: str, workers: int = None,
+                               shard_flows: int = 500) -> Iterator[Dict[str, Any]]:
+    """
+    Параллельный разбор файла (или папки с файлами .mitm) пулом процессов.
+    Транзакции отдаются в исходном порядке flow_NNNNNN, а в работе
+    одновременно находится не больше 2 * workers шардов
+    """
+    file_paths = list_capture_files(path)
+    missing = [str(p) for p in file_paths if not p.exists()]
+    if missing or not file_paths:
+        print(f"Ошибка: файл '{path}' не найден")
+        return
+
+    workers = workers or os.cpu_count() or 1
+    shards = iter_shards(file_paths, shard_flows)
+    processed = 0
+
+    if workers == 1:
+        for shard in shards:
+            for transaction in convert_shard(shard):
+                processed += 1
+                yield transaction
+        print(f"Успешно обработано {processed} транзакций")
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+
+        for shard in shards:
+            pending.append(executor.submit(convert_shard, shard))
+
+            if len(pending) >= workers * 2:
+                for transaction in pending.popleft().result():
+                    processed += 1
+                    yield transaction
+                print(f"  Обработано {processed} транзакций...")
+
+        while pending:
+            for transaction in pending.popleft().result():
+                processed += 1
+                yield transaction
+
+    print(f"Успешно обработано {processed} транзакций ({workers} процессов)")
+
+
+def make_output_path(input_file_path: str, suffix: str = '.json') -> Path:
+    """Подбирает свободное имя выходного файла рядом с исходным"""
     input_path = Path(input_file_path)
-    output_path = input_path.with_suffix('.json')
+    output_path = input_path.with_suffix(suffix)
 
     # Если файл уже существует, добавляем индекс
     counter = 1
     while output_path.exists():
-        output_path = input_path.with_name(f"{input_path.stem}_{counter}.json")
+        output_path = input_path.with_name(f"{input_path.stem}_{counter}{suffix}")
         counter += 1
 
+    return output_path
+
+
+def save_to_json(transactions: List[Dict[str, Any]], input_file_path: str,
+                 extra_metadata: Dict[str, Any] = None) -> str:
+    """Сохраняет транзакции в JSON файл"""
+    input_path = Path(input_file_path)
+    output_path = make_output_path(input_file_path)
+
     result = {
         "metadata": {
             "source_file": str(input_path.name),
             "generated_at": datetime.now().isoformat(),
-            "total_transactions": len(transactions)
+            "total_transactions": len(transactions),
+            **(extra_metadata or {})
         },
         "transactions": transactions
     }
@@ -126,27 +288,133 @@ def save_to_json(transactions: List[Dict[str, Any]], input_file_path: str) -> st
     return str(output_path)
 
 
-def main():
-    if len(sys.argv) != 2:
-        print("Использование: python mitm_to_json.py <файл.mitm>")
-        print("Пример: python mitm_to_json.py flows.mitm")
-        sys.exit(1)
+def write_transactions_stream(transactions: Iterable[Dict[str, Any]], input_file_path: str,
+                              output_format: str = 'json', compress: bool = False,
+                              extra_metadata: Dict[str, Any] = None) -> Tuple[str, int]:
+    """
+    Инкрементально записывает транзакции по мере их поступления.
+
+    Формат 'json' - объект с массивом transactions и метаданными в конце файла,
+    формат 'jsonl' - по одной транзакции на строку, последняя строка - {"metadata": ...},
+    формат 'e2c' - бинарный контейнер с телами в сырых байтах (опционально сжатый).
+
+    Returns:
+        Путь к выходному файлу и количество записанных транзакций
+    """
+    input_path = Path(input_file_path)
+    suffixes = {'json': '.json', 'jsonl': '.jsonl', 'e2c': CONTAINER_SUFFIX}
+    output_path = make_output_path(input_file_path, suffixes[output_format])
+
+    def build_metadata(total: int) -> Dict[str, Any]:
+        return {
+            "source_file": str(input_path.name),
+            "generated_at": datetime.now().isoformat(),
+            "total_transactions": total,
+            **(extra_metadata or {})
+        }
+
+    if output_format == 'e2c':
+        with CaptureContainerWriter(str(output_path), compress) as writer:
+            for transaction in transactions:
+                writer.write_entry(transaction)
+            writer.write_metadata(build_metadata(writer.entries_written))
+        return str(output_path), writer.entries_written
+
+    total = 0
+    with open(output_path, 'w', encoding='utf-8') as f:
+        if output_format != 'jsonl':
+            f.write('{\n  "transactions": [')
+
+        for transaction in transactions:
+            line = json.dumps(transaction, ensure_ascii=False, default=str)
+            if output_format == 'jsonl':
+                f.write(line + '\n')
+            else:
+                f.write(('\n    ' if total == 0 else ',\n    ') + line)
+            total += 1
+
+        metadata = build_metadata(total)
 
-    input_file = sys.argv[1]
+        if output_format == 'jsonl':
+            f.write(json.dumps({"metadata": metadata}, ensure_ascii=False) + '\n')
+        else:
+            f.write('\n  ],\n  "metadata": ' + json.dumps(metadata, ensure_ascii=False) + '\n}\n')
 
-    # Парсим файл
-    transactions = parse_mitm_file(input_file)
+    return str(output_path), total
 
-    if not transactions:
+
+def stream_to_json(input_file_path: str, output_format: str = 'json', workers: int = 0,
+                   compress: bool = False, body_store: BodyStore = None) -> Tuple[str, int]:
+    """
+    Потоковая конвертация mitm-файла в JSON/JSON Lines без накопления транзакций в памяти.
+    При workers > 0 файл (или папка с файлами) разбирается параллельно пулом процессов,
+    при заданном body_store тела выносятся в контентно-адресуемое хранилище
+    """
+    if workers:
+        transactions = iter_transactions_parallel(input_file_path, workers)
+    else:
+        transactions = iter_transactions(input_file_path)
+
+    extra_metadata = None
+    if body_store:
+        transactions = (externalize_bodies(t, body_store) for t in transactions)
+        extra_metadata = {"blob_store": blob_store_reference(body_store, input_file_path)}
+
+    return write_transactions_stream(transactions, input_file_path, output_format, compress, extra_metadata)
+
+
+def blob_store_reference(body_store: BodyStore, input_file_path: str) -> str:
+    """Путь к хранилищу тел относительно выходного файла (он создаётся рядом с исходным)"""
+    return os.path.relpath(body_store.root.resolve(), Path(input_file_path).resolve().parent)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Парсер mitmproxy файлов в JSON')
+    parser.add_argument('mitm_file', help='Путь к файлу .mitm или к папке с файлами .mitm')
+    parser.add_argument('--stream', action='store_true',
+                        help='Потоковая запись без загрузки всех транзакций в память')
+    parser.add_argument('--format', choices=['json', 'jsonl', 'e2c'], default='json', dest='output_format',
+                        help='Формат выходного файла (jsonl и бинарный контейнер e2c всегда пишутся потоково)')
+    parser.add_argument('--compress', action='store_true', help='Сжимать записи контейнера e2c')
+    parser.add_argument('--blob-store', default=None,
+                        help='Папка контентно-адресуемого хранилища: тела сохраняются один раз и заменяются ссылкой')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Параллельный разбор пулом процессов (0 - по числу ядер)')
+
+    args = parser.parse_args()
+    input_file = args.mitm_file
+    body_store = BodyStore(args.blob_store) if args.blob_store else None
+
+    streaming = args.stream or args.output_format != 'json' or args.workers is not None
+    if streaming:
+        workers = args.workers or os.cpu_count() if args.workers is not None else 0
+        output_file, total = stream_to_json(input_file, args.output_format, workers, args.compress, body_store)
+    else:
+        # Парсим файл
+        transactions = parse_mitm_file(input_file)
+        total = len(transactions)
+
+        if transactions:
+            extra_metadata = None
+            if body_store:
+                transactions = [externalize_bodies(t, body_store) for t in transactions]
+                extra_metadata = {"blob_store": blob_store_reference(body_store, input_file)}
+
+            # Сохраняем в JSON
+            output_file = save_to_json(transactions, input_file, extra_metadata)
+
+    if not total:
+        if streaming:
+            Path(output_file).unlink(missing_ok=True)
         print("Не удалось извлечь транзакции из файла")
         sys.exit(1)
 
-    # Сохраняем в JSON
-    output_file = save_to_json(transactions, input_file)
-
     print(f"\n✅ Результат сохранён в: {output_file}")
-    print(f"   Всего транзакций: {len(transactions)}")
-    print(f"   Размер JSON: {Path(output_file).stat().st_size} байт")
+    print(f"   Всего транзакций: {total}")
+    print(f"   Размер файла: {Path(output_file).stat().st_size} байт")
+    if body_store:
+        print(f"   Уникальных тел в хранилище {body_store.root}: {body_store.bodies_written}, "
+              f"сэкономлено повторов: {body_store.bytes_deduplicated} байт")
 
 
 if __name__ == "__main__":
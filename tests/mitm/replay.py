@@ -0,0 +1,276 @@
+"""
+Повтор записанного трафика как нагрузочного теста.
+
+Запросы из захвата (JSON, JSON Lines или контейнер .e2c после mitm_parser)
+отправляются на работающий сервер с сохранением исходных интервалов между ними
+(или в N раз быстрее) и с ограничением числа одновременных запросов. По каждому
+эндпоинту считаются перцентили задержки и сравниваются с записанным duration.
+Использование: python replay.py traffic.json --url http://localhost:7777 [--speed 2] [--concurrency 32]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+try:
+    from tests.common.capture_container import is_container, load_container, materialize
+except ImportError:
+    # Запуск как скрипта из папки модуля - добавляем корень репозитория в путь
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from tests.common.capture_container import is_container, load_container, materialize
+from tests.common.body_store import BodyResolver, find_store_root
+from tests.common.live_server import DEFAULT_MAX_CONNECTIONS, LiveServer, pooled_client
+from tests.common.stats import summarize
+
+# Заголовки, которые httpx выставляет сам или которые относятся к исходному соединению
+SKIPPED_HEADERS = {'host', 'content-length', 'connection', 'keep-alive', 'transfer-encoding', 'proxy-connection'}
+
+
+class ReplayRequest:
+    __slots__ = ('endpoint', 'method', 'target', 'headers', 'body', 'timestamp', 'recorded_duration',
+                 'recorded_status')
+
+    def __init__(self, transaction: Dict[str, Any]):
+        """
+        Запрос для повтора, собранный из транзакции mitm_parser
+
+        Args:
+            transaction: Транзакция с секциями request/response и duration
+        """
+        request = transaction.get('request') or {}
+        response = transaction.get('response') or {}
+
+        url = urlsplit(request.get('url', ''))
+        self.method = request.get('method', 'GET')
+        self.endpoint = f"{self.method} {url.path or '/'}"
+        self.target = url.path + (f"?{url.query}" if url.query else '')
+        self.headers = {name: value for name, value in (request.get('headers') or {}).items()
+                        if name.lower() not in SKIPPED_HEADERS}
+        self.body = request_body(request)
+        self.timestamp = request.get('timestamp') or 0.0
+        self.recorded_duration = transaction.get('duration')
+        self.recorded_status = response.get('status_code')
+
+
+def request_body(request: Dict[str, Any]) -> Optional[bytes]:
+    """Исходные байты тела запроса"""
+    body_base64 = materialize(request.get('body_base64'))
+    if body_base64:
+        return base64.b64decode(body_base64)
+
+    body_text = materialize(request.get('body_text'))
+    return body_text.encode('utf-8') if body_text else None
+
+
+def iter_transactions(file_path: str) -> Iterator[Dict[str, Any]]:
+    """Транзакции захвата в любом из форматов mitm_parser"""
+    if is_container(file_path):
+        _, transactions = load_container(file_path)
+        yield from transactions
+        return
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        if file_path.endswith('.jsonl'):
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if 'request' in record:
+                    yield record
+        else:
+            yield from json.load(f).get('transactions', [])
+
+
+def load_requests(file_path: str, blob_store: Optional[str] = None) -> List[ReplayRequest]:
+    """Запросы захвата в порядке их отправки"""
+    resolver = BodyResolver(find_store_root(file_path, None, blob_store))
+    requests = [ReplayRequest(resolver.resolve(transaction)) for transaction in iter_transactions(file_path)]
+    requests.sort(key=lambda request: request.timestamp)
+    return requests
+
+
+class ReplayEngine:
+    def __init__(self, base_url: str, speed: float = 1.0, concurrency: int = 32,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS):
+        """
+        Повтор запросов с исходными интервалами
+
+        Args:
+            base_url: Адрес сервера, на который отправляются запросы
+            speed: Ускорение относительно записи (2 - вдвое быстрее, 0 - без пауз)
+            concurrency: Максимум одновременно выполняемых запросов
+            max_connections: Размер пула keep-alive соединений
+        """
+        self.base_url = base_url
+        self.speed = speed
+        self.concurrency = concurrency
+        self.max_connections = max_connections
+        self.latencies = defaultdict(list)
+        self.recorded = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.status_mismatches = defaultdict(int)
+        self.schedule_lag = []
+
+    async def send(self, client: httpx.AsyncClient, request: ReplayRequest):
+        """Отправка одного запроса и замер задержки"""
+        started = time.perf_counter()
+        try:
+            response = await client.request(request.method, request.target, headers=request.headers,
+                                            content=request.body)
+            await response.aread()
+        except httpx.HTTPError:
+            self.errors[request.endpoint] += 1
+            return
+
+        self.latencies[request.endpoint].append(time.perf_counter() - started)
+        if request.recorded_status is not None and response.status_code != request.recorded_status:
+            self.status_mismatches[request.endpoint] += 1
+
+    async def replay(self, requests: List[ReplayRequest]) -> float:
+        """Повтор всех запросов, возвращает общее время"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+
+        async def run(client: httpx.AsyncClient, request: ReplayRequest):
+            try:
+                await self.send(client, request)
+            finally:
+                semaphore.release()
+
+        async with pooled_client(self.base_url, self.max_connections) as client:
+            started = time.perf_counter()
+            first_timestamp = requests[0].timestamp if requests else 0.0
+
+            for request in requests:
+                if request.recorded_duration is not None:
+                    self.recorded[request.endpoint].append(request.recorded_duration)
+
+                if self.speed > 0:
+                    due = (request.timestamp - first_timestamp) / self.speed
+                    delay = due - (time.perf_counter() - started)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+                # При исчерпании concurrency запрос ждёт, отставание от расписания попадает в отчёт
+                await semaphore.acquire()
+                if self.speed > 0:
+                    self.schedule_lag.append(max(0.0, time.perf_counter() - started - due))
+
+                task = asyncio.create_task(run(client, request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks)
+
+            return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        """Отчёт: перцентили задержки по эндпоинтам в сравнении с записью"""
+        endpoints = {}
+        for endpoint in sorted(set(self.latencies) | set(self.errors)):
+            replayed = summarize(self.latencies[endpoint])
+            recorded = summarize(self.recorded[endpoint])
+            endpoints[endpoint] = {
+                'replayed': replayed,
+                'recorded': recorded,
+                'errors': self.errors[endpoint],
+                'status_mismatches': self.status_mismatches[endpoint],
+                'p95_ratio': replayed['p95'] / recorded['p95']
+                if replayed.get('p95') is not None and recorded.get('p95') else None,
+            }
+
+        total = sum(len(values) for values in self.latencies.values()) + sum(self.errors.values())
+        return {
+            'base_url': self.base_url,
+            'speed': self.speed,
+            'concurrency': self.concurrency,
+            'requests': total,
+            'elapsed_seconds': elapsed,
+            'throughput_per_second': total / elapsed if elapsed else None,
+            'schedule_lag': summarize(self.schedule_lag),
+            'endpoints': endpoints,
+        }
+
+
+def format_ms(value: Optional[float]) -> str:
+    return f"{value * 1000:.1f}" if value is not None else '-'
+
+
+def print_report(report: Dict[str, Any]):
+    """Таблица задержек по эндпоинтам"""
+    print(f"\nЗапросов: {report['requests']} за {report['elapsed_seconds']:.2f} с "
+          f"({report['throughput_per_second'] or 0:.1f}/с)")
+    print(f"{'Эндпоинт':<40} {'N':>7} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} "
+          f"{'запись p95':>11} {'x':>6} {'ошибки':>7}")
+    for endpoint, stats in report['endpoints'].items():
+        replayed, recorded = stats['replayed'], stats['recorded']
+        ratio = f"{stats['p95_ratio']:.2f}" if stats['p95_ratio'] is not None else '-'
+        print(f"{endpoint[:40]:<40} {replayed['count']:>7} {format_ms(replayed.get('p50')):>9} "
+              f"{format_ms(replayed.get('p95')):>9} {format_ms(replayed.get('p99')):>9} "
+              f"{format_ms(recorded.get('p95')):>11} "
+              f"{ratio:>6} {stats['errors'] + stats['status_mismatches']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Повтор записанного трафика как нагрузочного теста')
+    parser.add_argument('capture', help='Захват после mitm_parser (JSON, JSON Lines или .e2c)')
+    parser.add_argument('--url', default=None, help='Адрес сервера (по умолчанию поднимается main:app)')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Ускорение относительно записи (0 - отправлять без пауз)')
+    parser.add_argument('--concurrency', type=int, default=32, help='Максимум одновременных запросов')
+    parser.add_argument('--max-connections', type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help='Размер пула keep-alive соединений')
+    parser.add_argument('--blob-store', default=None, help='Папка хранилища тел, вынесенных по хэшу')
+    parser.add_argument('--max-p95-ratio', type=float, default=None,
+                        help='Завершиться с кодом 1, если p95 эндпоинта превышает записанный в N раз')
+    parser.add_argument('--output', default=None, help='Куда сохранить отчёт в JSON')
+
+    args = parser.parse_args()
+
+    requests = load_requests(args.capture, args.blob_store)
+    if not requests:
+        print("Не найдено транзакций в файле")
+        sys.exit(1)
+    print(f"Загружено {len(requests)} запросов из {args.capture}")
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        server = LiveServer()
+        server.start()
+        base_url = server.url
+
+    engine = ReplayEngine(base_url, args.speed, args.concurrency, args.max_connections)
+    try:
+        elapsed = asyncio.run(engine.replay(requests))
+    finally:
+        if server:
+            server.stop()
+
+    report = engine.report(elapsed)
+    print_report(report)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"Отчёт сохранён в {args.output}")
+
+    if args.max_p95_ratio is not None:
+        slow = [endpoint for endpoint, stats in report['endpoints'].items()
+                if stats['p95_ratio'] is not None and stats['p95_ratio'] > args.max_p95_ratio]
+        if slow:
+            print(f"p95 превышает записанный более чем в {args.max_p95_ratio} раз: {', '.join(slow)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
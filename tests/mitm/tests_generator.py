@@ -1,22 +1,80 @@
 import base64
 import json
 import os
+import random
 import re
 import sys
 from pathlib import Path
 from typing import Dict, List, Any, Optional
-from urllib.parse import unquote, urlparse
-
-
-class APITestGenerator:
-    def __init__(self, json_file_path: str):
+from urllib.parse import urlparse
+
+try:
+    from tests.common.capture_container import (
+        CaptureContainerReader, LazyBody, is_container, load_container, materialize
+    )
+except ImportError:
+    # Запуск как скрипта из папки модуля - добавляем корень репозитория в путь
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from tests.common.capture_container import (
+        CaptureContainerReader, LazyBody, is_container, load_container, materialize
+    )
+from tests.common.body_store import BodyResolver, find_store_root
+from tests.common.generator_base import BaseTestGenerator
+from tests.common.group_stats import GroupStats, reservoir_add
+from tests.common.instrumentation import Instrumentation
+from tests.common.literal_emitter import format_literal
+from tests.common.manifest import DEFAULT_MANIFEST_NAME
+from tests.common.multipart import decode_text, iter_parts, parse_boundary
+from tests.common.snapshots import DEFAULT_MIN_SNAPSHOT_SIZE, SNAPSHOTS_DIR_NAME
+from tests.common.stats import DEFAULT_LATENCY_FLOOR
+
+
+class APITestGenerator(BaseTestGenerator):
+    def __init__(self, json_file_path: str, blob_store: Optional[str] = None, lazy: bool = False,
+                 incremental: bool = False, manifest_path: Optional[str] = None, workers: int = 1,
+                 snapshots: bool = False, snapshot_min_size: int = DEFAULT_MIN_SNAPSHOT_SIZE,
+                 metrics: Optional[Instrumentation] = None, latency_factor: Optional[float] = None,
+                 latency_floor: float = DEFAULT_LATENCY_FLOOR, stats_comments: bool = False,
+                 mask_volatile: bool = True, max_samples: Optional[int] = None, sample_seed: int = 0):
         """
         Инициализация генератора тестов
 
         Args:
-            json_file_path: Путь к JSON-файлу с логами
+            json_file_path: Путь к JSON-файлу с логами (JSON, JSON Lines или бинарный контейнер .e2c)
+            blob_store: Папка хранилища тел, если тела вынесены по хэшу (по умолчанию - из метаданных)
+            lazy: Ленивый режим - тела из контейнера .e2c (через mmap) или хранилища тел
+                читаются только для образцов, попадающих в тесты
+            incremental: Перезаписывать только файлы ресурсов, группы которых изменились
+            manifest_path: Путь к манифесту инкрементальной генерации
+            workers: Число процессов для рендеринга файлов ресурсов (1 - последовательно)
+            snapshots: Выносить крупные ожидаемые данные в сжатые snapshot-файлы рядом с тестом
+            snapshot_min_size: Минимальная длина литерала (в символах), начиная с которой данные выносятся
+            metrics: Сборщик метрик по стадиям (по умолчанию - только таймеры и счётчики)
+            latency_factor: Добавлять проверку задержки: p95 записанных длительностей группы,
+                умноженный на этот коэффициент (None - без проверки)
+            latency_floor: Минимальный бюджет задержки в секундах
+            stats_comments: Добавлять в тесты комментарий со статистикой группы по всем образцам
+            mask_volatile: Поля ответа, различающиеся между образцами группы, проверять только по типу
+            max_samples: Максимум хранимых образцов группы (первый + случайная выборка остальных);
+                статистика группы всё равно считается по всем образцам
+            sample_seed: Seed случайной выборки образцов
         """
         self.json_file_path = json_file_path
+        self.blob_store = blob_store
+        self.lazy = lazy
+        self.container = None
+        self.incremental = incremental
+        self.manifest_path = manifest_path or str(Path.cwd() / DEFAULT_MANIFEST_NAME)
+        self.workers = workers
+        self.snapshots = snapshots
+        self.snapshot_min_size = snapshot_min_size
+        self.metrics = metrics or Instrumentation()
+        self.latency_factor = latency_factor
+        self.latency_floor = latency_floor
+        self.stats_comments = stats_comments
+        self.mask_volatile = mask_volatile
+        self.max_samples = max_samples
+        self.sample_rng = random.Random(sample_seed)
         self.data = {}
         self.transactions = []
         self.endpoint_tests = {}  # Группировка по эндпоинтам и параметрам
@@ -24,10 +82,27 @@ class APITestGenerator:
     def load_json_data(self):
         """Загрузка и парсинг JSON данных"""
         try:
-            with open(self.json_file_path, 'r', encoding='utf-8') as f:
-                self.data = json.load(f)
+            if is_container(self.json_file_path):
+                if self.lazy:
+                    # Держим контейнер открытым: тела читаются из mmap по мере надобности
+                    self.container = CaptureContainerReader(self.json_file_path, lazy=True)
+                    transactions = list(self.container)
+                    metadata = self.container.metadata
+                else:
+                    metadata, transactions = load_container(self.json_file_path)
+                self.data = {'metadata': metadata, 'transactions': transactions}
+            else:
+                if self.lazy:
+                    print("Ленивый режим для JSON доступен только для тел из хранилища, "
+                          "для mmap используйте контейнер .e2c")
+                with open(self.json_file_path, 'r', encoding='utf-8') as f:
+                    if self.json_file_path.endswith('.jsonl'):
+                        self.data = self.load_jsonl(f)
+                    else:
+                        self.data = json.load(f)
 
             self.transactions = self.data.get('transactions', [])
+            self.resolve_body_refs(self.data.get('metadata'))
             print(f"Загружено {len(self.transactions)} транзакций из {self.json_file_path}")
             print(f"Метаданные: {self.data.get('metadata', {})}")
 
@@ -35,93 +110,106 @@ class APITestGenerator:
             print(f"Ошибка при загрузке JSON: {e}")
             sys.exit(1)
 
-    def parse_value(self, value: str) -> Any:
-        """Парсинг строкового значения в Python-тип"""
-        if value == "":
-            return ""
-        elif value.lower() == "null":
-            return None
-        elif value.lower() == "true":
-            return True
-        elif value.lower() == "false":
-            return False
-        elif value.isdigit():
-            # Целое число
-            return int(value)
-        elif value.replace('.', '', 1).isdigit() and value.count('.') == 1:
-            # Вещественное число
-            return float(value)
-        else:
-            # Строка - возвращаем как есть
-            return value
+    def resolve_body_refs(self, metadata: Optional[Dict[str, Any]] = None):
+        """Подстановка тел, вынесенных в контентно-адресуемое хранилище"""
+        resolver = BodyResolver(find_store_root(self.json_file_path, metadata, self.blob_store), lazy=self.lazy)
+        for transaction in self.transactions:
+            resolver.resolve(transaction)
+
+    def close(self):
+        """Закрытие контейнера, открытого в ленивом режиме"""
+        if self.container:
+            self.container.close()
+            self.container = None
+
+    def load_jsonl(self, f) -> Dict[str, Any]:
+        """Чтение JSON Lines: по транзакции на строку, метаданные - в строке {"metadata": ...}"""
+        data = {'metadata': {}, 'transactions': []}
 
-    def extract_file_info(self, request_body_text: str) -> Optional[Dict[str, Any]]:
-        """Извлечение информации о файле из multipart/form-data"""
-        if not request_body_text or 'multipart/form-data' not in request_body_text:
+        for line in f:
+            if not line.strip():
+                continue
+
+            record = json.loads(line)
+            if 'metadata' in record and 'request' not in record:
+                data['metadata'] = record['metadata']
+            else:
+                data['transactions'].append(record)
+
+        return data
+
+    def extract_file_info(self, body: bytes, content_type: str = '') -> Optional[Dict[str, Any]]:
+        """
+        Извлечение файлов и полей формы из multipart/form-data
+
+        Тело разбирается за один проход без копирования частей (см. tests/common/multipart.py);
+        boundary берётся из Content-Type, а если его нет - из первой строки тела
+        """
+        if not body:
             return None
 
         try:
-            # Ищем boundary
-            boundary_match = re.search(r'boundary=([^\s;]+)', request_body_text)
-            if not boundary_match:
-                return None
-
-            boundary = boundary_match.group(1)
-            parts = request_body_text.split(f'--{boundary}')
-
-            for part in parts:
-                if 'filename=' in part:
-                    # Извлекаем информацию о файле
-                    filename_match = re.search(r'filename="([^"]+)"', part)
-                    content_type_match = re.search(r'Content-Type: ([^\r\n]+)', part)
-                    name_match = re.search(r'name="([^"]+)"', part)
-
-                    if filename_match:
-                        filename = filename_match.group(1)
-                        content_type = content_type_match.group(1) if content_type_match else 'application/octet-stream'
-                        field_name = name_match.group(1) if name_match else 'file'
-
-                        # Извлекаем бинарные данные файла
-                        header_end = part.find('\r\n\r\n')
-                        if header_end != -1:
-                            file_data_start = header_end + 4
-                            file_data = part[file_data_start:]
-
-                            if file_data.endswith('\r\n'):
-                                file_data = file_data[:-2]
-
-                            is_binary = any(ord(c) < 32 and c not in '\r\n\t' for c in file_data[:100])
-
-                            if is_binary:
-                                file_data_base64 = base64.b64encode(file_data.encode('latin-1')).decode('utf-8')
-                                return {
-                                    'field_name': field_name,
-                                    'filename': filename,
-                                    'content_type': content_type,
-                                    'is_binary': True,
-                                    'data_base64': file_data_base64,
-                                    'size': len(file_data)
-                                }
-                            else:
-                                return {
-                                    'field_name': field_name,
-                                    'filename': filename,
-                                    'content_type': content_type,
-                                    'is_binary': False,
-                                    'data_text': file_data,
-                                    'size': len(file_data)
-                                }
+            files = []
+            fields = {}
+            for part in iter_parts(body, parse_boundary(content_type)):
+                if not part.is_file:
+                    if part.name:
+                        fields[part.name] = bytes(part.data).decode('utf-8', errors='replace')
+                    continue
+
+                file_info = {
+                    'field_name': part.name or 'file',
+                    'filename': part.filename,
+                    'content_type': part.content_type,
+                    'size': len(part.data),
+                }
+
+                file_text = decode_text(part.data)
+                if file_text is None:
+                    file_info['is_binary'] = True
+                    file_info['data_base64'] = base64.b64encode(part.data).decode('ascii')
+                else:
+                    file_info['is_binary'] = False
+                    file_info['data_text'] = file_text
+
+                files.append(file_info)
+
+            if files:
+                return {'files': files, 'fields': fields}
 
         except Exception as e:
             print(f"Ошибка при парсинге файла: {e}")
 
         return None
 
+    def is_file_upload(self, request_body: Any) -> bool:
+        """Тело запроса - результат extract_file_info"""
+        return isinstance(request_body, dict) and 'files' in request_body and 'fields' in request_body
+
+    def body_bytes(self, section: Dict[str, Any]) -> bytes:
+        """Исходные байты тела: mitm_parser хранит их без потерь (body_text - только для валидного UTF-8)"""
+        body_base64 = section.get('body_base64')
+        if isinstance(body_base64, LazyBody):
+            return body_base64.raw()
+        if body_base64:
+            return base64.b64decode(body_base64)
+        return materialize(section.get('body_text', '') or '').encode('utf-8')
+
     def extract_request_body(self, request: Dict[str, Any]) -> Optional[Any]:
         """Извлечение и парсинг тела запроса"""
-        request_body_text = request.get('body_text', '')
         content_type = request.get('headers', {}).get('Content-Type', '')
 
+        if 'multipart/form-data' in content_type:
+            # Для multipart/form-data возвращаем информацию о файлах
+            self.metrics.count('multipart_bodies')
+            with self.metrics.stage('extract_file_info'):
+                return self.extract_file_info(self.body_bytes(request), content_type)
+
+        if request.get('body_base64'):
+            # Бинарное тело отправляется байт в байт
+            return self.body_bytes(request)
+
+        request_body_text = materialize(request.get('body_text', ''))
         if not request_body_text:
             return None
 
@@ -133,10 +221,6 @@ class APITestGenerator:
                 # Если не парсится как JSON, возвращаем как строку
                 return request_body_text
 
-        # Для multipart/form-data возвращаем информацию о файле
-        elif 'multipart/form-data' in content_type:
-            return self.extract_file_info(request_body_text)
-
         # Для других типов возвращаем как есть
         else:
             return request_body_text
@@ -150,6 +234,13 @@ class APITestGenerator:
             url = request.get('url', '')
             method = request.get('method', 'GET')
             response_body_text = response.get('body_text', '{}')
+            if 'body_text' not in response and response.get('body_base64'):
+                if isinstance(response['body_base64'], LazyBody):
+                    # Ленивый режим: байты читаются только для образца, попадающего в тест
+                    response_body_text = response['body_base64']
+                else:
+                    # Бинарный ответ сравнивается как текст, как и раньше
+                    response_body_text = self.body_bytes(response).decode('utf-8', errors='replace')
             response_status = response.get('status_code', 200)
             response_headers = response.get('headers', {})
 
@@ -165,8 +256,6 @@ class APITestGenerator:
             # Извлекаем тело запроса
             request_body = self.extract_request_body(request)
 
-            # Парсим тело ответа
-            response_data = {}
             response_is_file = False
             response_filename = None
 
@@ -177,16 +266,18 @@ class APITestGenerator:
                 filename_match = re.search(r'filename="([^"]+)"', content_disposition)
                 response_filename = filename_match.group(1) if filename_match else 'downloaded_file'
 
-            # Если это файл, сохраняем текст как есть
-            if response_is_file:
-                response_data = response_body_text
+            # Парсим тело ответа
+            response_body_ref = None
+            if isinstance(response_body_text, LazyBody):
+                # Ленивый режим: тело ответа читается только для образцов, выводимых в тест
+                response_body_ref = response_body_text
+                response_data = None
             else:
-                # Пытаемся распарсить как JSON
-                try:
-                    if response_body_text.strip():
-                        response_data = json.loads(response_body_text)
-                except:
-                    response_data = response_body_text
+                response_data = self.parse_response_data(response_body_text, response_is_file)
+
+            response_size = response.get('body_size')
+            if response_size is None and isinstance(response_body_text, str):
+                response_size = len(response_body_text.encode('utf-8'))
 
             return {
                 'endpoint': endpoint,
@@ -195,31 +286,82 @@ class APITestGenerator:
                 'params': params,
                 'request_body': request_body,
                 'response_data': response_data,
+                'response_body_ref': response_body_ref,
                 'response_status': response_status,
                 'response_is_file': response_is_file,
                 'response_filename': response_filename,
                 'response_content_type': response_headers.get('content-type', ''),
                 'timestamp': request.get('timestamp_iso', ''),
+                'duration': transaction.get('duration'),
+                'response_size': response_size,
             }
         except Exception as e:
             print(f"Ошибка при обработке транзакции {transaction.get('id', 'unknown')}: {e}")
             return None
 
-    def parse_query_params(self, query_string: str) -> Dict[str, Any]:
-        """Парсинг query параметров с декодированием URL и преобразованием типов"""
-        params = {}
+    def parse_response_data(self, response_body_text: str, response_is_file: bool) -> Any:
+        """Парсинг тела ответа"""
+        # Если это файл, сохраняем текст как есть
+        if response_is_file:
+            return response_body_text
+
+        # Пытаемся распарсить как JSON
+        response_data = {}
         try:
-            for param in query_string.split('&'):
-                if '=' in param:
-                    key, value = param.split('=', 1)
-                    # Декодируем URL-encoded значения
-                    key = unquote(key)
-                    value = unquote(value)
-                    # Парсим значение в Python-тип
-                    params[key] = self.parse_value(value)
+            if response_body_text.strip():
+                response_data = json.loads(response_body_text)
         except:
-            pass
-        return params
+            response_data = response_body_text
+
+        return response_data
+
+    def materialize_sample(self, sample: Dict[str, Any]) -> Dict[str, Any]:
+        """Чтение отложенного тела ответа для образца, который попадает в тест"""
+        if sample.get('response_body_ref') is None:
+            return sample
+
+        ref = sample['response_body_ref']
+        # Бинарный ответ (ссылка на body_base64) сравнивается как текст, как и при полной загрузке
+        response_body_text = ref.raw().decode('utf-8', errors='replace') if ref.encoding == 'base64' else ref.value()
+        return dict(
+            sample,
+            response_data=self.parse_response_data(response_body_text, sample.get('response_is_file', False)),
+            response_body_ref=None,
+        )
+
+    def field_stats_data(self, api_info: Dict[str, Any]) -> Any:
+        """
+        Тело ответа для статистики полей группы. Отложенное тело разбирается только на время подсчёта;
+        файлы и бинарные тела не читаются: тела в контейнере и хранилище адресуются по содержимому,
+        поэтому одинаковые тела имеют одну ссылку
+        """
+        ref = api_info['response_body_ref']
+        if ref is None:
+            return api_info['response_data']
+        if ref.encoding == 'base64' or api_info['response_is_file']:
+            return f'<body {ref.key}>'
+        return self.parse_response_data(ref.value(), False)
+
+    def test_function_name(self, test_data: Dict[str, Any]) -> str:
+        """Базовое имя тестовой функции группы (с учётом тела запроса)"""
+        return self.create_test_function_name(test_data['endpoint'], test_data['method'], test_data['params'],
+                                              test_data['request_body'])
+
+    def group_render_data(self, test_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Данные рендеринга группы: тело запроса берётся из группы, ссылка на тело ответа не учитывается"""
+        rendered = super().group_render_data(test_data)
+        rendered.pop('response_body_ref', None)
+        rendered.pop('request_body', None)
+        rendered['request_body'] = test_data.get('request_body')
+        return rendered
+
+    def worker_copy(self) -> 'APITestGenerator':
+        """Копия генератора для процесса-воркера без загруженных транзакций"""
+        clone = super().worker_copy()
+        clone.data = {}
+        clone.transactions = []
+        clone.container = None
+        return clone
 
     def group_by_endpoint_and_params(self):
         """Группировка транзакций по эндпоинтам и параметрам"""
@@ -237,9 +379,11 @@ class APITestGenerator:
             params_key = tuple(sorted(params.items()))
             body_key = None
             if request_body:
-                if isinstance(request_body, dict) and 'field_name' in request_body:
-                    # Для файлов используем информацию о файле
-                    body_key = ('file', request_body.get('field_name'), request_body.get('filename'))
+                if self.is_file_upload(request_body):
+                    # Для файлов используем поля формы и имена файлов
+                    body_key = ('file', tuple((file_info['field_name'], file_info['filename'])
+                                              for file_info in request_body['files']),
+                                tuple(sorted(request_body['fields'].items())))
                 elif isinstance(request_body, dict):
                     # Для JSON используем хэш словаря
                     body_key = ('json', json.dumps(request_body, sort_keys=True))
@@ -251,14 +395,24 @@ class APITestGenerator:
 
             if group_key not in self.endpoint_tests:
                 self.endpoint_tests[group_key] = {
+                    'group_key': group_key,
                     'endpoint': endpoint,
                     'method': method,
                     'params': params,
                     'request_body': request_body,
                     'samples': [],
+                    'stats': GroupStats(),
                 }
 
-            self.endpoint_tests[group_key]['samples'].append(api_info)
+            group = self.endpoint_tests[group_key]
+            group['stats'].add(api_info['duration'], api_info['response_size'],
+                               api_info['response_status'], self.field_stats_data(api_info))
+
+            if self.lazy:
+                # Тело запроса нужно только группе, в образцах его не держим
+                api_info['request_body'] = None
+
+            reservoir_add(group['samples'], api_info, group['stats'].count, self.max_samples, self.sample_rng)
 
         print(f"Обнаружено {len(self.endpoint_tests)} уникальных комбинаций эндпоинт+параметры")
 
@@ -275,9 +429,9 @@ class APITestGenerator:
         # Добавляем информацию о запросе к имени функции
         body_suffix = ""
         if request_body:
-            if isinstance(request_body, dict) and 'field_name' in request_body:
+            if self.is_file_upload(request_body):
                 # Для файлов
-                filename = request_body.get('filename', 'file')
+                filename = request_body['files'][0].get('filename', 'file')
                 filename_base = re.sub(r'\.[^.]+$', '', filename)
                 filename_clean = re.sub(r'[^a-zA-Z0-9_]', '_', filename_base)
                 body_suffix = f"_upload_{filename_clean}"
@@ -312,15 +466,6 @@ class APITestGenerator:
 
         return f"test_{func_name}"
 
-    def generate_test_imports(self) -> str:
-        """Генерация импортов для тестового файла"""
-        return '''import json
-from http import HTTPStatus
-
-import pytest
-
-'''
-
     def generate_params_dict(self, params: Dict[str, Any]) -> str:
         """Генерация строки с параметрами для теста"""
         if not params:
@@ -355,71 +500,54 @@ import pytest
         if request_body is None:
             return ""
 
-        if isinstance(request_body, dict) and 'field_name' in request_body:
+        if self.is_file_upload(request_body):
             # Для файлов
             return self.generate_file_upload_code(request_body)
         elif isinstance(request_body, dict):
             # Для JSON
-            import pprint
-            formatted = pprint.pformat(request_body, indent=1, width=100, depth=None)
-            lines = formatted.split('\n')
-            lines = [line[1:] if line.startswith(' ') else line for line in lines]
-            json_data = '\n'.join(lines)
+            json_data = format_literal(request_body, '    ', len('    json_data = '))
 
             return f'''json_data = {json_data}'''
         elif isinstance(request_body, str):
             # Для строковых данных
             escaped = request_body.replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
             return f'''data = "{escaped}"'''
+        elif isinstance(request_body, bytes):
+            # Для бинарных данных
+            return f'''import base64
+    data = base64.b64decode("{base64.b64encode(request_body).decode('ascii')}")'''
         else:
             return ""
 
     def generate_file_upload_code(self, file_info: Dict[str, Any]) -> str:
-        """Генерация кода для загрузки файла"""
-        field_name = file_info.get('field_name', 'file')
-        filename = file_info.get('filename', 'file')
-        content_type = file_info.get('content_type', 'application/octet-stream')
-
-        if file_info.get('is_binary', True):
-            data_base64 = file_info.get('data_base64', '')
-            return f'''
-        # Подготовка файла для загрузки
-        import io
-        import base64
-        file_data = base64.b64decode("{data_base64}")
-        files = {{
-            "{field_name}": ("{filename}", io.BytesIO(file_data), "{content_type}")
-        }}'''
-        else:
-            data_text = file_info.get('data_text', '')
-            escaped_text = data_text.replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
-            return f'''
-        # Подготовка файла для загрузки
-        import io
-        file_data = "{escaped_text}".encode('utf-8')
-        files = {{
-            "{field_name}": ("{filename}", io.BytesIO(file_data), "{content_type}")
-        }}'''
-
-    def generate_expected_data(self, sample: Dict[str, Any]) -> str:
-        """Генерация строки с ожидаемыми данными"""
-        response_data = sample['response_data']
-        response_is_file = sample.get('response_is_file', False)
-
-        if response_is_file:
-            if isinstance(response_data, str):
-                escaped_text = response_data.replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
-                return f'"{escaped_text}"'
+        """Генерация кода для загрузки файлов (и полей формы)"""
+        file_lines = []
+        for upload in file_info['files']:
+            field_name = upload.get('field_name', 'file')
+            filename = upload.get('filename', 'file')
+            content_type = upload.get('content_type', 'application/octet-stream')
+
+            if upload.get('is_binary', True):
+                file_data = f'base64.b64decode("{upload.get("data_base64", "")}")'
             else:
-                return repr(response_data)
-        else:
-            import pprint
-            formatted = pprint.pformat(response_data, indent=1, width=100, depth=None)
-            lines = formatted.split('\n')
-            lines = [line[1:] if line.startswith(' ') else line for line in lines]
-            return '\n'.join(lines)
+                file_data = f"{upload.get('data_text', '')!r}.encode('utf-8')"
+
+            file_lines.append(f'        ("{field_name}", ("{filename}", io.BytesIO({file_data}), "{content_type}")),')
+
+        code = '\n'.join(file_lines)
+        form_code = ''
+        if file_info['fields']:
+            form_data = format_literal(file_info['fields'], '    ', len('    form_data = '))
+            form_code = f'\n    form_data = {form_data}'
+
+        return f'''# Подготовка файлов для загрузки
+    import io
+    import base64
+    files = [
+{code}
+    ]{form_code}'''
 
-    def generate_test_assertions(self, sample: Dict[str, Any]) -> str:
+    def generate_test_assertions(self, sample: Dict[str, Any], test_data: Optional[Dict[str, Any]] = None) -> str:
         """Генерация утверждений для теста"""
         response_is_file = sample.get('response_is_file', False)
         response_content_type = sample.get('response_content_type', '')
@@ -436,34 +564,36 @@ import pytest
             if response_content_type:
                 assertions.append(f'    assert response.headers["content-type"] == "{response_content_type}"')
 
-            assertions.append(f'    expected_content = {self.generate_expected_data(sample)}')
-            assertions.append(f'    assert response.content.decode("utf-8") == expected_content')
+            assertions.append(f'    assert response.content.decode("utf-8") == expected')
         else:
-            assertions.append(f'    assert json.loads(response.content.decode()) == expected')
+            assertions.append(self.generate_json_assertion(test_data) if test_data
+                              else '    assert json.loads(response.content.decode()) == expected')
 
         return '\n'.join(assertions)
 
-    def generate_test_function(self, test_data: Dict[str, Any]) -> str:
-        """Генерация тестовой функции для эндпоинта"""
+    def write_test_function(self, test_data: Dict[str, Any], out, snapshots_dir: Optional[Path] = None,
+                            index: int = 0, func_name: Optional[str] = None):
+        """Потоковая запись тестовой функции для эндпоинта (index - номер теста в файле)"""
         endpoint = test_data['endpoint']
         method = test_data['method']
         params = test_data['params']
         request_body = test_data['request_body']
-        sample = test_data['samples'][0]
+        sample = self.materialize_sample(test_data['samples'][0])
 
-        func_name = self.create_test_function_name(endpoint, method, params, request_body)
-        expected_data = self.generate_expected_data(sample)
+        func_name = func_name or self.create_test_function_name(endpoint, method, params, request_body)
         url_path = endpoint
         params_str = self.generate_params_dict(params)
 
-        # Формируем тестовую функцию
-        test_function = f'''@pytest.mark.asyncio
+        # Формируем тестовую функцию: ожидаемые данные пишутся сразу в поток
+        out.write(f'''@pytest.mark.asyncio
 async def {func_name}(
         fast_api_client,
 ):
-    expected = {expected_data}
+{self.generate_stats_comment(test_data)}    expected = ''')
+        snapshot = (snapshots_dir, f"{func_name}_{index}") if snapshots_dir else None
+        self.write_expected_data(sample, out, snapshot)
 
-'''
+        test_function = '\n\n'
 
         # Добавляем код для тела запроса
         body_code = self.generate_request_body_code(request_body)
@@ -471,7 +601,7 @@ async def {func_name}(
             test_function += f"    {body_code}"
 
         # Формируем вызов API
-        if isinstance(request_body, dict) and 'field_name' in request_body:
+        if self.is_file_upload(request_body):
             # Для файловых загрузок
             test_function += f'''
 
@@ -481,6 +611,10 @@ async def {func_name}(
             if params_str:
                 test_function += f",\n        {params_str}"
 
+            if request_body['fields']:
+                test_function += ''',
+        data=form_data'''
+
             test_function += ''',
         files=files,
     )'''
@@ -497,8 +631,8 @@ async def {func_name}(
             test_function += ''',
         json=json_data,
     )'''
-        elif isinstance(request_body, str):
-            # Для строковых данных
+        elif isinstance(request_body, (str, bytes)):
+            # Для строковых и бинарных данных
             test_function += f'''
 
     response = await fast_api_client.{method.lower()}(
@@ -525,10 +659,10 @@ async def {func_name}(
         # Добавляем утверждения
         test_function += f'''
 
-{self.generate_test_assertions(sample)}
-
+{self.generate_test_assertions(sample, test_data)}
+{self.generate_latency_assertion(test_data)}
 '''
-        return test_function
+        out.write(test_function)
 
     def organize_tests_by_resource(self) -> Dict[str, List]:
         """Организация тестов по ресурсам"""
@@ -559,98 +693,61 @@ async def {func_name}(
 
         return resource_tests
 
-    def create_directory_structure(self, resource_tests: Dict[str, List]) -> Dict[str, Path]:
-        """Создание структуры папок для тестов"""
-        current_dir = Path.cwd()
-        test_dirs = {}
-
-        for resource in resource_tests.keys():
-            resource_dir = current_dir / resource
-            resource_dir.mkdir(exist_ok=True)
-            test_dirs[resource] = resource_dir
-
-        return test_dirs
-
-    def save_test_file(self, resource: str, tests: List[Dict[str, Any]], resource_dir: Path):
-        """Сохранение тестового файла"""
-        if len(resource) > 30:
-            file_name = "test.py"
-        else:
-            file_name = f"test_{resource}.py"
-
-        imports = self.generate_test_imports()
-
-        tests_sorted = sorted(tests, key=lambda x: (
-            x['endpoint'],
-            bool(x['request_body']),
-            tuple(sorted(x['params'].items()))
-        ))
-
-        test_functions = []
-        for test_data in tests_sorted:
-            test_func = self.generate_test_function(test_data)
-            test_functions.append(test_func)
-
-        file_content = imports + "\n\n".join(test_functions)
-
-        file_path = resource_dir / file_name
-        file_path.write_text(file_content, encoding='utf-8')
-        print(f"Создан тестовый файл: {file_path}")
-
-        return file_path
-
     def run(self):
         """Основной метод запуска генерации тестов"""
         print("=" * 60)
         print("Генератор тестов API из JSON логов (с поддержкой тела запроса)")
         print("=" * 60)
 
-        self.load_json_data()
+        with self.metrics.stage('load_json_data'):
+            self.load_json_data()
+        self.metrics.count('transactions', len(self.transactions))
+        self.metrics.count('input_bytes', os.path.getsize(self.json_file_path))
 
         if not self.transactions:
             print("Не найдено транзакций в файле")
             return
 
-        self.group_by_endpoint_and_params()
+        with self.metrics.stage('group_by_endpoint_and_params'):
+            self.group_by_endpoint_and_params()
+        self.metrics.count('groups', len(self.endpoint_tests))
 
         if not self.endpoint_tests:
             print("Не найдено данных для генерации тестов")
             return
 
         file_uploads = sum(1 for test in self.endpoint_tests.values()
-                           if isinstance(test.get('request_body'), dict) and 'field_name' in test['request_body'])
+                           if self.is_file_upload(test.get('request_body')))
         json_requests = sum(1 for test in self.endpoint_tests.values()
-                            if isinstance(test.get('request_body'), dict) and 'field_name' not in test['request_body'])
+                            if isinstance(test.get('request_body'), dict) and not self.is_file_upload(test['request_body']))
 
         print(f"Статистика:")
         print(f"  - Всего тестов: {len(self.endpoint_tests)}")
         print(f"  - С JSON телами запросов: {json_requests}")
         print(f"  - С загрузкой файлов: {file_uploads}")
 
-        resource_tests = self.organize_tests_by_resource()
+        with self.metrics.stage('organize_tests_by_resource'):
+            resource_tests = self.organize_tests_by_resource()
+        self.metrics.count('resources', len(resource_tests))
         print(f"\nОбнаружено {len(resource_tests)} различных ресурсов:")
         for resource, tests in resource_tests.items():
             json_count = sum(1 for test in tests
-                             if isinstance(test.get('request_body'), dict) and 'field_name' not in test['request_body'])
+                             if isinstance(test.get('request_body'), dict) and not self.is_file_upload(test['request_body']))
             file_count = sum(1 for test in tests
-                             if isinstance(test.get('request_body'), dict) and 'field_name' in test['request_body'])
+                             if self.is_file_upload(test.get('request_body')))
             print(f"  - {resource} ({len(tests)} тестов, из них {json_count} JSON, {file_count} файлов)")
 
         test_dirs = self.create_directory_structure(resource_tests)
 
-        generated_files = []
-        for resource, tests in resource_tests.items():
-            try:
-                file_path = self.save_test_file(resource, tests, test_dirs[resource])
-                generated_files.append(file_path)
-            except Exception as e:
-                print(f"Ошибка при генерации тестов для ресурса {resource}: {e}")
+        generated_files, unchanged_files = self.write_resources(resource_tests, test_dirs)
 
         print("\n" + "=" * 60)
         print("Генерация завершена успешно!")
         print(f"Создано {len(generated_files)} тестовых файлов в папках:")
         for file in generated_files:
             print(f"  - {file.parent.name}/{file.name}")
+        if self.incremental:
+            print(f"Без изменений (пропущено по манифесту): {unchanged_files}")
         print("=" * 60)
 
 
@@ -660,15 +757,65 @@ def main():
 
     parser = argparse.ArgumentParser(description='Генератор тестов API из JSON логов (с поддержкой тела запроса)')
     parser.add_argument('json_file', help='Путь к JSON файлу с логами API')
+    parser.add_argument('--blob-store', default=None, help='Папка хранилища тел, вынесенных по хэшу')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Перезаписывать только файлы ресурсов, группы которых изменились с прошлого запуска')
+    parser.add_argument('--manifest', default=None,
+                        help=f'Путь к манифесту инкрементальной генерации (по умолчанию {DEFAULT_MANIFEST_NAME})')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Число процессов для рендеринга файлов ресурсов (0 - по числу ядер)')
+    parser.add_argument('--snapshots', action='store_true',
+                        help=f'Выносить крупные ожидаемые данные в {SNAPSHOTS_DIR_NAME}/*.json.gz рядом с тестами')
+    parser.add_argument('--snapshot-min-size', type=int, default=DEFAULT_MIN_SNAPSHOT_SIZE,
+                        help='Минимальная длина литерала ожидаемых данных (в символах) для выноса в snapshot')
+    parser.add_argument('--lazy', action='store_true',
+                        help='Читать тела (mmap контейнера .e2c или хранилище) только для образцов, попадающих в тесты')
+
+    parser.add_argument('--latency-budget', type=float, default=None, metavar='FACTOR',
+                        help='Проверять задержку ответа: p95 записанных длительностей группы x FACTOR')
+    parser.add_argument('--latency-floor', type=float, default=DEFAULT_LATENCY_FLOOR,
+                        help='Минимальный бюджет задержки в секундах')
+    parser.add_argument('--stats-report', default=None,
+                        help='Сохранить статистику групп (размеры, длительности, изменчивые поля) в JSON-файл')
+    parser.add_argument('--stats-comments', action='store_true',
+                        help='Добавлять в тесты комментарий со статистикой группы по всем образцам')
+    parser.add_argument('--no-volatile-masking', action='store_true',
+                        help='Сравнивать ответ точно, даже если поля различаются между образцами группы')
+    parser.add_argument('--max-samples', type=int, default=None,
+                        help='Хранить не больше N образцов на группу (первый + равномерная выборка остальных)')
+    parser.add_argument('--sample-seed', type=int, default=0, help='Seed выборки образцов для --max-samples')
+    parser.add_argument('--metrics', default=None, help='Сохранить метрики по стадиям в JSON-файл')
+    parser.add_argument('--profile', default=None, help='Сохранить профиль cProfile (pstats) в файл')
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help='Замерять пиковое выделение памяти по стадиям (замедляет генерацию)')
 
     args = parser.parse_args()
+    if args.max_samples is not None and args.max_samples < 1:
+        parser.error('--max-samples должен быть не меньше 1')
 
     if not os.path.exists(args.json_file):
         print(f"Ошибка: файл {args.json_file} не найден!")
         sys.exit(1)
 
-    generator = APITestGenerator(args.json_file)
-    generator.run()
+    generator = APITestGenerator(args.json_file, blob_store=args.blob_store, lazy=args.lazy,
+                                 incremental=args.incremental, manifest_path=args.manifest,
+                                 workers=args.workers or os.cpu_count() or 1,
+                                 snapshots=args.snapshots, snapshot_min_size=args.snapshot_min_size,
+                                 metrics=Instrumentation(args.profile, args.tracemalloc),
+                                 latency_factor=args.latency_budget, latency_floor=args.latency_floor,
+                                 stats_comments=args.stats_comments, mask_volatile=not args.no_volatile_masking,
+                                 max_samples=args.max_samples, sample_seed=args.sample_seed)
+    generator.metrics.start()
+    try:
+        generator.run()
+    finally:
+        generator.close()
+        generator.metrics.stop()
+        if args.stats_report:
+            generator.save_stats_report(args.stats_report)
+        if args.metrics:
+            generator.metrics.save(args.metrics)
+            print(f"Метрики сохранены в {args.metrics}")
 
 
 if __name__ == "__main__":
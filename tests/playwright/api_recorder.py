@@ -1,24 +1,251 @@
+import argparse
 import asyncio
+import importlib.util
 import json
-import queue
+import os
 import sys
 import threading
 import base64
 from datetime import datetime
+from fnmatch import fnmatch
+from pathlib import Path
+from urllib.parse import urlsplit
 
 from playwright.async_api import async_playwright
 
+try:
+    from tests.common.body_store import BodyStore, externalize_bodies
+except ImportError:
+    # Запуск как скрипта из папки модуля - добавляем корень репозитория в путь
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from tests.common.body_store import BodyStore, externalize_bodies
+from tests.common.capture_container import CONTAINER_SUFFIX, CaptureContainerWriter
+
+# Число воркеров, забирающих заголовки и тела ответов
+DEFAULT_CAPTURE_WORKERS = 4
+# Максимум ответов, ожидающих воркера; сверх него ответы отбрасываются
+DEFAULT_CAPTURE_QUEUE_SIZE = 1000
+# Сколько ждать обработки очереди при сохранении и выходе, с
+DRAIN_TIMEOUT = 10.0
+# Число параллельных контекстов браузера в пакетном режиме
+DEFAULT_BATCH_CONTEXTS = 4
+# Таймаут ответа управляющего сокета для --send, с
+CONTROL_TIMEOUT = 30.0
+
+
+def parse_control_address(address: str):
+    """
+    Адрес управляющего сокета: unix:/путь/к/сокету или [tcp:]хост:порт (или только порт)
+
+    Returns:
+        ('unix', путь) или ('tcp', (хост, порт))
+
+    Raises:
+        ValueError: Пустой путь сокета или порт не число от 1 до 65535
+    """
+    if address.startswith('unix:'):
+        path = address[len('unix:'):]
+        if not path:
+            raise ValueError(f"не указан путь unix-сокета: {address!r}")
+        return 'unix', path
+
+    address = address[len('tcp:'):] if address.startswith('tcp:') else address
+    host, _, port = address.rpartition(':')
+    if not port.isdigit() or not 1 <= int(port) <= 65535:
+        raise ValueError(f"порт должен быть числом от 1 до 65535: {address!r}")
+    return 'tcp', (host or '127.0.0.1', int(port))
+
+
+def control_address(value: str) -> str:
+    """Проверка адреса --control при разборе аргументов"""
+    try:
+        parse_control_address(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+
+async def send_command(address: str, command: str) -> str:
+    """Отправка команды работающему рекордеру через управляющий сокет, возвращает ответ"""
+    kind, target = parse_control_address(address)
+    if kind == 'unix':
+        reader, writer = await asyncio.open_unix_connection(target)
+    else:
+        reader, writer = await asyncio.open_connection(*target)
+
+    try:
+        writer.write(f"{command}\n".encode('utf-8'))
+        await writer.drain()
+        line = await asyncio.wait_for(reader.readline(), CONTROL_TIMEOUT)
+        return line.decode('utf-8').strip()
+    finally:
+        writer.close()
+
+
+def load_scenario(file_path: str):
+    """
+    Сценарий пакетной записи из файла: корутина run(page, url, index), где index -
+    номер контекста браузера (по нему сценарий может варьировать данные)
+    """
+    spec = importlib.util.spec_from_file_location(Path(file_path).stem, file_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not asyncio.iscoroutinefunction(getattr(module, 'run', None)):
+        raise ValueError(f"В сценарии {file_path} нет функции async def run(page, url, index)")
+    return module.run
+
+
+class CaptureFilter:
+    def __init__(self, include=None, exclude=None, methods=None, content_types=None,
+                 exclude_content_types=None, max_body_size=None):
+        """
+        Правила отбора ответов для записи. Проверяются до получения тел, поэтому
+        отброшенные ответы (картинки, шрифты, бандлы) почти ничего не стоят
+
+        Args:
+            include: Glob-шаблоны пути URL, хотя бы один должен совпасть (например, /api/*)
+            exclude: Glob-шаблоны пути URL, ни один не должен совпасть
+            methods: Записываемые HTTP-методы
+            content_types: Glob-шаблоны Content-Type ответа, хотя бы один должен совпасть (например, *json*)
+            exclude_content_types: Glob-шаблоны Content-Type ответа, ни один не должен совпасть
+            max_body_size: Максимальный размер тела ответа в байтах. Проверяется по Content-Length;
+                ответы без него (chunked) проверяются только после получения тела
+        """
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.methods = {method.upper() for method in methods} if methods else None
+        self.content_types = [pattern.lower() for pattern in content_types or []]
+        self.exclude_content_types = [pattern.lower() for pattern in exclude_content_types or []]
+        self.max_body_size = max_body_size
+
+    def allows(self, method: str, url: str, headers: dict) -> bool:
+        """Проверка по методу, пути, Content-Type и Content-Length - без обращения за телом"""
+        if self.methods is not None and method.upper() not in self.methods:
+            return False
+
+        path = urlsplit(url).path or '/'
+        if self.include and not any(fnmatch(path, pattern) for pattern in self.include):
+            return False
+        if any(fnmatch(path, pattern) for pattern in self.exclude):
+            return False
+
+        # Заголовки ответа Playwright отдаёт с именами в нижнем регистре
+        content_type = (headers.get('content-type') or '').split(';')[0].strip().lower()
+        if self.content_types and not any(fnmatch(content_type, pattern) for pattern in self.content_types):
+            return False
+        if any(fnmatch(content_type, pattern) for pattern in self.exclude_content_types):
+            return False
+
+        content_length = headers.get('content-length')
+        if content_length and content_length.isdigit():
+            return self.allows_body_size(int(content_length))
+        return True
+
+    def allows_body_size(self, size: int) -> bool:
+        return self.max_body_size is None or size <= self.max_body_size
+
+
+class CaptureSpool:
+    def __init__(self, output_format: str = 'jsonl', compress: bool = False):
+        """
+        Запись перехваченных вызовов на диск по мере поступления: файл только дописывается,
+        в памяти записи не накапливаются
+
+        Args:
+            output_format: 'jsonl' - по вызову на строку, 'e2c' - бинарный контейнер
+                (тела без base64, одинаковые тела хранятся один раз)
+            compress: Сжимать записи контейнера zlib
+        """
+        self.output_format = output_format
+        self.compress = compress
+        self.file_path = None
+        self.count = 0
+        self._writer = None
+
+    def _open(self):
+        suffix = CONTAINER_SUFFIX if self.output_format == 'e2c' else '.jsonl'
+        stem = f"api_calls_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        file_path = Path(f"{stem}{suffix}")
+        counter = 1
+        while file_path.exists():
+            file_path = Path(f"{stem}_{counter}{suffix}")
+            counter += 1
+
+        self.file_path = str(file_path)
+        if self.output_format == 'e2c':
+            self._writer = CaptureContainerWriter(self.file_path, self.compress)
+        else:
+            self._writer = open(self.file_path, 'w', encoding='utf-8')
+
+    def write(self, captured: dict):
+        if self._writer is None:
+            self._open()
+
+        if self.output_format == 'e2c':
+            self._writer.write_entry(captured)
+        else:
+            self._writer.write(json.dumps(captured, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self.count += 1
+
+    def rotate(self):
+        """
+        Закрывает текущий файл, следующие вызовы пишутся в новый
+
+        Returns:
+            (путь, число записей) закрытого файла или None, если записей не было
+        """
+        if self._writer is None:
+            return None
+
+        self._writer.close()
+        result = (self.file_path, self.count)
+        self._writer, self.file_path, self.count = None, None, 0
+        return result
+
 
 class SimpleAPIRecorder:
-    def __init__(self):
-        self.captured_requests = []
+    def __init__(self, blob_store: str = None, workers: int = DEFAULT_CAPTURE_WORKERS,
+                 queue_size: int = DEFAULT_CAPTURE_QUEUE_SIZE, output_format: str = 'jsonl',
+                 compress: bool = False, capture_filter: CaptureFilter = None):
+        """
+        Args:
+            blob_store: Папка контентно-адресуемого хранилища тел. Если задана,
+                в записях вместо тел хранятся ссылки по sha256
+            workers: Число воркеров, параллельно собирающих и записывающих вызовы
+            queue_size: Размер очереди ответов; при переполнении ответ отбрасывается
+                и учитывается в метриках, обработчик событий страницы не блокируется
+            output_format: Формат файла записи: 'jsonl' или бинарный контейнер 'e2c'
+            compress: Сжимать записи контейнера zlib
+            capture_filter: Правила отбора ответов (по умолчанию записываются все)
+        """
+        self.body_store = BodyStore(blob_store) if blob_store else None
+        self.spool = CaptureSpool(output_format, compress)
+        self.capture_filter = capture_filter or CaptureFilter()
+        self.workers = workers
+        self.capture_queue = asyncio.Queue(maxsize=queue_size)
+        self.capture_tasks = []
+        # Ответы нумеруются при постановке в очередь и пишутся в этом порядке,
+        # хотя воркеры завершают захват вразнобой
+        self.next_seq = 0
+        self.next_write_seq = 0
+        self.completed = {}
+        self.metrics = {'enqueued': 0, 'captured': 0, 'dropped': 0, 'filtered': 0, 'failed': 0,
+                        'body_failed': 0, 'max_queue_depth': 0}
         self.is_recording = False
         self.should_exit = False
-        self.command_queue = queue.Queue()
+        # Команды из консоли и управляющего сокета: (команда, future для ответа или None)
+        self.commands = asyncio.Queue()
         self.page = None
 
-    async def start(self, url=None):
-        """Запускает запись"""
+    async def start(self, url=None, control: str = None):
+        """
+        Запускает запись
+
+        Args:
+            url: Адрес страницы
+            control: Адрес управляющего сокета (unix:/путь или хост:порт), через который
+                скрипты отправляют те же команды, что и в консоли
+        """
         if not url:
             url = await self._ask_url()
 
@@ -26,22 +253,23 @@ class SimpleAPIRecorder:
         if not url.startswith(('http://', 'https://')):
             url = 'http://' + url
 
-        # Запускаем поток для чтения команд
-        input_thread = threading.Thread(target=self._read_commands, daemon=True)
-        input_thread.start()
+        # Команды читаются в цикле событий и применяются сразу по поступлении
+        stdin_task = asyncio.create_task(self._read_stdin())
+        control_server = await self._start_control_server(control) if control else None
 
         async with async_playwright() as p:
             try:
                 browser = await p.chromium.launch(headless=False)
                 self.page = await browser.new_page()
 
-                # Настраиваем перехват
+                # Настраиваем перехват и воркеры
                 await self._setup_interception()
+                self._start_capture_workers()
 
                 print(f"\n🎥 API Recorder запущен")
                 print(f"URL: {url}")
                 print(f"Запись: {'ВКЛЮЧЕНА' if self.is_recording else 'ВЫКЛЮЧЕНА'}")
-                print("\nКоманды: start, stop, save, exit")
+                print("\nКоманды: start, stop, save, stats, exit")
 
                 # Открываем страницу
                 try:
@@ -51,13 +279,60 @@ class SimpleAPIRecorder:
                     print(f"⚠️ Не удалось загрузить страницу: {e}")
 
                 while not self.should_exit:
-                    await self._process_queued_commands()
-                    await asyncio.sleep(0.1)
+                    cmd, reply = await self.commands.get()
+                    result = await self._process_command(cmd)
+                    if reply is not None and not reply.done():
+                        reply.set_result(result)
 
             finally:
+                stdin_task.cancel()
+                if control_server:
+                    await self._stop_control_server(control_server, control)
+                await self._stop_capture_workers()
+                self._close_spool()
                 if browser:
                     await browser.close()
 
+    async def run_batch(self, url: str, scenario, contexts: int = DEFAULT_BATCH_CONTEXTS) -> int:
+        """
+        Пакетная запись без окна браузера: contexts изолированных контекстов параллельно
+        проходят сценарий, все вызовы попадают в один упорядоченный файл
+
+        Returns:
+            Число сценариев, завершившихся ошибкой
+        """
+        if not url.startswith(('http://', 'https://')):
+            url = 'http://' + url
+
+        self.is_recording = True
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            self._start_capture_workers()
+            print(f"🎥 Пакетная запись: {url}, контекстов: {contexts}")
+            try:
+                results = await asyncio.gather(
+                    *(self._run_scenario(browser, scenario, url, index) for index in range(contexts))
+                )
+            finally:
+                # Контексты закрываются вместе с браузером - после того, как воркеры забрали тела
+                await self._stop_capture_workers()
+                await self._save_to_file()
+                await browser.close()
+
+        return results.count(False)
+
+    async def _run_scenario(self, browser, scenario, url: str, index: int) -> bool:
+        context = await browser.new_context()
+        context.on('response', lambda response: self._enqueue_response(response, index))
+        try:
+            page = await context.new_page()
+            await scenario(page, url, index)
+            print(f"✅ Сценарий {index} завершён")
+            return True
+        except Exception as e:
+            print(f"❌ Сценарий {index}: {e}")
+            return False
+
     async def _ask_url(self):
         """Запрашивает URL"""
         print("\nВведите URL для записи (по умолчанию: http://localhost:5173):")
@@ -67,8 +342,35 @@ class SimpleAPIRecorder:
             url_input = 'http://' + url_input
         return url_input
 
-    def _read_commands(self):
-        """Читает команды из консоли"""
+    async def _read_stdin(self):
+        """Читает команды из консоли через цикл событий"""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        # Копия дескриптора: транспорт закрывает свой файл, а sys.stdin должен остаться открытым
+        pipe = os.fdopen(os.dup(sys.stdin.fileno()), 'rb', buffering=0)
+        try:
+            transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+        except (ValueError, OSError, NotImplementedError):
+            pipe.close()
+            # stdin - обычный файл или цикл событий не умеет читать пайпы (Windows): читаем в потоке
+            threading.Thread(target=self._read_commands, args=(loop,), daemon=True).start()
+            return
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                cmd = line.decode('utf-8', errors='replace').strip().lower()
+                if cmd:
+                    self.commands.put_nowait((cmd, None))
+        finally:
+            # Копия делит режим с исходным дескриптором - терминал не должен остаться неблокирующим
+            os.set_blocking(sys.stdin.fileno(), True)
+            transport.close()
+
+    def _read_commands(self, loop):
+        """Читает команды из консоли в отдельном потоке и передаёт их в цикл событий"""
         while not self.should_exit:
             try:
                 line = sys.stdin.readline()
@@ -76,21 +378,54 @@ class SimpleAPIRecorder:
                     break
                 cmd = line.strip().lower()
                 if cmd:
-                    self.command_queue.put(cmd)
+                    loop.call_soon_threadsafe(self.commands.put_nowait, (cmd, None))
             except:
                 break
 
-    async def _process_queued_commands(self):
-        """Обрабатывает команды"""
+    async def _start_control_server(self, address: str):
+        """Управляющий сокет: по команде на строку, на каждую - ответ одной строкой"""
+        kind, target = parse_control_address(address)
+        if kind == 'unix':
+            server = await asyncio.start_unix_server(self._handle_control, path=target)
+        else:
+            server = await asyncio.start_server(self._handle_control, *target)
+        print(f"🔌 Управляющий сокет: {address}")
+        return server
+
+    async def _stop_control_server(self, server, address: str):
+        server.close()
+        # Команды, пришедшие после exit, уже не будут выполнены
+        while not self.commands.empty():
+            _, reply = self.commands.get_nowait()
+            if reply is not None and not reply.done():
+                reply.set_result("error exiting")
+
+        kind, target = parse_control_address(address)
+        if kind == 'unix' and os.path.exists(target):
+            os.unlink(target)
+
+    async def _handle_control(self, reader, writer):
+        """Соединение управляющего сокета"""
         try:
-            while True:
-                cmd = self.command_queue.get_nowait()
-                await self._process_command(cmd)
-        except queue.Empty:
+            while not self.should_exit:
+                line = await reader.readline()
+                if not line:
+                    break
+                cmd = line.decode('utf-8', errors='replace').strip().lower()
+                if not cmd:
+                    continue
+
+                reply = asyncio.get_running_loop().create_future()
+                self.commands.put_nowait((cmd, reply))
+                writer.write(f"{await reply}\n".encode('utf-8'))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
             pass
+        finally:
+            writer.close()
 
-    async def _process_command(self, cmd):
-        """Обрабатывает команду"""
+    async def _process_command(self, cmd) -> str:
+        """Обрабатывает команду, возвращает ответ для управляющего сокета"""
         if cmd == "exit":
             self.should_exit = True
             print("🛑 Выход...")
@@ -101,117 +436,239 @@ class SimpleAPIRecorder:
             self.is_recording = False
             print("⏸ Запись ВЫКЛЮЧЕНА")
         elif cmd == "save":
-            await self._save_to_file()
+            await self._drain_capture_queue()
+            saved = await self._save_to_file()
+            return f"ok {saved[1]} {saved[0]}" if saved else "error nothing to save"
+        elif cmd == "stats":
+            self._print_metrics()
+            return f"ok {json.dumps(self.metrics)}"
         else:
             print(f"❓ Неизвестная команда: {cmd}")
+            return f"error unknown command {cmd}"
+        return "ok"
 
     async def _setup_interception(self):
         """Настраивает перехват запросов"""
+        self.page.on('response', self._enqueue_response)
+
+    def _enqueue_response(self, response, context: int = None):
+        """
+        Обработчик события страницы: запускает получение заголовков и тела и ставит ответ
+        в очередь, не дожидаясь их. Получение стартует сразу, пока ответ доступен (после
+        перехода страницы или закрытия контекста тело уже не получить), а запись вызова
+        выполняют воркеры, поэтому всплеск параллельных запросов не задерживает страницу
+
+        Args:
+            response: Ответ Playwright
+            context: Номер контекста браузера в пакетном режиме
+        """
+        if not self.is_recording:
+            return
+
+        request = response.request
+        if not self.capture_filter.allows(request.method, request.url, response.headers):
+            self.metrics['filtered'] += 1
+            return
 
-        async def intercept_response(response):
-            if not self.is_recording:
-                return
+        if self.capture_queue.full():
+            self.metrics['dropped'] += 1
+            return
 
-            request = response.request
+        fetch = asyncio.ensure_future(self._fetch_response(response))
+        self.capture_queue.put_nowait((response, fetch, datetime.now().isoformat(), self.next_seq, context))
+
+        self.next_seq += 1
+        self.metrics['enqueued'] += 1
+        self.metrics['max_queue_depth'] = max(self.metrics['max_queue_depth'], self.capture_queue.qsize())
+
+    def _start_capture_workers(self):
+        self.capture_tasks = [asyncio.create_task(self._capture_worker()) for _ in range(self.workers)]
+
+    async def _capture_worker(self):
+        """Воркер: забирает ответы из очереди по одному"""
+        while True:
+            response, fetch, timestamp, seq, context = await self.capture_queue.get()
+            captured = None
             try:
-                # Получаем заголовки ответа (используем await!)
-                response_headers_array = await response.headers_array()
-                response_headers = {}
-                for header in response_headers_array:
-                    response_headers[header['name']] = header['value']
-
-                # Получаем заголовки запроса (используем await!)
-                request_headers_array = await request.headers_array()
-                request_headers = {}
-                for header in request_headers_array:
-                    request_headers[header['name']] = header['value']
-
-                # Получаем тело ответа
-                content_type = response_headers.get('Content-Type', response_headers.get('content-type', ''))
-                response_body = None
-                is_binary = False
-
-                # Пытаемся получить как текст, если не бинарный
-                try:
-                    # Проверяем, может ли быть текстовым
-                    if any(ct in (content_type or '').lower() for ct in
-                           ['text/', 'json', 'xml', 'html', 'javascript', 'css', 'application/json']):
-                        response_body = await response.text()
-                    else:
-                        # Пробуем получить как байты
-                        body_bytes = await response.body()
-                        response_body = base64.b64encode(body_bytes).decode('utf-8')
-                        is_binary = True
-                except Exception as e:
-                    # Если ошибка, пробуем получить как байты
+                captured = await self._capture_response(response, fetch, timestamp, seq, context)
+            finally:
+                self._complete(seq, captured)
+                self.capture_queue.task_done()
+
+    def _complete(self, seq: int, captured):
+        """Запись готовых вызовов по порядку; отфильтрованные и упавшие (None) пропускаются"""
+        self.completed[seq] = captured
+        while self.next_write_seq in self.completed:
+            captured = self.completed.pop(self.next_write_seq)
+            self.next_write_seq += 1
+            if captured is not None:
+                self.spool.write(captured)
+
+    async def _drain_capture_queue(self, timeout: float = DRAIN_TIMEOUT):
+        """Ожидание обработки уже поставленных в очередь ответов"""
+        if not self.capture_tasks:
+            return
+        try:
+            await asyncio.wait_for(self.capture_queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ В очереди осталось {self.capture_queue.qsize()} необработанных ответов")
+
+    async def _stop_capture_workers(self):
+        await self._drain_capture_queue()
+        for task in self.capture_tasks:
+            task.cancel()
+        await asyncio.gather(*self.capture_tasks, return_exceptions=True)
+        self.capture_tasks = []
+
+        # Ответы, не обработанные за время ожидания, не записываются
+        while not self.capture_queue.empty():
+            _, fetch, _, seq, _ = self.capture_queue.get_nowait()
+            fetch.cancel()
+            self.completed[seq] = None
+
+        # Вызовы, ждущие не обработанных до конца предшественников, записываются как есть
+        for seq in sorted(self.completed):
+            if self.completed[seq] is not None:
+                self.spool.write(self.completed[seq])
+        self.completed = {}
+        self.next_write_seq = self.next_seq
+        self._print_metrics()
+
+    def _print_metrics(self):
+        metrics = self.metrics
+        print(f"📊 В очереди: {self.capture_queue.qsize()}, поставлено: {metrics['enqueued']}, "
+              f"записано: {metrics['captured']}, отброшено: {metrics['dropped']}, "
+              f"отфильтровано: {metrics['filtered']}, ошибок: {metrics['failed']}, "
+              f"без тела: {metrics['body_failed']}, "
+              f"макс. глубина очереди: {metrics['max_queue_depth']}")
+
+    async def _fetch_response(self, response):
+        """
+        Заголовки ответа и запроса и тело ответа - одновременно.
+        Ошибка получения тела возвращается вместо тела, ошибка заголовков пробрасывается
+        """
+        request = response.request
+        response_headers_array, request_headers_array, body = await asyncio.gather(
+            response.headers_array(), request.headers_array(), response.body(), return_exceptions=True
+        )
+        for headers in (response_headers_array, request_headers_array):
+            if isinstance(headers, BaseException):
+                raise headers
+        return response_headers_array, request_headers_array, body
+
+    async def _capture_response(self, response, fetch, timestamp: str, seq: int, context: int = None):
+        """Собирает запись ответа вместе с запросом; None - если ответ не записывается"""
+        request = response.request
+        try:
+            response_headers_array, request_headers_array, body_bytes = await fetch
+            response_headers = {}
+            for header in response_headers_array:
+                response_headers[header['name']] = header['value']
+
+            request_headers = {}
+            for header in request_headers_array:
+                request_headers[header['name']] = header['value']
+
+            content_type = response_headers.get('Content-Type', response_headers.get('content-type', ''))
+            response_body = None
+            body_error = None
+            is_binary = False
+
+            if isinstance(body_bytes, BaseException):
+                # Тело недоступно: запись сохраняется с причиной, чтобы её не приняли за пустое тело
+                body_error = str(body_bytes) or type(body_bytes).__name__
+                self.metrics['body_failed'] += 1
+                print(f"❌ Ошибка получения тела ответа: {body_error}")
+            else:
+                # Текстовые типы сохраняем текстом, остальное и не-UTF-8 - в base64
+                if any(ct in (content_type or '').lower() for ct in
+                       ['text/', 'json', 'xml', 'html', 'javascript', 'css', 'application/json']):
+                    try:
+                        response_body = body_bytes.decode('utf-8')
+                    except UnicodeDecodeError:
+                        pass
+                if response_body is None:
+                    response_body = base64.b64encode(body_bytes).decode('utf-8')
+                    is_binary = True
+
+                # Без Content-Length размер тела известен только после получения
+                if not self.capture_filter.allows_body_size(len(body_bytes)):
+                    self.metrics['filtered'] += 1
+                    return
+
+            # Получаем тело запроса
+            request_body = None
+            request_post_data = request.post_data
+
+            if request_post_data:
+                # Проверяем Content-Type запроса
+                req_content_type = request_headers.get('Content-Type', request_headers.get('content-type', ''))
+
+                if 'multipart/form-data' in (req_content_type or '').lower():
+                    # Для multipart пытаемся сохранить как есть
                     try:
-                        body_bytes = await response.body()
-                        response_body = base64.b64encode(body_bytes).decode('utf-8')
-                        is_binary = True
-                    except Exception as e2:
-                        print(f"❌ Ошибка получения тела ответа: {e2}")
-                        response_body = None
-
-                # Получаем тело запроса
-                request_body = None
-                request_post_data = request.post_data
-
-                if request_post_data:
-                    # Проверяем Content-Type запроса
-                    req_content_type = request_headers.get('Content-Type', request_headers.get('content-type', ''))
-
-                    if 'multipart/form-data' in (req_content_type or '').lower():
-                        # Для multipart пытаемся сохранить как есть
-                        try:
-                            # Если данные большие, кодируем в base64
-                            if len(request_post_data) > 10000:  # 10KB порог
-                                request_body = base64.b64encode(
-                                    request_post_data.encode('utf-8', errors='ignore')
-                                    if isinstance(request_post_data, str)
-                                    else request_post_data
-                                ).decode('utf-8')
-                            else:
-                                request_body = request_post_data
-                        except:
-                            request_body = None
-                    else:
-                        # Для других типов пробуем как текст
-                        try:
+                        # Если данные большие, кодируем в base64
+                        if len(request_post_data) > 10000:  # 10KB порог
+                            request_body = base64.b64encode(
+                                request_post_data.encode('utf-8', errors='ignore')
+                                if isinstance(request_post_data, str)
+                                else request_post_data
+                            ).decode('utf-8')
+                        else:
                             request_body = request_post_data
-                        except:
-                            request_body = None
-
-                # Сохраняем запрос
-                captured = {
-                    'timestamp': datetime.now().isoformat(),
-                    'url': request.url,
-                    'method': request.method,
-                    'request': {
-                        'headers': request_headers,
-                        'body': request_body,
-                    },
-                    'response': {
-                        'status': response.status,
-                        'headers': response_headers,
-                        'body': response_body,
-                        'is_binary': is_binary,
-                        'content_type': content_type
-                    }
-                }
-
-                self.captured_requests.append(captured)
-
-                # Выводим информацию о запросе
-                short_url = self._shorten_url(request.url)
-                print(f"📥 {request.method} {short_url} ({response.status})" +
-                      (" [BINARY]" if is_binary else ""))
-
-            except Exception as e:
-                print(f"❌ Ошибка перехвата: {e}")
-                import traceback
-                traceback.print_exc()
-
-        self.page.on('response', intercept_response)
+                    except:
+                        request_body = None
+                else:
+                    # Для других типов пробуем как текст
+                    try:
+                        request_body = request_post_data
+                    except:
+                        request_body = None
+
+            # Длительность по данным браузера: responseEnd в мс от startTime, -1 - если неизвестна
+            response_end = request.timing.get('responseEnd', -1)
+            duration = response_end / 1000 if response_end >= 0 else None
+
+            # Сохраняем запрос
+            captured = {
+                'seq': seq,
+                'timestamp': timestamp,
+                'url': request.url,
+                'method': request.method,
+                'request': {
+                    'headers': request_headers,
+                    'body': request_body,
+                },
+                'response': {
+                    'status': response.status,
+                    'headers': response_headers,
+                    'body': response_body,
+                    'is_binary': is_binary,
+                    'content_type': content_type
+                },
+                'duration': duration,
+            }
+            if body_error is not None:
+                captured['response']['body_error'] = body_error
+            if context is not None:
+                captured['context'] = context
+
+            if self.body_store:
+                captured = externalize_bodies(captured, self.body_store)
+
+            self.metrics['captured'] += 1
+
+            # Выводим информацию о запросе
+            short_url = self._shorten_url(request.url)
+            print(f"📥 {request.method} {short_url} ({response.status})" +
+                  (" [BINARY]" if is_binary else ""))
+            return captured
+
+        except Exception as e:
+            self.metrics['failed'] += 1
+            print(f"❌ Ошибка перехвата: {e}")
+            import traceback
+            traceback.print_exc()
 
     def _shorten_url(self, url, max_length=80):
         """Сокращает URL для вывода"""
@@ -220,43 +677,103 @@ class SimpleAPIRecorder:
         return url[:max_length - 3] + "..."
 
     async def _save_to_file(self):
-        """Сохраняет записи в файл"""
-        if not self.captured_requests:
-            print("❌ Нет записанных запросов")
-            return
+        """
+        Сохраняет записи: вызовы уже на диске, файл закрывается, дальше пишется новый
 
-        filename = f"api_calls_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        Returns:
+            (путь, число записей) или None, если сохранять нечего
+        """
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.captured_requests, f, indent=2, ensure_ascii=False)
-            print(f"💾 Сохранено {len(self.captured_requests)} запросов в {filename}")
-
-            # Показываем краткую информацию
-            print(f"\nЗаписанные запросы:")
-            for i, req in enumerate(self.captured_requests, 1):
-                short_url = self._shorten_url(req['url'], 60)
-                binary_mark = " [BINARY]" if req['response'].get('is_binary') else ""
-                print(f"  {i}. {req['method']} {short_url} ({req['response']['status']}){binary_mark}")
-
+            saved = self.spool.rotate()
         except Exception as e:
             print(f"❌ Ошибка при сохранении: {e}")
+            return None
+
+        if not saved:
+            print("❌ Нет записанных запросов")
+            return None
+        print(f"💾 Сохранено {saved[1]} запросов в {saved[0]}")
+        return saved
+
+    def _close_spool(self):
+        """Закрывает файл записи при выходе, несохранённые вызовы остаются в нём"""
+        saved = self.spool.rotate()
+        if saved:
+            print(f"💾 Несохранённые {saved[1]} запросов остались в {saved[0]}")
 
 
 async def main():
     """Основная функция"""
+    parser = argparse.ArgumentParser(description='Запись API-вызовов страницы')
+    parser.add_argument('url', nargs='?', default=None, help='URL для записи')
+    parser.add_argument('--blob-store', default=None,
+                        help='Папка хранилища тел: одинаковые тела сохраняются один раз и заменяются ссылкой')
+    parser.add_argument('--workers', type=int, default=DEFAULT_CAPTURE_WORKERS,
+                        help='Число воркеров, забирающих заголовки и тела ответов')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_CAPTURE_QUEUE_SIZE,
+                        help='Размер очереди ответов; при переполнении ответы отбрасываются')
+    parser.add_argument('--format', choices=['jsonl', 'e2c'], default='jsonl', dest='output_format',
+                        help='Формат файла записи: JSON Lines или бинарный контейнер e2c')
+    parser.add_argument('--compress', action='store_true', help='Сжимать записи контейнера e2c (zlib)')
+    parser.add_argument('--include', action='append', default=[], metavar='GLOB',
+                        help='Записывать только пути URL по шаблону, например /api/* (можно повторять)')
+    parser.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                        help='Не записывать пути URL по шаблону (можно повторять)')
+    parser.add_argument('--method', action='append', default=[], dest='methods',
+                        help='Записывать только указанные HTTP-методы (можно повторять)')
+    parser.add_argument('--content-type', action='append', default=[], dest='content_types', metavar='GLOB',
+                        help='Записывать только ответы с Content-Type по шаблону, например *json* (можно повторять)')
+    parser.add_argument('--exclude-content-type', action='append', default=[], dest='exclude_content_types',
+                        metavar='GLOB', help='Не записывать ответы с Content-Type по шаблону (можно повторять)')
+    parser.add_argument('--max-body-size', type=int, default=None,
+                        help='Не записывать ответы с телом больше N байт (по Content-Length; ответы без него, '
+                             'например chunked, сначала скачиваются и отбрасываются после получения тела)')
+    parser.add_argument('--scenario', default=None,
+                        help='Пакетная headless-запись: файл со сценарием async def run(page, url, index)')
+    parser.add_argument('--contexts', type=int, default=DEFAULT_BATCH_CONTEXTS,
+                        help='Число параллельных контекстов браузера в пакетном режиме')
+    parser.add_argument('--control', type=control_address, default=None,
+                        help='Управляющий сокет для команд из скриптов: unix:/путь или хост:порт')
+    parser.add_argument('--send', default=None, metavar='COMMAND',
+                        help='Отправить команду (start, stop, save, stats, exit) рекордеру, '
+                             'запущенному с --control, и выйти')
+
+    args = parser.parse_args()
+    if args.scenario and not args.url:
+        parser.error('для пакетной записи (--scenario) нужен URL')
+
+    if args.send:
+        if not args.control:
+            parser.error('для --send нужен адрес --control')
+        try:
+            reply = await send_command(args.control, args.send)
+        except (OSError, asyncio.TimeoutError) as e:
+            print(f"❌ Рекордер на {args.control} недоступен: {e}")
+            sys.exit(1)
+        print(reply)
+        if not reply.startswith('ok'):
+            sys.exit(1)
+        return
+
+    recorder = SimpleAPIRecorder(blob_store=args.blob_store, workers=args.workers, queue_size=args.queue_size,
+                                 output_format=args.output_format, compress=args.compress,
+                                 capture_filter=CaptureFilter(args.include, args.exclude, args.methods,
+                                                              args.content_types, args.exclude_content_types,
+                                                              args.max_body_size))
+
+    if args.scenario:
+        failed = await recorder.run_batch(args.url, load_scenario(args.scenario), args.contexts)
+        if failed:
+            print(f"❌ Сценариев с ошибкой: {failed}")
+            sys.exit(1)
+        return
+
     print("🎥 Simple API Recorder")
     print("Запись по умолчанию: ВЫКЛЮЧЕНА")
     print("Для начала записи введите команду: start")
 
-    # Простой парсинг аргументов
-    url = None
-    if len(sys.argv) > 1:
-        url = sys.argv[1]
-
-    recorder = SimpleAPIRecorder()
-
     try:
-        await recorder.start(url)
+        await recorder.start(args.url, control=args.control)
     except KeyboardInterrupt:
         print("\n🛑 Программа завершена")
 
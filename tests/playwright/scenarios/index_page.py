@@ -0,0 +1,22 @@
+"""
+Сценарий пакетной записи для static/index.html: приветствие, эхо и прощание.
+Использование: python api_recorder.py http://localhost:7777 --scenario scenarios/index_page.py --contexts 4
+"""
+
+RESULT_TIMEOUT = 10000
+
+
+async def run(page, url: str, index: int):
+    """Проход по формам страницы; данные зависят от номера контекста, чтобы группы различались"""
+    await page.goto(url, wait_until='networkidle')
+
+    await page.fill('#name', f'Гость {index}')
+    await page.click('text=Отправить приветствие')
+    await page.wait_for_selector('#greeting-content:not(:empty)', timeout=RESULT_TIMEOUT)
+
+    await page.fill('#echo-text', f'Тестовое сообщение {index}')
+    await page.click('text=Отправить эхо')
+    await page.wait_for_selector('#echo-content:not(:empty)', timeout=RESULT_TIMEOUT)
+
+    await page.click('text=Попрощаться')
+    await page.wait_for_selector('#farewell-content:not(:empty)', timeout=RESULT_TIMEOUT)
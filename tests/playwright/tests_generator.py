@@ -1,53 +1,125 @@
 import json
 import os
+import random
 import re
 import sys
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any
-from urllib.parse import unquote
-
-
-class APITestGenerator:
-    def __init__(self, json_file_path: str):
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    from tests.common.capture_container import is_container, load_container
+except ImportError:
+    # Запуск как скрипта из папки модуля - добавляем корень репозитория в путь
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from tests.common.capture_container import is_container, load_container
+from tests.common.body_store import BodyResolver, find_store_root
+from tests.common.generator_base import BaseTestGenerator
+from tests.common.group_stats import GroupStats, reservoir_add
+from tests.common.instrumentation import Instrumentation
+from tests.common.manifest import DEFAULT_MANIFEST_NAME
+from tests.common.snapshots import DEFAULT_MIN_SNAPSHOT_SIZE, SNAPSHOTS_DIR_NAME
+from tests.common.stats import DEFAULT_LATENCY_FLOOR
+
+
+class APITestGenerator(BaseTestGenerator):
+    def __init__(self, json_file_path: str, blob_store: Optional[str] = None,
+                 incremental: bool = False, manifest_path: Optional[str] = None, workers: int = 1,
+                 snapshots: bool = False, snapshot_min_size: int = DEFAULT_MIN_SNAPSHOT_SIZE,
+                 metrics: Optional[Instrumentation] = None, latency_factor: Optional[float] = None,
+                 latency_floor: float = DEFAULT_LATENCY_FLOOR, stats_comments: bool = False,
+                 mask_volatile: bool = True, max_samples: Optional[int] = None, sample_seed: int = 0):
         """
         Инициализация генератора тестов
 
         Args:
-            json_file_path: Путь к JSON-файлу с логами
+            json_file_path: Путь к JSON-файлу с логами (JSON, JSON Lines из api_recorder или бинарный контейнер .e2c)
+            blob_store: Папка хранилища тел, если тела вынесены по хэшу (по умолчанию - blobs рядом с файлом)
+            incremental: Перезаписывать только файлы ресурсов, группы которых изменились
+            manifest_path: Путь к манифесту инкрементальной генерации
+            workers: Число процессов для рендеринга файлов ресурсов (1 - последовательно)
+            snapshots: Выносить крупные ожидаемые данные в сжатые snapshot-файлы рядом с тестом
+            snapshot_min_size: Минимальная длина литерала (в символах), начиная с которой данные выносятся
+            metrics: Сборщик метрик по стадиям (по умолчанию - только таймеры и счётчики)
+            latency_factor: Добавлять проверку задержки: p95 записанных длительностей группы,
+                умноженный на этот коэффициент (None - без проверки)
+            latency_floor: Минимальный бюджет задержки в секундах
+            stats_comments: Добавлять в тесты комментарий со статистикой группы по всем образцам
+            mask_volatile: Поля ответа, различающиеся между образцами группы, проверять только по типу
+            max_samples: Максимум хранимых образцов группы (первый + случайная выборка остальных);
+                статистика группы всё равно считается по всем образцам
+            sample_seed: Seed случайной выборки образцов
         """
         self.json_file_path = json_file_path
+        self.blob_store = blob_store
+        self.incremental = incremental
+        self.manifest_path = manifest_path or str(Path.cwd() / DEFAULT_MANIFEST_NAME)
+        self.workers = workers
+        self.snapshots = snapshots
+        self.snapshot_min_size = snapshot_min_size
+        self.metrics = metrics or Instrumentation()
+        self.latency_factor = latency_factor
+        self.latency_floor = latency_floor
+        self.stats_comments = stats_comments
+        self.mask_volatile = mask_volatile
+        self.max_samples = max_samples
+        self.sample_rng = random.Random(sample_seed)
         self.api_logs = []
         self.endpoint_tests = {}  # Группировка по эндпоинтам и параметрам
 
     def load_json_data(self):
         """Загрузка и парсинг JSON данных"""
         try:
-            with open(self.json_file_path, 'r', encoding='utf-8') as f:
-                self.api_logs = json.load(f)
+            if is_container(self.json_file_path):
+                _, self.api_logs = load_container(self.json_file_path)
+            else:
+                with open(self.json_file_path, 'r', encoding='utf-8') as f:
+                    if self.json_file_path.endswith('.jsonl'):
+                        self.api_logs = self.load_jsonl(f)
+                    else:
+                        self.api_logs = json.load(f)
+            # Порядок вызовов - по времени ответа, в том числе в записях разных контекстов браузера
+            self.api_logs.sort(key=self.timestamp_key)
+            self.resolve_body_refs()
             print(f"Загружено {len(self.api_logs)} записей из {self.json_file_path}")
         except Exception as e:
             print(f"Ошибка при загрузке JSON: {e}")
             sys.exit(1)
 
-    def parse_value(self, value: str) -> Any:
-        """Парсинг строкового значения в Python-тип"""
-        if value == "":
-            return ""
-        elif value.lower() == "null":
-            return None
-        elif value.lower() == "true":
-            return True
-        elif value.lower() == "false":
-            return False
-        elif value.isdigit():
-            # Целое число
-            return int(value)
-        elif value.replace('.', '', 1).isdigit() and value.count('.') == 1:
-            # Вещественное число
-            return float(value)
-        else:
-            # Строка - возвращаем как есть
-            return value
+    def timestamp_key(self, log: Dict[str, Any]) -> Tuple[bool, float]:
+        """
+        Ключ сортировки по времени: ISO-строка (как пишет api_recorder) или число секунд.
+        Записи без времени или с нераспознанным временем - в конце, в исходном порядке
+        """
+        timestamp = log.get('timestamp')
+        if isinstance(timestamp, str):
+            try:
+                timestamp = datetime.fromisoformat(timestamp).timestamp()
+            except ValueError:
+                try:
+                    timestamp = float(timestamp)
+                except ValueError:
+                    timestamp = None
+        elif isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)):
+            timestamp = None
+
+        return timestamp is None, timestamp or 0.0
+
+    def load_jsonl(self, f) -> List[Dict[str, Any]]:
+        """Чтение JSON Lines из api_recorder: по вызову на строку"""
+        return [json.loads(line) for line in f if line.strip()]
+
+    def resolve_body_refs(self):
+        """Подстановка тел, вынесенных в контентно-адресуемое хранилище"""
+        resolver = BodyResolver(find_store_root(self.json_file_path, None, self.blob_store))
+        for log in self.api_logs:
+            resolver.resolve(log)
+
+    def worker_copy(self) -> 'APITestGenerator':
+        """Копия генератора для процесса-воркера без загруженных логов"""
+        clone = super().worker_copy()
+        clone.api_logs = []
+        return clone
 
     def extract_api_info(self, log_entry: Dict[str, Any]) -> Dict[str, Any]:
         """Извлечение информации об API запросе из лога"""
@@ -88,30 +160,22 @@ class APITestGenerator:
                 'response_data': response_data,
                 'response_status': response_status,
                 'timestamp': log_entry.get('timestamp', ''),
+                'duration': log_entry.get('duration'),
+                'response_size': len(response_body.encode('utf-8')) if isinstance(response_body, str) else None,
             }
         except Exception as e:
             print(f"Ошибка при обработке записи лога: {e}")
             return {}
 
-    def parse_query_params(self, query_string: str) -> Dict[str, Any]:
-        """Парсинг query параметров с декодированием URL и преобразованием типов"""
-        params = {}
-        try:
-            for param in query_string.split('&'):
-                if '=' in param:
-                    key, value = param.split('=', 1)
-                    # Декодируем URL-encoded значения
-                    key = unquote(key)
-                    value = unquote(value)
-                    # Парсим значение в Python-тип
-                    params[key] = self.parse_value(value)
-        except:
-            pass
-        return params
-
     def group_by_endpoint_and_params(self):
         """Группировка логов по эндпоинтам и параметрам"""
+        without_body = 0
         for log in self.api_logs:
+            if log.get('response', {}).get('body_error'):
+                # Рекордер не смог получить тело ответа - ожидаемых данных для теста нет
+                without_body += 1
+                continue
+
             api_info = self.extract_api_info(log)
             if not api_info:
                 continue
@@ -126,14 +190,21 @@ class APITestGenerator:
 
             if group_key not in self.endpoint_tests:
                 self.endpoint_tests[group_key] = {
+                    'group_key': group_key,
                     'endpoint': endpoint,
                     'method': method,
                     'params': params,
                     'samples': [],
+                    'stats': GroupStats(track_fields=True),
                 }
 
-            self.endpoint_tests[group_key]['samples'].append(api_info)
+            group = self.endpoint_tests[group_key]
+            group['stats'].add(api_info['duration'], api_info['response_size'],
+                               api_info['response_status'], api_info['response_data'])
+            reservoir_add(group['samples'], api_info, group['stats'].count, self.max_samples, self.sample_rng)
 
+        if without_body:
+            print(f"Пропущено записей без тела ответа: {without_body}")
         print(f"Обнаружено {len(self.endpoint_tests)} уникальных комбинаций эндпоинт+параметры")
 
     def create_test_function_name(self, endpoint: str, method: str, params: Dict) -> str:
@@ -170,15 +241,6 @@ class APITestGenerator:
 
         return f"test_{func_name}"
 
-    def generate_test_imports(self) -> str:
-        """Генерация импортов для тестового файла"""
-        return '''import json
-from http import HTTPStatus
-
-import pytest
-
-'''
-
     def generate_params_dict(self, params: Dict[str, Any]) -> str:
         """Генерация строки с параметрами для теста"""
         if not params:
@@ -215,31 +277,15 @@ import pytest
         params_str = "\n".join(params_lines)
         return f"params={{\n{params_str}\n        }}"
 
-    def generate_expected_data(self, sample: Dict[str, Any]) -> str:
-        """Генерация строки с ожидаемыми данными, где None представлен как None в Python"""
-        response_data = sample['response_data']
-
-        # Используем pprint для форматирования Python-объекта
-        import pprint
-        formatted = pprint.pformat(response_data, indent=1, width=100, depth=None)
-
-        # Убираем первый пробел отступа (indent=1 дает один пробел)
-        lines = formatted.split('\n')
-        lines = [line[1:] if line.startswith(' ') else line for line in lines]
-
-        return '\n'.join(lines)
-
-    def generate_test_function(self, test_data: Dict[str, Any]) -> str:
-        """Генерация тестовой функции для эндпоинта"""
+    def write_test_function(self, test_data: Dict[str, Any], out, snapshots_dir: Optional[Path] = None,
+                            index: int = 0, func_name: Optional[str] = None):
+        """Потоковая запись тестовой функции для эндпоинта (index - номер теста в файле)"""
         endpoint = test_data['endpoint']
         method = test_data['method']
         params = test_data['params']
         sample = test_data['samples'][0]  # Используем первый образец
 
-        func_name = self.create_test_function_name(endpoint, method, params)
-
-        # Создаем ожидаемый результат с None вместо null
-        expected_data = self.generate_expected_data(sample)
+        func_name = func_name or self.create_test_function_name(endpoint, method, params)
 
         # Формируем URL пути (без параметров)
         url_path = endpoint
@@ -247,12 +293,16 @@ import pytest
         # Генерируем строку с параметрами
         params_str = self.generate_params_dict(params)
 
-        # Формируем тестовую функцию
-        test_function = f'''@pytest.mark.asyncio
+        # Формируем тестовую функцию: ожидаемый результат (с None вместо null) пишется сразу в поток
+        out.write(f'''@pytest.mark.asyncio
 async def {func_name}(
         fast_api_client,
 ):
-    expected = {expected_data}
+{self.generate_stats_comment(test_data)}    expected = ''')
+        snapshot = (snapshots_dir, f"{func_name}_{index}") if snapshots_dir else None
+        self.write_expected_data(sample, out, snapshot)
+
+        test_function = f'''
 
     response = await fast_api_client.{method.lower()}(
         "{url_path}"'''
@@ -260,14 +310,14 @@ async def {func_name}(
         if params_str:
             test_function += f",\n        {params_str}"
 
-        test_function += ''',
+        test_function += f''',
     )
 
     assert response.status_code == HTTPStatus.OK
-    assert json.loads(response.content.decode()) == expected
-
+{self.generate_json_assertion(test_data)}
+{self.generate_latency_assertion(test_data)}
 '''
-        return test_function
+        out.write(test_function)
 
     def organize_tests_by_resource(self) -> Dict[str, List]:
         """Организация тестов по ресурсам (группировка эндпоинтов с одного ресурса)"""
@@ -309,51 +359,6 @@ async def {func_name}(
 
         return resource_tests
 
-    def create_directory_structure(self, resource_tests: Dict[str, List]) -> Dict[str, Path]:
-        """Создание структуры папок для тестов"""
-        current_dir = Path.cwd()
-        test_dirs = {}
-
-        for resource in resource_tests.keys():
-            # Создаем папку для каждого ресурса
-            resource_dir = current_dir / resource
-            resource_dir.mkdir(exist_ok=True)
-            test_dirs[resource] = resource_dir
-
-        return test_dirs
-
-    def save_test_file(self, resource: str, tests: List[Dict[str, Any]], resource_dir: Path):
-        """Сохранение тестового файла для ресурса в соответствующую папку"""
-        # Создаем имя файла - test_<ресурс>.py или просто test.py если имя слишком длинное
-        if len(resource) > 30:
-            file_name = "test.py"
-        else:
-            file_name = f"test_{resource}.py"
-
-        # Генерируем содержимое файла
-        imports = self.generate_test_imports()
-
-        # Сортируем тесты для более предсказуемого порядка
-        tests_sorted = sorted(tests, key=lambda x: (
-            x['endpoint'],
-            tuple(sorted(x['params'].items()))
-        ))
-
-        # Генерируем все тестовые функции
-        test_functions = []
-        for test_data in tests_sorted:
-            test_func = self.generate_test_function(test_data)
-            test_functions.append(test_func)
-
-        file_content = imports + "\n\n".join(test_functions)
-
-        # Сохраняем файл в папке ресурса
-        file_path = resource_dir / file_name
-        file_path.write_text(file_content, encoding='utf-8')
-        print(f"Создан тестовый файл: {file_path}")
-
-        return file_path
-
     def run(self):
         """Основной метод запуска генерации тестов"""
         print("=" * 60)
@@ -361,17 +366,24 @@ async def {func_name}(
         print("=" * 60)
 
         # Загружаем данные
-        self.load_json_data()
+        with self.metrics.stage('load_json_data'):
+            self.load_json_data()
+        self.metrics.count('transactions', len(self.api_logs))
+        self.metrics.count('input_bytes', os.path.getsize(self.json_file_path))
 
         # Группируем по эндпоинтам и параметрам
-        self.group_by_endpoint_and_params()
+        with self.metrics.stage('group_by_endpoint_and_params'):
+            self.group_by_endpoint_and_params()
+        self.metrics.count('groups', len(self.endpoint_tests))
 
         if not self.endpoint_tests:
             print("Не найдено данных для генерации тестов")
             return
 
         # Организуем тесты по ресурсам
-        resource_tests = self.organize_tests_by_resource()
+        with self.metrics.stage('organize_tests_by_resource'):
+            resource_tests = self.organize_tests_by_resource()
+        self.metrics.count('resources', len(resource_tests))
         print(f"Обнаружено {len(resource_tests)} различных ресурсов:")
         for resource in resource_tests.keys():
             print(f"  - {resource} ({len(resource_tests[resource])} тестов)")
@@ -380,19 +392,15 @@ async def {func_name}(
         test_dirs = self.create_directory_structure(resource_tests)
 
         # Генерируем тестовые файлы
-        generated_files = []
-        for resource, tests in resource_tests.items():
-            try:
-                file_path = self.save_test_file(resource, tests, test_dirs[resource])
-                generated_files.append(file_path)
-            except Exception as e:
-                print(f"Ошибка при генерации тестов для ресурса {resource}: {e}")
+        generated_files, unchanged_files = self.write_resources(resource_tests, test_dirs)
 
         print("\n" + "=" * 60)
         print("Генерация завершена успешно!")
         print(f"Создано {len(generated_files)} тестовых файлов в папках:")
         for file in generated_files:
             print(f"  - {file.parent.name}/{file.name}")
+        if self.incremental:
+            print(f"Без изменений (пропущено по манифесту): {unchanged_files}")
         print("=" * 60)
 
 
@@ -402,15 +410,62 @@ def main():
 
     parser = argparse.ArgumentParser(description='Генератор тестов API из JSON логов')
     parser.add_argument('json_file', help='Путь к JSON файлу с логами API')
+    parser.add_argument('--blob-store', default=None, help='Папка хранилища тел, вынесенных по хэшу')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Перезаписывать только файлы ресурсов, группы которых изменились с прошлого запуска')
+    parser.add_argument('--manifest', default=None,
+                        help=f'Путь к манифесту инкрементальной генерации (по умолчанию {DEFAULT_MANIFEST_NAME})')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Число процессов для рендеринга файлов ресурсов (0 - по числу ядер)')
+    parser.add_argument('--snapshots', action='store_true',
+                        help=f'Выносить крупные ожидаемые данные в {SNAPSHOTS_DIR_NAME}/*.json.gz рядом с тестами')
+    parser.add_argument('--snapshot-min-size', type=int, default=DEFAULT_MIN_SNAPSHOT_SIZE,
+                        help='Минимальная длина литерала ожидаемых данных (в символах) для выноса в snapshot')
+
+    parser.add_argument('--latency-budget', type=float, default=None, metavar='FACTOR',
+                        help='Проверять задержку ответа: p95 записанных длительностей группы x FACTOR')
+    parser.add_argument('--latency-floor', type=float, default=DEFAULT_LATENCY_FLOOR,
+                        help='Минимальный бюджет задержки в секундах')
+    parser.add_argument('--stats-report', default=None,
+                        help='Сохранить статистику групп (размеры, длительности, изменчивые поля) в JSON-файл')
+    parser.add_argument('--stats-comments', action='store_true',
+                        help='Добавлять в тесты комментарий со статистикой группы по всем образцам')
+    parser.add_argument('--no-volatile-masking', action='store_true',
+                        help='Сравнивать ответ точно, даже если поля различаются между образцами группы')
+    parser.add_argument('--max-samples', type=int, default=None,
+                        help='Хранить не больше N образцов на группу (первый + равномерная выборка остальных)')
+    parser.add_argument('--sample-seed', type=int, default=0, help='Seed выборки образцов для --max-samples')
+    parser.add_argument('--metrics', default=None, help='Сохранить метрики по стадиям в JSON-файл')
+    parser.add_argument('--profile', default=None, help='Сохранить профиль cProfile (pstats) в файл')
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help='Замерять пиковое выделение памяти по стадиям (замедляет генерацию)')
 
     args = parser.parse_args()
+    if args.max_samples is not None and args.max_samples < 1:
+        parser.error('--max-samples должен быть не меньше 1')
 
     if not os.path.exists(args.json_file):
         print(f"Ошибка: файл {args.json_file} не найден!")
         sys.exit(1)
 
-    generator = APITestGenerator(args.json_file)
-    generator.run()
+    generator = APITestGenerator(args.json_file, blob_store=args.blob_store,
+                                 incremental=args.incremental, manifest_path=args.manifest,
+                                 workers=args.workers or os.cpu_count() or 1,
+                                 snapshots=args.snapshots, snapshot_min_size=args.snapshot_min_size,
+                                 metrics=Instrumentation(args.profile, args.tracemalloc),
+                                 latency_factor=args.latency_budget, latency_floor=args.latency_floor,
+                                 stats_comments=args.stats_comments, mask_volatile=not args.no_volatile_masking,
+                                 max_samples=args.max_samples, sample_seed=args.sample_seed)
+    generator.metrics.start()
+    try:
+        generator.run()
+    finally:
+        generator.metrics.stop()
+        if args.stats_report:
+            generator.save_stats_report(args.stats_report)
+        if args.metrics:
+            generator.metrics.save(args.metrics)
+            print(f"Метрики сохранены в {args.metrics}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,111 @@
+import base64
+import json
+
+import pytest
+
+from tests.common.capture_container import (
+    FILE_HEADER_SIZE, MAGIC, CaptureContainerReader, CaptureContainerWriter, LazyBody, convert_json_to_container,
+    is_container, load_container
+)
+
+BINARY = bytes(range(256)) * 2
+TEXT = 'ответ ' * 50
+
+
+def transaction(index: int):
+    return {
+        'id': f'flow_{index}',
+        'request': {'method': 'POST', 'url': f'http://h/api/echo?i={index}', 'body_text': 'small'},
+        'response': {'status_code': 200, 'body_text': TEXT, 'body_base64': base64.b64encode(BINARY).decode()},
+    }
+
+
+def write_container(path, entries, metadata=None, compress=False):
+    with CaptureContainerWriter(str(path), compress) as writer:
+        for entry in entries:
+            writer.write_entry(entry)
+        if metadata:
+            writer.write_metadata(metadata)
+    return writer
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_round_trip(tmp_path, compress):
+    path = tmp_path / 'capture.e2c'
+    entries = [transaction(i) for i in range(3)]
+    writer = write_container(path, entries, {'source': 'test'}, compress)
+
+    assert is_container(str(path))
+    metadata, loaded = load_container(str(path))
+    assert loaded == entries
+    assert metadata == {'source': 'test'}
+    # Одинаковые тела записаны один раз
+    assert writer.bytes_deduplicated == 2 * (len(TEXT.encode('utf-8')) + len(BINARY))
+
+
+def test_lazy_bodies(tmp_path):
+    path = tmp_path / 'capture.e2c'
+    write_container(path, [transaction(0)])
+
+    with CaptureContainerReader(str(path), lazy=True) as reader:
+        entry = next(iter(reader))
+        response = entry['response']
+        assert isinstance(response['body_text'], LazyBody)
+        assert response['body_text'].value() == TEXT
+        assert response['body_base64'].raw() == BINARY
+        assert response['body_base64'].value() == base64.b64encode(BINARY).decode()
+        # Короткие тела остаются внутри JSON
+        assert entry['request']['body_text'] == 'small'
+
+
+def test_non_canonical_base64_stays_inline(tmp_path):
+    path = tmp_path / 'capture.e2c'
+    encoded = base64.encodebytes(BINARY).decode()
+    entry = {'response': {'body_base64': encoded}}
+    write_container(path, [entry])
+
+    _, loaded = load_container(str(path))
+    assert loaded[0]['response']['body_base64'] == encoded
+
+
+def test_truncated_container(tmp_path):
+    path = tmp_path / 'capture.e2c'
+    write_container(path, [transaction(0), transaction(1)])
+    data = path.read_bytes()
+    path.write_bytes(data + b'\x02\x00')
+
+    with pytest.raises(ValueError, match='обрезан'):
+        load_container(str(path))
+
+
+@pytest.mark.parametrize('content', [b'', MAGIC, b'{"transactions": []}'])
+def test_not_a_container(tmp_path, content):
+    path = tmp_path / 'capture.e2c'
+    path.write_bytes(content)
+
+    with pytest.raises(ValueError, match='E2EC'):
+        CaptureContainerReader(str(path))
+
+
+def test_unsupported_version(tmp_path):
+    path = tmp_path / 'capture.e2c'
+    path.write_bytes(MAGIC + b'\x63')
+    assert len(path.read_bytes()) == FILE_HEADER_SIZE
+
+    with pytest.raises(ValueError, match='версия'):
+        CaptureContainerReader(str(path))
+
+
+def test_convert_refuses_to_overwrite(tmp_path):
+    source = tmp_path / 'capture.json'
+    source.write_text(json.dumps({'metadata': {}, 'transactions': [transaction(0)]}), encoding='utf-8')
+
+    output = convert_json_to_container(str(source))
+    assert load_container(output)[1] == [transaction(0)]
+
+    with pytest.raises(FileExistsError):
+        convert_json_to_container(str(source))
+    assert convert_json_to_container(str(source), overwrite=True) == output
+
+    other = tmp_path / 'other.e2c'
+    assert convert_json_to_container(str(source), output_path=str(other)) == str(other)
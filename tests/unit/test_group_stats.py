@@ -0,0 +1,121 @@
+import random
+from collections import Counter
+
+from tests.common.group_stats import (
+    FieldStability, GroupStats, format_path, iter_nodes, leaf_key, leaf_type, reservoir_add
+)
+
+
+def stability(*samples, max_fields: int = 2000) -> FieldStability:
+    fields = FieldStability(max_fields)
+    for sample in samples:
+        fields.add(sample)
+    return fields
+
+
+def test_format_path():
+    assert format_path(()) == '$'
+    assert format_path(('items', 0, 'id')) == '$.items[0].id'
+
+
+def test_leaf_type_and_key():
+    assert [leaf_type(value) for value in (None, True, 1, 1.5, 's', [], {})] == \
+           ['null', 'bool', 'number', 'number', 'string', 'array', 'object']
+    assert leaf_key(True) != leaf_key(1)
+    assert leaf_key([]) == leaf_key([])
+
+
+def test_iter_nodes_yields_containers_before_their_fields():
+    nodes = list(iter_nodes({'a': [1, {}], 'b': None}))
+    assert [path for path, _ in nodes] == [(), ('a',), ('a', 0), ('a', 1), ('b',)]
+
+
+def test_stable_fields():
+    fields = stability({'a': 1, 'b': [1, 2]}, {'a': 1, 'b': [1, 2]})
+    assert fields.varying_fields() == []
+    assert fields.presence(('b',)) == 2
+    assert fields.path_types(('b',)) == ['array']
+
+
+def test_changed_and_missing_fields_vary():
+    fields = stability({'a': 1, 'b': 'x'}, {'a': 2}, {'a': 3, 'b': 'x', 'c': True})
+    assert fields.varying_fields() == [('a',), ('b',), ('c',)]
+    assert fields.presence(('b',)) == 2
+    assert fields.field_types(('a',)) == ['number']
+
+
+def test_shape_changes_are_recorded_at_the_path():
+    fields = stability({'u': None}, {'u': {'id': 1}}, {'u': [1]})
+    assert fields.presence(('u',)) == 3
+    assert fields.path_types(('u',)) == ['array', 'null', 'object']
+    assert fields.field_types(('u',)) == ['null']
+
+
+def test_max_fields_truncates():
+    fields = stability({f'k{i}': i for i in range(10)}, max_fields=3)
+    assert fields.truncated
+    assert len(fields.fields) == 3
+    assert fields.report()['truncated']
+
+
+def test_group_stats_report_and_comment():
+    stats = GroupStats()
+    stats.add(0.1, 100, 200, {'id': 1, 'name': 'x'})
+    stats.add(0.3, 300, 200, {'id': 2, 'name': 'x'})
+    stats.add(None, None, 500, {'id': 3, 'name': 'x'})
+
+    report = stats.report()
+    assert report['samples'] == 3
+    assert report['statuses'] == {'200': 2, '500': 1}
+    assert report['duration_seconds']['count'] == 2
+    assert report['duration_seconds']['p50'] == 0.2
+    assert report['fields']['varying'] == {'$.id': {'types': ['number'], 'present': 3}}
+
+    comment = stats.summary_comment()
+    assert 'образцов: 3' in comment
+    assert 'размер ответа p50/p95: 200/290 байт' in comment
+    assert 'изменчивые поля: $.id' in comment
+
+
+def test_group_stats_without_field_tracking():
+    stats = GroupStats(track_fields=False)
+    stats.add(0.1, 10, 200, {'a': 1})
+    assert stats.fields is None
+    assert stats.report()['fields'] is None
+    assert 'стабильно' not in stats.summary_comment()
+
+
+def fill_reservoir(count: int, capacity, seed: int = 0):
+    samples = []
+    rng = random.Random(seed)
+    for seen in range(1, count + 1):
+        reservoir_add(samples, seen, seen, capacity, rng)
+    return samples
+
+
+def test_reservoir_without_capacity_keeps_everything():
+    assert fill_reservoir(5, None) == [1, 2, 3, 4, 5]
+
+
+def test_reservoir_keeps_first_sample_and_capacity():
+    for seed in range(20):
+        samples = fill_reservoir(100, 5, seed)
+        assert len(samples) == 5
+        assert samples[0] == 1
+        assert len(set(samples)) == 5
+
+
+def test_reservoir_is_reproducible_with_seed():
+    assert fill_reservoir(100, 5, seed=7) == fill_reservoir(100, 5, seed=7)
+
+
+def test_reservoir_is_uniform_over_later_samples():
+    """Каждый образец, кроме первого, попадает в выборку с вероятностью (capacity - 1) / (count - 1)"""
+    count, capacity, runs = 21, 5, 4000
+    hits = Counter()
+    for seed in range(runs):
+        hits.update(fill_reservoir(count, capacity, seed)[1:])
+
+    expected = runs * (capacity - 1) / (count - 1)
+    assert set(hits) == set(range(2, count + 1))
+    assert all(abs(hits[sample] - expected) < expected * 0.15 for sample in hits)
@@ -0,0 +1,90 @@
+import mmap
+
+from tests.common.multipart import decode_text, iter_parts, parse_boundary, sniff_boundary
+
+BOUNDARY = b'XyZ'
+
+
+def build(*parts: bytes, closing: bool = True) -> bytes:
+    body = b''.join(b'--' + BOUNDARY + b'\r\n' + part + b'\r\n' for part in parts)
+    return body + (b'--' + BOUNDARY + b'--\r\n' if closing else b'')
+
+
+def test_parse_boundary():
+    assert parse_boundary('multipart/form-data; boundary=XyZ') == b'XyZ'
+    assert parse_boundary('multipart/form-data; boundary="a b"; charset=utf-8') == b'a b'
+    assert parse_boundary('application/json') is None
+    assert parse_boundary(None) is None
+
+
+def test_sniff_boundary():
+    assert sniff_boundary(build(b'\r\nx')) == BOUNDARY
+    assert sniff_boundary(b'not multipart') is None
+
+
+def test_fields_and_files():
+    body = build(
+        b'Content-Disposition: form-data; name="title"\r\n\r\nhello',
+        b'Content-Disposition: form-data; name="pic"; filename="a.png"\r\nContent-Type: image/png\r\n\r\n'
+        b'\x89PNG\r\n\x00\xff',
+    )
+    parts = list(iter_parts(body, BOUNDARY))
+
+    assert [part.name for part in parts] == ['title', 'pic']
+    assert not parts[0].is_file
+    assert parts[0].content_type == 'text/plain'
+    assert bytes(parts[0].data) == b'hello'
+
+    assert parts[1].is_file
+    assert parts[1].filename == 'a.png'
+    assert parts[1].content_type == 'image/png'
+    # CRLF внутри файла - не разделитель
+    assert bytes(parts[1].data) == b'\x89PNG\r\n\x00\xff'
+
+
+def test_part_data_is_a_view_of_the_body():
+    body = bytearray(build(b'Content-Disposition: form-data; name="f"; filename="x"\r\n\r\nabc'))
+    part = next(iter_parts(body, BOUNDARY))
+    assert isinstance(part.data, memoryview)
+    assert part.data.obj is body
+
+
+def test_empty_header_block():
+    parts = list(iter_parts(build(b'\r\nraw data'), BOUNDARY))
+    assert len(parts) == 1
+    assert parts[0].headers == {}
+    assert bytes(parts[0].data) == b'raw data'
+
+
+def test_empty_part_data():
+    parts = list(iter_parts(build(b'Content-Disposition: form-data; name="empty"\r\n\r\n'), BOUNDARY))
+    assert bytes(parts[0].data) == b''
+
+
+def test_truncated_body_keeps_data_up_to_the_end():
+    body = build(b'Content-Disposition: form-data; name="a"\r\n\r\nfull',
+                 b'Content-Disposition: form-data; name="b"\r\n\r\ncut', closing=False)[:-2]
+    parts = list(iter_parts(body, BOUNDARY))
+    assert [bytes(part.data) for part in parts] == [b'full', b'cut']
+
+
+def test_boundary_is_sniffed_when_missing():
+    parts = list(iter_parts(build(b'Content-Disposition: form-data; name="a"\r\n\r\n1')))
+    assert [part.name for part in parts] == ['a']
+    assert list(iter_parts(b'plain body')) == []
+
+
+def test_mmap_buffer(tmp_path):
+    path = tmp_path / 'body.bin'
+    path.write_bytes(build(b'Content-Disposition: form-data; name="a"\r\n\r\nmapped'))
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        parts = list(iter_parts(buffer, BOUNDARY))
+        assert bytes(parts[0].data) == b'mapped'
+        del parts
+
+
+def test_decode_text():
+    assert decode_text(memoryview('привет'.encode('utf-8'))) == 'привет'
+    assert decode_text(b'line\r\n\tindent') == 'line\r\n\tindent'
+    assert decode_text(b'\xff\xfe') is None
+    assert decode_text(b'bin\x00ary') is None
@@ -0,0 +1,107 @@
+import random
+
+import pytest
+
+from tests.common.stats import (
+    DEFAULT_EXACT_LIMIT, P2Quantile, StreamingSummary, latency_budget, percentile, summarize
+)
+
+
+def exponential_sample(n: int, seed: int):
+    rng = random.Random(seed)
+    return [rng.expovariate(1) for _ in range(n)]
+
+
+def test_percentile_interpolates_like_numpy():
+    assert percentile([], 95) is None
+    assert percentile([5], 95) == 5
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([4, 1, 3, 2], 100) == 4
+    assert percentile(list(range(101)), 95) == 95
+
+
+def test_summarize_skips_missing_values():
+    assert summarize([]) == {'count': 0}
+    assert summarize([None]) == {'count': 0}
+
+    summary = summarize([0.3, None, 0.1, 0.2], percentiles=(50, 100))
+    assert summary['count'] == 3
+    assert summary['mean'] == pytest.approx(0.2)
+    assert summary['max'] == 0.3
+    assert summary['p50'] == 0.2
+    assert summary['p100'] == 0.3
+
+
+@pytest.mark.parametrize('n', [6, 10, 20, 1000])
+def test_summary_p95_matches_exact_percentile(n):
+    """Малые группы - точный перцентиль, большие - оценка P² в пределах нескольких процентов"""
+    for seed in range(20):
+        values = exponential_sample(n, seed)
+        summary = StreamingSummary()
+        for value in values:
+            summary.add(value)
+
+        exact = percentile(values, 95)
+        if n <= DEFAULT_EXACT_LIMIT:
+            assert summary.quantile(95) == exact
+        else:
+            assert summary.quantile(95) == pytest.approx(exact, rel=0.1)
+
+
+@pytest.mark.parametrize('n', [6, 10, 20, 1000])
+def test_p2_against_exact_p95(n):
+    """P² сама по себе на малых выборках занижает хвост - поэтому сводка переключается на неё только после порога"""
+    ratios = []
+    for seed in range(20):
+        values = exponential_sample(n, seed)
+        sketch = P2Quantile(95)
+        for value in values:
+            sketch.add(value)
+        ratios.append(sketch.value() / percentile(values, 95))
+
+    ratios.sort()
+    median = ratios[len(ratios) // 2]
+    if n >= 1000:
+        assert median == pytest.approx(1, rel=0.05)
+        assert all(0.9 < ratio < 1.1 for ratio in ratios)
+    else:
+        assert median < 1
+
+
+def test_p2_is_exact_for_five_values():
+    sketch = P2Quantile(50)
+    for value in [3, 1, 2]:
+        sketch.add(value)
+    assert sketch.value() == 2
+
+
+def test_summary_switches_to_p2_after_limit():
+    summary = StreamingSummary(percentiles=(95,), exact_limit=10)
+    for value in range(10):
+        summary.add(value)
+    assert summary.values is not None
+
+    summary.add(10)
+    assert summary.values is None
+    assert summary.quantile(95) == summary.sketches[95].value()
+
+
+def test_summary_report_and_missing_values():
+    summary = StreamingSummary()
+    assert summary.report() == {'count': 0}
+    assert summary.quantile(95) is None
+
+    for value in [None, 1.0, 3.0, None, 2.0]:
+        summary.add(value)
+    report = summary.report()
+    assert report['count'] == 3
+    assert report['mean'] == 2.0
+    assert (report['min'], report['max']) == (1.0, 3.0)
+    assert report['p50'] == 2.0
+    assert summary.quantile(42) is None
+
+
+def test_latency_budget():
+    assert latency_budget(None, 3) is None
+    assert latency_budget(0.5, 3) == 1.5
+    assert latency_budget(0.01, 3, floor=0.1) == 0.1
@@ -0,0 +1,64 @@
+import pytest
+
+from tests.common.group_stats import FieldStability
+from tests.common.volatile import assert_json_matches, mask, volatile_fields
+
+
+def derive(*samples):
+    stability = FieldStability()
+    for sample in samples:
+        stability.add(sample)
+    return volatile_fields(stability)
+
+
+def assert_all_samples_match(*samples):
+    """Ответ, совпадающий с любым записанным образцом, проходит проверку теста, сгенерированного по первому"""
+    volatile = derive(*samples)
+    for sample in samples:
+        assert_json_matches(sample, samples[0], volatile)
+    return volatile
+
+
+def test_stable_body_has_no_volatile_fields():
+    assert derive({'a': 1, 'b': [1, 2]}, {'a': 1, 'b': [1, 2]}) == {}
+
+
+def test_changed_value_is_checked_by_type():
+    volatile = assert_all_samples_match({'id': 1, 'name': 'x'}, {'id': 2, 'name': 'x'})
+    assert volatile == {('id',): (('number',), False)}
+
+    with pytest.raises(AssertionError):
+        assert_json_matches({'id': 'three', 'name': 'x'}, {'id': 1, 'name': 'x'}, volatile)
+    with pytest.raises(AssertionError):
+        assert_json_matches({'id': 3, 'name': 'y'}, {'id': 1, 'name': 'x'}, volatile)
+
+
+def test_missing_key_is_optional():
+    volatile = assert_all_samples_match({'a': 1, 'extra': 'x'}, {'a': 1})
+    assert volatile == {('extra',): (('string',), True)}
+
+
+def test_nullable_object():
+    volatile = assert_all_samples_match({'u': None}, {'u': {'id': 1}}, {'u': {'id': 2, 'name': 'x'}})
+    assert volatile == {('u',): (('null', 'object'), False)}
+
+
+def test_nullable_list():
+    volatile = assert_all_samples_match({'tags': None}, {'tags': ['a']})
+    assert volatile == {('tags',): (('array', 'null'), False)}
+
+
+def test_object_and_list_shapes():
+    volatile = assert_all_samples_match({'x': {'a': 1}}, {'x': [1]})
+    assert volatile == {('x',): (('array', 'object'), False)}
+
+
+def test_variable_length_list_is_volatile_as_a_whole():
+    volatile = assert_all_samples_match({'items': [1, 2]}, {'items': [1]}, {'items': []})
+    assert volatile == {('items',): (('array',), False)}
+
+
+def test_mask_removes_keys_and_replaces_items():
+    volatile = {('a',): (('number',), False), ('b', 0): (('number',), False)}
+    assert mask({'a': 1, 'b': [1, 2], 'c': 3}, volatile) == {'b': ['<volatile>', 2], 'c': 3}
+    assert mask({'a': 1}, {(): (('object',), False)}) == '<volatile>'